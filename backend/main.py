@@ -4,20 +4,46 @@ Mitraa Chatbot - FastAPI Backend with LangChain + OpenAI + ChromaDB
 Main application entry point
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterable
+import io
 import os
+import re
+import sys
 import json
+import math
+import time
+import asyncio
+import uuid
+import queue
+import zipfile
+import tempfile
 import hashlib
+import hmac
+import cProfile
+import gc
+import pstats
+import sqlite3
+import threading
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from pathlib import Path
 from dotenv import load_dotenv
+import numpy as np
+
+import openai
 
 # LangChain imports
 from langchain_openai import ChatOpenAI
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnablePassthrough
@@ -29,6 +55,7 @@ load_dotenv()
 
 # Get API credentials
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # Optional: OpenAI-compatible endpoint (e.g. tools/fake_openai.py for load tests)
 CHROMA_USE_CLOUD = os.getenv("CHROMA_USE_CLOUD", "false").lower() == "true"
 CHROMA_CLOUD_HOST = os.getenv("CHROMA_CLOUD_HOST")
 CHROMA_CLOUD_API_KEY = os.getenv("CHROMA_CLOUD_API_KEY")
@@ -88,7 +115,36 @@ def load_knowledge_base():
     return "\n\n---\n\n".join(knowledge_content)
 
 # Configuration
-MAX_CONVERSATION_TURNS = 6  # Maximum number of user messages allowed per conversation
+MAX_CONVERSATION_TURNS = int(os.getenv("MAX_CONVERSATION_TURNS", "6"))  # Maximum number of user messages allowed per conversation
+RETRIEVAL_K = 4  # Chunks retrieved from each collection (top 4 from each for better coverage)
+RETRIEVAL_MAX_DOCS = 10  # Limit to 10 total docs in the prompt for better coverage
+
+# Per-collection chunking/retrieval overrides, e.g. written by `python -m tools.eval_retrieval --write-config`
+RETRIEVAL_CONFIG_FILE = Path(os.getenv("RETRIEVAL_CONFIG_FILE", str(Path(__file__).parent / "retrieval_config.json")))
+DEFAULT_RETRIEVAL_SETTINGS = {"chunk_size": 1000, "chunk_overlap": 200, "k": RETRIEVAL_K, "chunker": "recursive"}
+
+def load_retrieval_config() -> dict:
+    """Read per-collection settings ({"yatras": {"chunk_size": 800, "chunk_overlap": 100, "k": 3}, ...})"""
+    if not RETRIEVAL_CONFIG_FILE.exists():
+        return {}
+    try:
+        return json.loads(RETRIEVAL_CONFIG_FILE.read_text(encoding='utf-8'))
+    except Exception as e:
+        print(f"⚠️ Could not read {RETRIEVAL_CONFIG_FILE.name}, using defaults: {e}")
+        return {}
+
+retrieval_config = load_retrieval_config()
+
+def get_retrieval_settings(category: str, collections: Optional[dict] = None) -> dict:
+    """
+    Chunker, chunk size, overlap and k for a collection (COLLECTIONS defaults, overridden by retrieval_config.json).
+    A tenant passes its own collection definitions, which carry their settings inline.
+    """
+    if collections is not None:
+        tenant_settings = {key: value for key, value in collections.get(category, {}).items() if key in DEFAULT_RETRIEVAL_SETTINGS}
+        return {**DEFAULT_RETRIEVAL_SETTINGS, **tenant_settings}
+    collection_defaults = {key: COLLECTIONS[category][key] for key in ("chunker", "k") if key in COLLECTIONS.get(category, {})}
+    return {**DEFAULT_RETRIEVAL_SETTINGS, **collection_defaults, **retrieval_config.get(category, {})}
 
 # System prompt
 SYSTEM_PROMPT = """You are Mitraa, a helpful and warm chatbot for the spiritual travel platform Oorzaa Yatra.
@@ -354,6 +410,8 @@ This step builds confidence and reduces payment hesitation.
 # ========================
 
 vector_stores = {}  # Dictionary to hold multiple collections
+vector_stores_ready = threading.Event()  # Set once the first collection is registered in vector_stores
+embedding_model = None  # Shared embeddings instance, loaded by initialize_vector_store()
 CHROMA_PERSIST_DIR = Path(__file__).parent / "chroma_db"
 KNOWLEDGE_HASH_FILE = CHROMA_PERSIST_DIR / ".knowledge_hash"
 
@@ -362,17 +420,22 @@ COLLECTIONS = {
     "yatras": {
         "name": "oorzaa_yatras",
         "files": ["yatra_schedule.txt", "yatra"],  # Files containing these keywords
-        "description": "Yatra schedules, destinations, and travel information"
+        "description": "Yatra schedules, destinations, and travel information",
+        "chunker": "yatra_entries",  # One chunk per yatra (dates, price and transport together)
+        "k": 3
     },
     "faqs": {
         "name": "oorzaa_faqs",
         "files": ["faq", "functional_requirements.txt"],
-        "description": "Frequently asked questions and answers"
+        "description": "Frequently asked questions and answers",
+        "chunker": "qa_pairs",  # One chunk per question and its answer
+        "k": 3
     },
     "policies": {
         "name": "oorzaa_policies",
         "files": ["policy", "policies", "additional_points.txt", "company_info.txt"],
-        "description": "Policies, terms, and company information"
+        "description": "Policies, terms, and company information",
+        "chunker": "recursive"
     }
 }
 
@@ -401,38 +464,33 @@ def categorize_file(filename: str) -> str:
     # Default to policies if no match
     return "policies"
 
-def load_knowledge_by_collection() -> dict:
-    """Load knowledge files grouped by collection"""
+def group_knowledge_files_by_collection() -> dict:
+    """Group knowledge file paths by collection (files are read lazily by the ingest pipeline)"""
     knowledge_dir = Path(__file__).parent / "knowledge"
-    collections_data = {cat: [] for cat in COLLECTIONS.keys()}
-    
+    collections_files = {cat: [] for cat in COLLECTIONS.keys()}
+
     if not knowledge_dir.exists():
         print("⚠️ Knowledge directory not found")
-        return collections_data
-    
-    print("\n📚 Loading knowledge base by collection...")
-    
+        return collections_files
+
     for file_path in sorted(knowledge_dir.glob("*.txt")) + sorted(knowledge_dir.glob("*.md")):
-        try:
-            content = file_path.read_text(encoding='utf-8')
-            if content.strip():
-                category = categorize_file(file_path.name)
-                collections_data[category].append(content)
-                print(f"✅ Loaded: {file_path.name} → {category}")
-        except Exception as e:
-            print(f"❌ Error loading {file_path.name}: {e}")
-    
-    return collections_data
+        category = categorize_file(file_path.name)
+        collections_files[category].append(file_path)
+        print(f"✅ Found: {file_path.name} → {category}")
+
+    return collections_files
 
 def get_knowledge_hash() -> str:
     """Calculate hash of all knowledge files to detect changes"""
     knowledge_dir = Path(__file__).parent / "knowledge"
     if not knowledge_dir.exists():
         return ""
-    
+
     hasher = hashlib.sha256()
     for file_path in sorted(knowledge_dir.glob("*.txt")) + sorted(knowledge_dir.glob("*.md")):
         hasher.update(file_path.read_bytes())
+    # Chunking settings change the stored chunks too, so new settings also trigger re-ingestion
+    hasher.update(json.dumps({category: get_retrieval_settings(category) for category in COLLECTIONS}, sort_keys=True).encode())
     return hasher.hexdigest()
 
 def should_reingest() -> bool:
@@ -440,10 +498,10 @@ def should_reingest() -> bool:
     # Always check hash file, regardless of storage mode
     if not KNOWLEDGE_HASH_FILE.exists():
         return True
-    
+
     current_hash = get_knowledge_hash()
     stored_hash = KNOWLEDGE_HASH_FILE.read_text() if KNOWLEDGE_HASH_FILE.exists() else ""
-    
+
     return current_hash != stored_hash
 
 def save_knowledge_hash():
@@ -452,6 +510,482 @@ def save_knowledge_hash():
     current_hash = get_knowledge_hash()
     KNOWLEDGE_HASH_FILE.write_text(current_hash)
 
+def get_chroma_client():
+    """Create a Chroma Cloud client (tenant ID is the first label of CHROMA_CLOUD_HOST)"""
+    import chromadb
+    # Extract tenant ID from host (format: tenant.api.trychroma.com)
+    tenant_id = CHROMA_CLOUD_HOST.split('.')[0]
+    return chromadb.CloudClient(
+        api_key=CHROMA_CLOUD_API_KEY,
+        tenant=tenant_id,
+        database='OorzaYatra'
+    )
+
+def open_chroma_store(chroma_name: str, embeddings, reset: bool = False, chroma_client=None, label: Optional[str] = None):
+    """Open (or, with reset=True, drop and recreate) a Chroma collection, in Chroma Cloud or on local disk"""
+    label = label or chroma_name
+
+    if CHROMA_USE_CLOUD:
+        chroma_client = chroma_client or get_chroma_client()
+        if reset:
+            # Delete existing collection first to prevent duplicates
+            try:
+                chroma_client.delete_collection(name=chroma_name)
+                print(f"🗑️ Deleted old {label} collection from cloud")
+            except:
+                pass
+        return Chroma(
+            client=chroma_client,
+            collection_name=chroma_name,
+            embedding_function=embeddings
+        )
+
+    # Use local persistent storage
+    if reset:
+        try:
+            old_collection = Chroma(
+                collection_name=chroma_name,
+                embedding_function=embeddings,
+                persist_directory=str(CHROMA_PERSIST_DIR)
+            )
+            old_collection.delete_collection()
+            print(f"🗑️ Deleted old {label} collection")
+        except:
+            pass
+    return Chroma(
+        collection_name=chroma_name,
+        embedding_function=embeddings,
+        persist_directory=str(CHROMA_PERSIST_DIR)
+    )
+
+def open_collection_store(collection_name: str, embeddings, reset: bool = False, chroma_client=None):
+    """Open (or, with reset=True, drop and recreate) the Chroma store for a collection and register it"""
+    config = COLLECTIONS[collection_name]
+    store = open_chroma_store(config["name"], embeddings, reset=reset, chroma_client=chroma_client, label=collection_name)
+    vector_stores[collection_name] = store
+    vector_stores_ready.set()
+    invalidate_knowledge_stats()
+    return store
+
+# ========================
+# EMBEDDING BACKENDS
+# ========================
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "fp32").lower()  # fp32, or int8 (Linear layers dynamically quantised)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))  # Texts per forward pass
+EMBEDDING_CHECK_MAX_CHUNKS = 2000  # Knowledge chunks encoded by `python main.py check-embeddings`
+# Typical first questions, used by the check for top-k agreement and single-query latency
+EMBEDDING_CHECK_QUERIES = [
+    "What yatras are available?",
+    "What is the cancellation policy?",
+    "How much does the Kedarnath yatra cost?",
+    "When is the next Char Dham yatra?",
+    "Is food included in the package?",
+    "How do I book a yatra?",
+    "Can senior citizens join the trek?",
+    "What documents do I need to carry?",
+    "Do you offer a refund if I cancel?",
+    "How can I pay the advance?",
+    "Which hotels do you stay in?",
+    "Is the Ayodhya yatra suitable for families?"
+]
+
+def load_sentence_transformer(model_name: str, quantize: bool = False):
+    """The sentence-transformers model on CPU; quantize=True swaps its Linear layers for int8 dynamic-quantised ones"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.environ['HF_HUB_DOWNLOAD_TIMEOUT'] = '300'  # 5 minutes
+    model = SentenceTransformer(model_name, device="cpu")
+    model.eval()
+    if quantize:
+        engines = torch.backends.quantized.supported_engines
+        if "fbgemm" not in engines and "qnnpack" in engines:
+            torch.backends.quantized.engine = "qnnpack"  # ARM
+        # In place, so the fp32 Linear weights are freed rather than kept next to the int8 copies
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+def model_weight_bytes(model) -> int:
+    """Bytes held by the model's weights, counting packed int8 Linear weights at their real size"""
+    total = 0
+    for value in model.state_dict().values():
+        for tensor in value if isinstance(value, tuple) else (value,):
+            if hasattr(tensor, "element_size"):
+                total += tensor.element_size() * tensor.nelement()
+    return total
+
+class LocalEmbeddings(Embeddings):
+    """
+    LangChain embeddings over a local sentence-transformers model, with a batch encode() used by ingest and queries.
+    Concurrent embed_query() calls are coalesced: queries arriving while a forward pass runs go through the next
+    pass together, so a burst of chats costs a few batched passes instead of many single-text ones competing
+    for the same torch threads.
+    """
+
+    def __init__(self, model, backend: str, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.model = model
+        self.backend = backend
+        self.batch_size = batch_size
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._query_pass_lock = threading.Lock()
+        self.counters = {"documents": 0, "queries": 0, "query_passes": 0}
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Normalised float32 vectors, one row per text"""
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        vectors = self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                    convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.counters["documents"] += len(texts)
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        slot = {"text": text, "done": False}
+        with self._pending_lock:
+            self._pending.append(slot)
+        with self._query_pass_lock:
+            # Whoever gets the lock first encodes every query queued so far, including those of threads still waiting
+            if not slot["done"]:
+                with self._pending_lock:
+                    batch, self._pending = self._pending, []
+                try:
+                    vectors = self.encode([item["text"] for item in batch])
+                except Exception as e:
+                    vectors = [e] * len(batch)
+                for item, vector in zip(batch, vectors):
+                    item["vector"] = vector
+                    item["done"] = True
+                self.counters["queries"] += len(batch)
+                self.counters["query_passes"] += 1
+        if isinstance(slot["vector"], Exception):
+            raise slot["vector"]
+        return slot["vector"].tolist()
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "model": EMBEDDING_MODEL_NAME, "batch_size": self.batch_size, **self.counters}
+
+# Backend name -> loader for the model; another runtime (e.g. ONNX) only needs an entry returning an encode()-able model
+EMBEDDING_BACKENDS = {
+    "fp32": lambda model_name: load_sentence_transformer(model_name),
+    "int8": lambda model_name: load_sentence_transformer(model_name, quantize=True)
+}
+
+def load_embedding_backend(backend: str) -> LocalEmbeddings:
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected one of: {', '.join(EMBEDDING_BACKENDS)})")
+    return LocalEmbeddings(EMBEDDING_BACKENDS[backend](EMBEDDING_MODEL_NAME), backend)
+
+def _single_query_ms(embeddings: LocalEmbeddings, queries: List[str]) -> float:
+    embeddings.encode(queries[:1])  # Warm up
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        embeddings.encode([query])
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings))
+
+def compare_embedding_backends(backend: str, k: int = 5) -> dict:
+    """
+    Encode the knowledge chunks and EMBEDDING_CHECK_QUERIES with fp32 and `backend`, and report how closely the
+    vectors agree, how often the top-k chunks per query stay the same, and the speed and weight size of both.
+    "mixed" top-k uses `backend` queries against fp32 chunks: a collection embedded before switching backends.
+    """
+    documents = []
+    for collection_name, file_paths in group_knowledge_files_by_collection().items():
+        documents.extend(text for text, _ in iter_knowledge_file_chunks(collection_name, file_paths))
+    documents = documents[:EMBEDDING_CHECK_MAX_CHUNKS]
+    if not documents:
+        raise ValueError("No knowledge files to encode")
+    queries = EMBEDDING_CHECK_QUERIES
+    k = min(k, len(documents))
+
+    results = {}
+    for name in ("fp32", backend):
+        embeddings = load_embedding_backend(name)
+        _single_query_ms(embeddings, queries)
+        started = time.perf_counter()
+        document_vectors = embeddings.encode(documents)
+        documents_seconds = time.perf_counter() - started
+        results[name] = {
+            "document_vectors": document_vectors,
+            "query_vectors": embeddings.encode(queries),
+            "documents_per_second": round(len(documents) / documents_seconds, 1),
+            "query_ms_p50": round(_single_query_ms(embeddings, queries), 2),
+            "weight_mb": round(model_weight_bytes(embeddings.model) / 1024 / 1024, 1)
+        }
+        del embeddings
+
+    def top_k(query_vectors, document_vectors):
+        return [set(row) for row in np.argsort(-(query_vectors @ document_vectors.T), axis=1)[:, :k]]
+
+    baseline, candidate = results["fp32"], results[backend]
+    cosines = np.concatenate([
+        np.sum(baseline["document_vectors"] * candidate["document_vectors"], axis=1),
+        np.sum(baseline["query_vectors"] * candidate["query_vectors"], axis=1)
+    ])
+    expected = top_k(baseline["query_vectors"], baseline["document_vectors"])
+    overlap = lambda found: float(np.mean([len(a & b) / k for a, b in zip(expected, found)]))
+    speed = lambda name: {key: results[name][key] for key in ("documents_per_second", "query_ms_p50", "weight_mb")}
+    return {
+        "backend": backend,
+        "documents": len(documents),
+        "queries": len(queries),
+        "cosine_mean": round(float(cosines.mean()), 4),
+        "cosine_min": round(float(cosines.min()), 4),
+        "top_k": k,
+        "top_k_overlap": round(overlap(top_k(candidate["query_vectors"], candidate["document_vectors"])), 3),
+        "top_k_overlap_mixed": round(overlap(top_k(candidate["query_vectors"], baseline["document_vectors"])), 3),
+        "fp32": speed("fp32"),
+        backend: speed(backend),
+        "documents_speedup": round(candidate["documents_per_second"] / baseline["documents_per_second"], 2),
+        "query_speedup": round(baseline["query_ms_p50"] / candidate["query_ms_p50"], 2)
+    }
+
+# ========================
+# CHUNKING STRATEGIES
+# ========================
+
+# A line that opens a new yatra entry: markdown heading, 📍 marker, "Yatra Name:" field, or a short (optionally
+# numbered/bold) title line naming a yatra that is followed by its own Dates/Price/Duration fields and comes after
+# the previous entry's fields. Without those checks, lines like "Highlights of this yatra" would split an entry
+YATRA_HEADING_RE = re.compile(r"^\s*(#{1,6}\s+\S|📍)")
+YATRA_NAME_FIELD_RE = re.compile(r"^\s*\**\s*(yatra\s+name|yatra)\s*\**\s*[:\-–]\s*(?P<name>.+)$", re.IGNORECASE)
+YATRA_TITLE_RE = re.compile(r"^\s*(\d+[\.\)]\s*)?\**[^:\n]{2,80}\byatra\b[^:\n]{0,40}\**\s*$", re.IGNORECASE)
+YATRA_CATEGORY_RE = re.compile(r"\b(mega|mid|mini)\s*[-\s]?\s*yatra\b", re.IGNORECASE)
+YATRA_DETAIL_FIELD_RE = re.compile(r"^\s*[-•*]?\s*\**\s*(dates?|price|cost|fare|duration|departure)\b[^:\n]{0,20}?\**\s*[:\-–]", re.IGNORECASE)
+YATRA_TITLE_LOOKAHEAD_LINES = 3  # Non-empty lines after a title line searched for a detail field
+SEPARATOR_RE = re.compile(r"^\s*([-=_*])\1{2,}\s*$")
+
+# A line that opens a new question: "Q:", "Q1.", "Question 3:", a heading or bold line ending in "?",
+# or a numbered line ending in "?"
+QUESTION_START_RE = re.compile(
+    r"^\s*(\*\*)?\s*(Q\s*\d*\s*[:.)\-]|Question\s*\d*\s*[:.)\-])"
+    r"|^\s*#{1,6}\s+.*\?\s*$"
+    r"|^\s*\*\*.*\?\s*\*\*\s*$"
+    r"|^\s*\d+[\.\)]\s+.*\?\s*(\*\*)?\s*$",
+    re.IGNORECASE
+)
+
+def _clean_title(line: str) -> str:
+    title = re.sub(r"^\s*(#{1,6}\s*|📍\s*|\d+[\.\)]\s*)", "", line)
+    title = re.sub(r"^(Q\s*\d*|Question\s*\d*)\s*[:.)\-]\s*", "", title.strip("*# \t"), flags=re.IGNORECASE)
+    return title.strip("*# \t")
+
+def _split_on_starts(content: str, is_start) -> List[str]:
+    """Split text into blocks, each beginning at a line for which is_start(lines, index) is true"""
+    blocks, current = [], []
+    lines = content.splitlines()
+    for index, line in enumerate(lines):
+        if SEPARATOR_RE.match(line):
+            if current:
+                blocks.append("\n".join(current).strip())
+            current = []
+            continue
+        if is_start(lines, index) and any(l.strip() for l in current):
+            blocks.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current).strip())
+    return [block for block in blocks if block]
+
+def _fit_unit(text: str, title: str, settings: dict) -> List[str]:
+    """Keep a unit whole when it fits; otherwise split it and repeat its title on every piece"""
+    if len(text) <= settings["chunk_size"]:
+        return [text]
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=settings["chunk_size"], chunk_overlap=settings["chunk_overlap"])
+    pieces = text_splitter.split_text(text)
+    return [pieces[0]] + [f"{title}\n{piece}" if title else piece for piece in pieces[1:]]
+
+def chunk_recursive(content: str, settings: dict):
+    """Fixed-size character chunks (the default for free-form policy text)"""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=settings["chunk_size"], chunk_overlap=settings["chunk_overlap"])
+    for text in text_splitter.split_text(content):
+        yield text, {}
+
+def chunk_yatra_entries(content: str, settings: dict):
+    """One chunk per yatra entry, so its dates, price and transport stay together; tagged with name and category"""
+    def is_start(lines, index):
+        line = lines[index]
+        if YATRA_HEADING_RE.match(line) or YATRA_NAME_FIELD_RE.match(line):
+            return True
+        if not YATRA_TITLE_RE.match(line):
+            return False
+        for previous in reversed(lines[:index]):
+            if YATRA_DETAIL_FIELD_RE.match(previous):
+                break
+            if YATRA_HEADING_RE.match(previous) or YATRA_NAME_FIELD_RE.match(previous):
+                return False  # Still inside an entry that has not listed its dates or price yet
+        seen = 0
+        for following in lines[index + 1:]:
+            if not following.strip():
+                continue
+            if YATRA_DETAIL_FIELD_RE.match(following):
+                return True
+            seen += 1
+            if seen >= YATRA_TITLE_LOOKAHEAD_LINES:
+                break
+        return False
+
+    blocks = _split_on_starts(content, is_start)
+    if len(blocks) < 2:
+        yield from chunk_recursive(content, settings)
+        return
+
+    for block in blocks:
+        lines = block.splitlines()
+        first_line = lines[0]
+        metadata = {}
+        if is_start(lines, 0) and len(lines) > 1:  # A lone title line (e.g. the file heading) is not an entry
+            name_field = YATRA_NAME_FIELD_RE.match(first_line)
+            metadata["yatra_name"] = _clean_title(name_field.group("name") if name_field else first_line)
+            category_match = YATRA_CATEGORY_RE.search(block)
+            if category_match:
+                metadata["yatra_category"] = category_match.group(1).capitalize()
+        title = first_line.strip() if metadata else ""
+        for text in _fit_unit(block, title, settings):
+            yield text, metadata
+
+def chunk_qa_pairs(content: str, settings: dict):
+    """One chunk per question with its answer; tagged with the question text"""
+    blocks = _split_on_starts(content, lambda lines, index: bool(QUESTION_START_RE.match(lines[index])))
+    if len(blocks) < 2:
+        yield from chunk_recursive(content, settings)
+        return
+
+    for block in blocks:
+        first_line = block.splitlines()[0]
+        metadata = {"question": _clean_title(first_line)} if QUESTION_START_RE.match(first_line) else {}
+        title = first_line.strip() if metadata else ""
+        for text in _fit_unit(block, title, settings):
+            yield text, metadata
+
+CHUNKERS = {
+    "recursive": chunk_recursive,
+    "yatra_entries": chunk_yatra_entries,
+    "qa_pairs": chunk_qa_pairs,
+}
+
+# ========================
+# INGEST PIPELINE
+# ========================
+
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))  # Chunks embedded (and written) per batch
+INGEST_QUEUE_DEPTH = int(os.getenv("INGEST_QUEUE_DEPTH", "4"))  # Embedded batches allowed to wait for the Chroma writer
+
+ingest_progress: dict = {}  # Latest progress per Chroma collection name (<tenant>_<collection> for tenants), exposed via /api/knowledge/ingest/progress
+
+def iter_file_chunks(collection_name: str, filename: str, content: str, settings: Optional[dict] = None, collections: Optional[dict] = None):
+    """Split one file's content once and yield (text, metadata) chunks tagged with their source"""
+    config = (collections or COLLECTIONS)[collection_name]
+    settings = settings or get_retrieval_settings(collection_name, collections)
+    chunker = CHUNKERS.get(settings.get("chunker"), chunk_recursive)
+    digest = content_hash(content)  # Lets bulk uploads skip files that are already stored unchanged
+    for text, extra_metadata in chunker(content, settings):
+        yield text, {"category": collection_name, "collection": config["name"], "source": filename, "content_hash": digest, **extra_metadata}
+
+def iter_knowledge_file_chunks(collection_name: str, file_paths: List[Path], collections: Optional[dict] = None):
+    """Read knowledge files one at a time and yield their chunks, so memory stays flat for large folders"""
+    for file_path in file_paths:
+        try:
+            content = file_path.read_text(encoding='utf-8')
+        except Exception as e:
+            print(f"❌ Error loading {file_path.name}: {e}")
+            continue
+        if content.strip():
+            yield from iter_file_chunks(collection_name, file_path.name, content, collections=collections)
+
+def _batched(chunks, batch_size: int):
+    """Group (text, metadata) chunks into lists of at most batch_size"""
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def run_ingest_pipeline(collection_name: str, chunks, embeddings, store=None) -> int:
+    """
+    Embed chunks in batches and write them to the collection's Chroma store (or `store`, for tenant collections).
+    Embedding runs on the calling thread while a writer thread drains a bounded queue,
+    so the next batch is embedded while the previous one is being written.
+    Returns the number of chunks written.
+    """
+    store = store or vector_stores[collection_name]
+    store_name = store._collection.name  # Unique across tenants, unlike the collection label
+    write_queue = queue.Queue(maxsize=INGEST_QUEUE_DEPTH)
+    write_errors = []
+    progress = {
+        "collection": collection_name,
+        "store": store_name,
+        "status": "running",
+        "batches_embedded": 0,
+        "batches_written": 0,
+        "chunks_embedded": 0,
+        "chunks_written": 0,
+        "started_at": time.time(),
+        "finished_at": None
+    }
+    ingest_progress[store_name] = progress
+
+    def writer():
+        while True:
+            batch = write_queue.get()
+            if batch is None:
+                return
+            if write_errors:
+                continue  # Keep draining so the embedding side never blocks on a full queue
+            ids, texts, vectors, metadatas = batch
+            try:
+                store._collection.add(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+            except Exception as e:
+                write_errors.append(e)
+                continue
+            progress["batches_written"] += 1
+            progress["chunks_written"] += len(ids)
+            print(f"💾 {collection_name}: batch {progress['batches_written']} written ({progress['chunks_written']} chunks so far)")
+
+    writer_thread = threading.Thread(target=writer, name=f"ingest-writer-{collection_name}", daemon=True)
+    writer_thread.start()
+    try:
+        for batch in _batched(chunks, INGEST_EMBED_BATCH_SIZE):
+            if write_errors:
+                break
+            texts = [text for text, _ in batch]
+            metadatas = [metadata for _, metadata in batch]
+            vectors = embeddings.embed_documents(texts)
+            ids = [str(uuid.uuid4()) for _ in texts]
+            progress["batches_embedded"] += 1
+            progress["chunks_embedded"] += len(texts)
+            write_queue.put((ids, texts, vectors, metadatas))
+    except Exception:
+        progress["status"] = "failed"
+        raise
+    finally:
+        write_queue.put(None)
+        writer_thread.join()
+        progress["finished_at"] = time.time()
+        invalidate_knowledge_stats()
+
+    if write_errors:
+        progress["status"] = "failed"
+        raise write_errors[0]
+
+    progress["status"] = "done"
+    return progress["chunks_written"]
+
 def _delete_documents_by_source(collection_name: str, filename: str):
     """Remove existing chunks with this source filename so re-upload = replace (Chroma Cloud or local)."""
     global vector_stores
@@ -460,349 +994,1813 @@ def _delete_documents_by_source(collection_name: str, filename: str):
     try:
         coll = vector_stores[collection_name]._collection
         coll.delete(where={"source": filename})
+        invalidate_knowledge_stats()
         print(f"🗑️ Replaced previous '{filename}' chunks in {collection_name} collection.")
     except Exception as e:
         print(f"⚠️ No previous chunks to replace for '{filename}' (or delete failed): {e}")
 
 
-def ingest_content_to_collection(collection_name: str, content: str, filename: str, embeddings, append: bool = True):
+def ingest_content_to_collection(collection_name: str, content: str, filename: str, embeddings):
     """Ingest content directly to a collection (cloud or local). Re-uploading the same filename replaces its chunks."""
     global vector_stores
-    
+
     print(f"\n📥 Ingesting '{filename}' to {collection_name} collection...")
-    
-    config = COLLECTIONS[collection_name]
-    
+
     # Replace-by-filename: remove existing chunks from this file so upload = update
     _delete_documents_by_source(collection_name, filename)
-    
-    # Split text into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    splits = text_splitter.create_documents(
-        [content],
-        metadatas=[{"category": collection_name, "collection": config["name"], "source": filename}] * len([content])
-    )
-    
-    # Re-split to get proper metadata for each chunk
-    splits = text_splitter.create_documents([content])
-    for split in splits:
-        split.metadata = {"category": collection_name, "collection": config["name"], "source": filename}
-    
-    print(f"💾 Adding {len(splits)} chunks to {collection_name} collection...")
-    
-    if CHROMA_USE_CLOUD:
-        import chromadb
-        tenant_id = CHROMA_CLOUD_HOST.split('.')[0]
-        chroma_client = chromadb.CloudClient(
-            api_key=CHROMA_CLOUD_API_KEY,
-            tenant=tenant_id,
-            database='OorzaYatra'
-        )
-        
-        # Get or create collection
-        if collection_name not in vector_stores:
-            vector_stores[collection_name] = Chroma(
-                client=chroma_client,
-                collection_name=config["name"],
-                embedding_function=embeddings
-            )
-        
-        vector_stores[collection_name].add_documents(splits)
-    else:
-        # Use local persistent storage
-        if collection_name not in vector_stores:
-            vector_stores[collection_name] = Chroma(
-                collection_name=config["name"],
-                embedding_function=embeddings,
-                persist_directory=str(CHROMA_PERSIST_DIR)
-            )
-        
-        vector_stores[collection_name].add_documents(splits)
-    
-    print(f"✅ '{filename}' ingested to {collection_name} collection!")
-    return len(splits)
+
+    if collection_name not in vector_stores:
+        open_collection_store(collection_name, embeddings)
+
+    chunks_added = run_ingest_pipeline(collection_name, iter_file_chunks(collection_name, filename, content), embeddings)
+
+    refresh_vector_index(changed=[collection_name])
+    print(f"✅ '{filename}' ingested to {collection_name} collection ({chunks_added} chunks)!")
+    return chunks_added
 
 def reingest_collection(collection_name: str, embeddings):
     """Reingest only a specific collection from local files (legacy support)"""
     global vector_stores
-    
+
     print(f"\n🔄 Re-ingesting {collection_name} collection...")
-    
-    # Load all files for this collection
-    collections_data = load_knowledge_by_collection()
-    collection_content = collections_data.get(collection_name, [])
-    
-    if not collection_content:
+
+    # Find all files for this collection
+    file_paths = group_knowledge_files_by_collection().get(collection_name, [])
+
+    if not file_paths:
         print(f"⚠️ No content for {collection_name} collection")
         return
-    
-    # Get collection config
-    config = COLLECTIONS[collection_name]
-    
-    # Combine all documents for this collection
-    combined_content = "\n\n---\n\n".join(collection_content)
-    
-    # Split text into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    splits = text_splitter.create_documents(
-        [combined_content],
-        metadatas=[{"category": collection_name, "collection": config["name"]}] * len([combined_content])
-    )
-    
-    print(f"💾 Updating {collection_name} collection ({len(splits)} chunks)...")
-    
-    if CHROMA_USE_CLOUD:
-        # Use Chroma Cloud
-        import chromadb
-        tenant_id = CHROMA_CLOUD_HOST.split('.')[0]
-        chroma_client = chromadb.CloudClient(
-            api_key=CHROMA_CLOUD_API_KEY,
-            tenant=tenant_id,
-            database='OorzaYatra'
-        )
-        
-        # Delete existing collection and recreate
-        try:
-            chroma_client.delete_collection(name=config["name"])
-            print(f"🗑️ Deleted old {collection_name} collection")
-        except:
-            pass
-        
-        vector_stores[collection_name] = Chroma(
-            client=chroma_client,
-            collection_name=config["name"],
-            embedding_function=embeddings
-        )
-        vector_stores[collection_name].add_documents(splits)
-    else:
-        # Use local persistent storage
-        # Delete and recreate collection
-        try:
-            old_collection = Chroma(
-                collection_name=config["name"],
-                embedding_function=embeddings,
-                persist_directory=str(CHROMA_PERSIST_DIR)
-            )
-            old_collection.delete_collection()
-            print(f"🗑️ Deleted old {collection_name} collection")
-        except:
-            pass
-        
-        vector_stores[collection_name] = Chroma.from_documents(
-            documents=splits,
-            embedding=embeddings,
-            collection_name=config["name"],
-            persist_directory=str(CHROMA_PERSIST_DIR)
-        )
-    
+
+    open_collection_store(collection_name, embeddings, reset=True)
+    chunks_added = run_ingest_pipeline(collection_name, iter_knowledge_file_chunks(collection_name, file_paths), embeddings)
+
     # Update hash file
     save_knowledge_hash()
-    print(f"✅ {collection_name} collection updated successfully!")
+    refresh_vector_index(changed=[collection_name])
+    print(f"✅ {collection_name} collection updated successfully ({chunks_added} chunks)!")
+
+def get_embedding_model():
+    """Load the shared embedding model once (reused by startup, snapshot loading and retrieval)"""
+    global embedding_model
+    if embedding_model is not None:
+        return embedding_model
 
-def initialize_vector_store():
-    """Initialize ChromaDB with multiple collections"""
-    global vector_stores
-    
     # Initialize embeddings model with increased timeout
-    print("\n🔄 Loading embedding model...")
+    print(f"\n🔄 Loading embedding model ({EMBEDDING_MODEL_NAME}, {EMBEDDING_BACKEND})...")
     try:
-        # Set environment variable for HuggingFace timeout
-        os.environ['HF_HUB_DOWNLOAD_TIMEOUT'] = '300'  # 5 minutes
-        
-        embeddings = HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        if torch_threads is None:
+            set_torch_threads(TORCH_THREADS_PER_WORKER or max(1, available_cpu_cores() // max(1, SERVER_WORKERS)))
+        embedding_model = load_embedding_backend(EMBEDDING_BACKEND)
     except Exception as e:
         print(f"⚠️ Error loading embedding model: {e}")
         print("💡 Tip: The model is downloading from HuggingFace. Please wait or check your internet connection.")
         raise
-    
+    return embedding_model
+
+def initialize_vector_store(refresh_index: bool = True):
+    """Initialize ChromaDB with multiple collections"""
+    global vector_stores
+
+    embeddings = get_embedding_model()
+
+    chroma_client = get_chroma_client() if CHROMA_USE_CLOUD else None
+
     # Check if we need to re-ingest
     if should_reingest():
         print("📚 Loading knowledge base by collections...")
-        collections_data = load_knowledge_by_collection()
-        
+        collections_files = group_knowledge_files_by_collection()
+
         # Initialize each collection
-        for category, config in COLLECTIONS.items():
-            collection_content = collections_data.get(category, [])
-            
-            if not collection_content:
+        for category in COLLECTIONS.keys():
+            file_paths = collections_files.get(category, [])
+
+            if not file_paths:
                 print(f"⚠️ No content for {category} collection")
                 continue
-            
-            # Combine all documents for this collection
-            combined_content = "\n\n---\n\n".join(collection_content)
-            
-            # Split text into chunks
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-            splits = text_splitter.create_documents(
-                [combined_content],
-                metadatas=[{"category": category, "collection": config["name"]}] * len([combined_content])
-            )
-            
-            # Create persistent Chroma vector store for this collection
-            print(f"💾 Ingesting {category} collection ({len(splits)} chunks)...")
-            
-            if CHROMA_USE_CLOUD:
-                # Use Chroma Cloud
-                import chromadb
-                # Extract tenant ID from host (format: tenant.api.trychroma.com)
-                tenant_id = CHROMA_CLOUD_HOST.split('.')[0]
-                chroma_client = chromadb.CloudClient(
-                    api_key=CHROMA_CLOUD_API_KEY,
-                    tenant=tenant_id,
-                    database='OorzaYatra'
-                )
-                
-                # Delete existing collection first to prevent duplicates
-                try:
-                    chroma_client.delete_collection(name=config["name"])
-                    print(f"🗑️ Deleted old {category} collection from cloud")
-                except:
-                    pass
-                
-                vector_stores[category] = Chroma(
-                    client=chroma_client,
-                    collection_name=config["name"],
-                    embedding_function=embeddings
-                )
-                vector_stores[category].add_documents(splits)
-            else:
-                # Use local persistent storage
-                vector_stores[category] = Chroma.from_documents(
-                    documents=splits,
-                    embedding=embeddings,
-                    collection_name=config["name"],
-                    persist_directory=str(CHROMA_PERSIST_DIR)
-                )
-        
+
+            # Recreate the collection and stream its files through the batched pipeline
+            print(f"💾 Ingesting {category} collection ({len(file_paths)} files)...")
+            open_collection_store(category, embeddings, reset=True, chroma_client=chroma_client)
+            chunks_added = run_ingest_pipeline(category, iter_knowledge_file_chunks(category, file_paths), embeddings)
+            print(f"✅ {category}: {chunks_added} chunks")
+
         # Save hash to prevent re-ingestion
         save_knowledge_hash()
         print(f"✅ All {len(vector_stores)} collections initialized successfully!")
     else:
         # Load existing vector stores
-        if CHROMA_USE_CLOUD:
-            print("📂 Loading existing collections from Chroma Cloud...")
-            import chromadb
-            # Extract tenant ID from host (format: tenant.api.trychroma.com)
-            tenant_id = CHROMA_CLOUD_HOST.split('.')[0]
-            chroma_client = chromadb.CloudClient(
-                api_key=CHROMA_CLOUD_API_KEY,
-                tenant=tenant_id,
-                database='OorzaYatra'
-            )
-            for category, config in COLLECTIONS.items():
-                try:
-                    vector_stores[category] = Chroma(
-                        client=chroma_client,
-                        collection_name=config["name"],
-                        embedding_function=embeddings
-                    )
-                    print(f"✅ Loaded: {category} (from cloud)")
-                except Exception as e:
-                    print(f"⚠️ Could not load {category} from cloud: {e}")
-        else:
-            print("📂 Loading existing collections from disk...")
-            for category, config in COLLECTIONS.items():
-                try:
-                    vector_stores[category] = Chroma(
-                        collection_name=config["name"],
-                        embedding_function=embeddings,
-                        persist_directory=str(CHROMA_PERSIST_DIR)
-                    )
-                    print(f"✅ Loaded: {category}")
-                except Exception as e:
-                    print(f"⚠️ Could not load {category}: {e}")
-        
         storage_location = "Chroma Cloud" if CHROMA_USE_CLOUD else "disk"
+        print(f"📂 Loading existing collections from {storage_location}...")
+        for category in COLLECTIONS.keys():
+            try:
+                open_collection_store(category, embeddings, chroma_client=chroma_client)
+                print(f"✅ Loaded: {category}")
+            except Exception as e:
+                print(f"⚠️ Could not load {category}: {e}")
+
         print(f"✅ {len(vector_stores)} collections loaded from {storage_location} (no re-ingestion needed).")
 
+    if refresh_index:
+        refresh_vector_index()
+
 # ========================
-# MODELS & UTILS
+# BULK UPLOAD
 # ========================
 
-class ChatMessage(BaseModel):
-    role: str
-    content: str
-
-class ChatRequest(BaseModel):
-    message: str
-    conversation_history: Optional[List[ChatMessage]] = []
-    session_id: Optional[str] = None
+BULK_UPLOAD_MAX_FILES = int(os.getenv("BULK_UPLOAD_MAX_FILES", "500"))  # Files per bulk upload, archive entries included
+BULK_UPLOAD_MAX_FILE_MB = float(os.getenv("BULK_UPLOAD_MAX_FILE_MB", "20"))  # Per file (archive entries are checked before extraction)
+KNOWLEDGE_FILE_EXTENSIONS = ('.txt', '.md', '.pdf')
 
-class ChatResponse(BaseModel):
-    response: str
-    session_id: str
-    should_escalate: bool = False
-    escalation_reason: Optional[str] = None
-    links: Optional[List[dict]] = None
-    used_rag: bool = True
-    show_live_agent_option: bool = False
-    show_callback_option: bool = False
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-failed_attempts: dict = {}
+def extract_upload_text(filename: str, content: bytes) -> str:
+    """Text of an uploaded .txt, .md or .pdf file (HTTPException when it cannot be read)"""
+    if filename.lower().endswith('.pdf'):
+        try:
+            from PyPDF2 import PdfReader
+        except ImportError:
+            raise HTTPException(500, "PDF parsing library not installed")
+        try:
+            pdf_reader = PdfReader(io.BytesIO(content))
+            content_str = ""
+            for page in pdf_reader.pages:
+                text = page.extract_text()
+                if text:
+                    content_str += text + "\n"
+        except Exception as e:
+            raise HTTPException(400, f"Failed to parse PDF: {str(e)}")
+        if not content_str.strip():
+            raise HTTPException(400, "Could not extract text from PDF")
+        return content_str
 
-def get_rag_response(query: str, chat_history: List):
-    """Get RAG response by searching across all collections"""
-    if not vector_stores:
-        raise ValueError("Vector stores not initialized")
-    
-    if not OPENAI_API_KEY:
-        raise ValueError("OpenAI API key not configured")
-        
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        api_key=OPENAI_API_KEY,
-        temperature=0.3,
-        max_tokens=512  # Limit response length to keep answers concise
-    )
-    
-    # Search across all collections and gather results
-    all_docs = []
-    for category, store in vector_stores.items():
-        retriever = store.as_retriever(search_kwargs={"k": 4})  # Get top 4 from each for better coverage
-        docs = retriever.invoke(query)
-        # Add category info to each doc
-        for doc in docs:
-            doc.metadata["source_category"] = category
-            all_docs.append(doc)
-    
-    # Check if we have any relevant documents
-    if not all_docs:
-        return "🙏 Namaste! I apologize, but I don't have that information right now. Please contact our support team at +91-9205661114 or visit https://oorzaayatra.com for assistance. We're happy to help! ✨"
-    
-    # Sort by relevance (if needed) and take top results
-    # For now, we'll use all retrieved docs
-    context_parts = []
-    for doc in all_docs[:10]:  # Limit to 10 total docs for better coverage
-        category = doc.metadata.get("source_category", "unknown")
-        context_parts.append(f"[{category.upper()}]\n{doc.page_content}")
-    
-    context = "\n\n---\n\n".join(context_parts)
-    
-    # Build prompt with context and history
-    messages = [SystemMessage(content=SYSTEM_PROMPT + f"\n\nContext:\n{context}")]
-    messages.extend(chat_history)
-    messages.append(HumanMessage(content=query))
-    
-    # Get response
-    response = llm.invoke(messages)
-    return response.content
+    try:
+        return content.decode('utf-8')
+    except UnicodeDecodeError:
+        raise HTTPException(400, "File must be valid UTF-8 text")
 
-def detect_links_needed(message: str) -> List[dict]:
-    """Detect links based on keywords"""
-    links = []
-    msg = message.lower()
-    
-    if any(w in msg for w in ["register", "join", "book", "sign up", "login"]):
-        links.append({"text": "Register/Login", "url": "https://oorzaayatra.com/login", "type": "registration"})
-    # Payment Options link removed as per user request
-    # if any(w in msg for w in ["pay", "money", "cost", "price"]):
+def iter_upload_sources(saved_files: List[tuple]):
+    """
+    Yield (filename, bytes or None, problem or None) for uploaded files saved on disk, expanding .zip archives
+    entry by entry so only one file's bytes are in memory at a time
+    """
+    max_bytes = BULK_UPLOAD_MAX_FILE_MB * 1024 * 1024
+    for path, filename in saved_files:
+        if not filename.lower().endswith(".zip"):
+            if path.stat().st_size > max_bytes:
+                yield filename, None, f"larger than {BULK_UPLOAD_MAX_FILE_MB:g} MB"
+            else:
+                yield filename, path.read_bytes(), None
+            continue
+        try:
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    name = Path(info.filename).name
+                    if info.is_dir() or not name or name.startswith(".") or "__MACOSX" in info.filename:
+                        continue
+                    if not name.lower().endswith(KNOWLEDGE_FILE_EXTENSIONS):
+                        yield name, None, "unsupported file type"
+                    elif info.file_size > max_bytes:
+                        yield name, None, f"larger than {BULK_UPLOAD_MAX_FILE_MB:g} MB"
+                    else:
+                        yield name, archive.read(info), None
+        except zipfile.BadZipFile:
+            yield filename, None, "not a valid zip archive"
+
+def bulk_ingest(sources, collection: Optional[str] = None, mappings: Optional[dict] = None, tenant: Optional[str] = None) -> dict:
+    """
+    Ingest many files in one pass: route each to a collection (mapping, forced collection or categorize_file),
+    skip files whose content hash matches what is already stored under that name, then run one batched
+    embed/write pipeline per collection and rebuild the read index once.
+    """
+    started = time.perf_counter()
+    kb = tenant_registry.get(tenant) if tenant else None
+    collections = kb.config.collections if kb else COLLECTIONS
+    categorize = kb.config.categorize_file if kb else categorize_file
+    embeddings = get_embedding_model()
+    mappings = mappings or {}
+
+    planned = {}       # category -> [(filename, text, hash)]
+    seen_hashes = {}   # hash -> filename, to drop identical files within this upload
+    seen_names = set()
+    skipped = []
+    for count, (filename, data, problem) in enumerate(sources):
+        if count >= BULK_UPLOAD_MAX_FILES:
+            skipped.append({"filename": filename, "reason": f"over the {BULK_UPLOAD_MAX_FILES} file limit"})
+            continue
+        if problem:
+            skipped.append({"filename": filename, "reason": problem})
+            continue
+        try:
+            text = extract_upload_text(filename, data)
+        except HTTPException as e:
+            skipped.append({"filename": filename, "reason": e.detail})
+            continue
+        if not text.strip():
+            skipped.append({"filename": filename, "reason": "empty"})
+            continue
+        category = mappings.get(filename) or collection or categorize(filename)
+        if category not in collections:
+            skipped.append({"filename": filename, "reason": f"unknown collection '{category}'"})
+            continue
+        digest = content_hash(text)
+        if digest in seen_hashes or filename in seen_names:
+            skipped.append({"filename": filename, "reason": f"duplicate of {seen_hashes.get(digest, filename)} in this upload"})
+            continue
+        seen_hashes[digest] = filename
+        seen_names.add(filename)
+        planned.setdefault(category, []).append((filename, text, digest))
+
+    ingested = []
+    for category, files in planned.items():
+        if kb:
+            store = kb.stores[category]
+        else:
+            store = vector_stores.get(category) or open_collection_store(category, embeddings)
+
+        # One metadata read per collection tells which files are already stored with the same content
+        stored_hashes = {}
+        for metadata in store._collection.get(include=["metadatas"])["metadatas"] or []:
+            if metadata and metadata.get("content_hash"):
+                stored_hashes[metadata.get("source")] = metadata["content_hash"]
+        changed = []
+        for filename, text, digest in files:
+            if stored_hashes.get(filename) == digest:
+                skipped.append({"filename": filename, "reason": "unchanged"})
+            else:
+                changed.append((filename, text))
+        if not changed:
+            continue
+
+        # Replace-by-filename, like single uploads
+        replaced = [filename for filename, _ in changed if filename in stored_hashes]
+        if replaced:
+            store._collection.delete(where={"source": {"$in": replaced}})
+
+        chunk_counts = Counter()
+        def counted_chunks():
+            for filename, text in changed:
+                for chunk in iter_file_chunks(category, filename, text, collections=collections if kb else None):
+                    chunk_counts[filename] += 1
+                    yield chunk
+
+        run_ingest_pipeline(f"{tenant}/{category}" if tenant else category, counted_chunks(), embeddings, store=store)
+        ingested.extend({"filename": filename, "collection": category, "chunks": chunk_counts[filename], "replaced": filename in replaced}
+                        for filename, _ in changed)
+
+    if ingested:
+        changed_categories = {item["collection"] for item in ingested}
+        if kb:
+            kb.refresh_index(changed=changed_categories)
+            announce_knowledge_change()
+        else:
+            refresh_vector_index(changed=changed_categories)
+    invalidate_knowledge_stats()
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    print(f"📦 Bulk upload: {len(ingested)} files ingested, {len(skipped)} skipped in {elapsed_ms:.0f} ms")
+    return {
+        "ingested": ingested,
+        "skipped": skipped,
+        "chunks": sum(item["chunks"] for item in ingested),
+        "elapsed_ms": elapsed_ms
+    }
+
+# ========================
+# IN-MEMORY VECTOR INDEX
+# ========================
+
+VECTOR_INDEX_ENABLED = os.getenv("VECTOR_INDEX_ENABLED", "false").lower() == "true"
+VECTOR_INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float32")  # float32 or float16 (half the memory)
+
+vector_index = None  # VectorIndex used by the read path when enabled; Chroma stays the system of record
+
+class VectorIndex:
+    """
+    Every chunk vector from every collection in one contiguous matrix.
+    Rows are grouped by category so a single matrix-vector product scores the whole
+    corpus and each collection's top-k is taken from its own slice of the scores.
+    """
+
+    def __init__(self, vectors: np.ndarray, categories: List[str], category_codes: np.ndarray, texts: List[str], metadatas: List[dict]):
+        self.vectors = vectors
+        self.categories = categories
+        self.category_codes = category_codes
+        self.texts = texts
+        self.metadatas = metadatas
+        # Row range [start, end) of each category, derived from the category column
+        self.offsets = {}
+        for code, category in enumerate(categories):
+            rows = np.flatnonzero(category_codes == code)
+            if len(rows):
+                self.offsets[category] = (int(rows[0]), int(rows[-1]) + 1)
+
+    @classmethod
+    def from_stores(cls, stores: dict, dtype: str = "float32", collections: Optional[dict] = None,
+                    previous: Optional["VectorIndex"] = None, changed: Iterable[str] = ()) -> "VectorIndex":
+        """
+        Load vectors, texts and metadata from each Chroma store into one matrix. With `previous`, categories outside
+        `changed` whose row count still matches Chroma are copied from it instead of being re-read.
+        """
+        categories = [category for category in (collections or COLLECTIONS).keys() if category in stores]
+        vector_blocks, code_blocks, texts, metadatas = [], [], [], []
+        for code, category in enumerate(categories):
+            if previous is not None and category not in changed and category in previous.categories:
+                start, end = previous.offsets.get(category, (0, 0))
+                if stores[category]._collection.count() == end - start:
+                    if end > start:
+                        vector_blocks.append(previous.vectors[start:end])
+                        code_blocks.append(np.full(end - start, code, dtype=np.int16))
+                        texts.extend(previous.texts[start:end])
+                        metadatas.extend(previous.metadatas[start:end])
+                    continue
+            data = stores[category]._collection.get(include=["embeddings", "documents", "metadatas"])
+            embeddings = data.get("embeddings")
+            if embeddings is None or len(embeddings) == 0:
+                continue
+            vector_blocks.append(np.asarray(embeddings, dtype=np.float32))
+            code_blocks.append(np.full(len(data["documents"]), code, dtype=np.int16))
+            texts.extend(data["documents"])
+            metadatas.extend(metadata or {} for metadata in data["metadatas"])
+
+        if vector_blocks:
+            vectors = np.ascontiguousarray(np.vstack(vector_blocks), dtype=dtype)
+            category_codes = np.concatenate(code_blocks)
+        else:
+            vectors = np.zeros((0, 0), dtype=dtype)
+            category_codes = np.zeros(0, dtype=np.int16)
+        return cls(vectors, categories, category_codes, texts, metadatas)
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.category_codes.nbytes
+
+    def search(self, query_vector, k=4) -> List[Document]:
+        """Top-k chunks per collection (by inner product on normalized vectors); k is an int or a {category: k} dict"""
+        if not len(self):
+            return []
+        query = np.asarray(query_vector, dtype=self.vectors.dtype)
+        scores = self.vectors @ query
+
+        docs = []
+        for category in self.categories:
+            if category not in self.offsets:
+                continue
+            start, end = self.offsets[category]
+            category_scores = scores[start:end]
+            top_k = min(k.get(category, RETRIEVAL_K) if isinstance(k, dict) else k, end - start)
+            if top_k <= 0:
+                continue
+            top = np.argpartition(-category_scores, top_k - 1)[:top_k]
+            top = top[np.argsort(-category_scores[top])]
+            for row in top + start:
+                metadata = dict(self.metadatas[row])
+                metadata["score"] = float(scores[row])
+                docs.append(Document(page_content=self.texts[row], metadata=metadata))
+        return docs
+
+def refresh_vector_index(changed: Optional[Iterable[str]] = None):
+    """
+    Rebuild the in-memory index from Chroma (called after every ingest) and, with Chroma Cloud, rewrite the local mirror.
+    With `changed`, only those collections are re-read; the rest are copied from the current index.
+    No-op unless enabled, mirroring the cloud or serving a snapshot.
+    """
+    global vector_index
+    if not (VECTOR_INDEX_ENABLED or CHROMA_MIRROR_ENABLED or vector_index is not None) or not vector_stores:
+        return
+    try:
+        started = time.perf_counter()
+        # Taken before reading the vectors: a write in between leaves the mirror looking stale, never falsely current
+        fingerprints = chroma_fingerprints() if CHROMA_MIRROR_ENABLED else None
+        if changed is None:
+            new_index = VectorIndex.from_stores(vector_stores, dtype=VECTOR_INDEX_DTYPE)
+        else:
+            new_index = VectorIndex.from_stores(vector_stores, dtype=VECTOR_INDEX_DTYPE, previous=vector_index, changed=set(changed))
+        vector_index = new_index  # Swap in one assignment so readers never see a half-built index
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"🧮 Vector index refreshed: {len(new_index)} chunks, {new_index.nbytes / 1024:.0f} KB ({VECTOR_INDEX_DTYPE}) in {elapsed_ms:.0f} ms")
+        if fingerprints is not None:
+            save_mirror(new_index, fingerprints)
+        elif prefork_workers > 1:
+            # Sibling workers map this file rather than re-reading Chroma (the local store is not multi-process safe)
+            save_snapshot(new_index, PREFORK_INDEX_PATH, knowledge_hash="")
+        announce_knowledge_change()
+    except Exception as e:
+        # Keep serving the previous index (if any); without one, retrieval falls back to Chroma queries
+        print(f"⚠️ Could not refresh vector index: {e}")
+
+# ========================
+# KNOWLEDGE SNAPSHOT
+# ========================
+
+# Base path of the snapshot: <base>.jsonl holds a header line plus one row per chunk, and the header names the
+# <base>.<version>.npy file with the vector matrix. Replacing the .jsonl is the single atomic switch, so a reader
+# (another worker, a mirror or pre-fork index reload) always gets rows and vectors written together
+KNOWLEDGE_SNAPSHOT_PATH = Path(os.getenv("KNOWLEDGE_SNAPSHOT_PATH", str(Path(__file__).parent / "knowledge_snapshot")))
+SNAPSHOT_FORMAT_VERSION = 2
+SNAPSHOT_READABLE_VERSIONS = (1, 2)  # Version 1 kept the vectors in <base>.npy
+
+def _snapshot_files(base_path: Path):
+    """(vectors file, rows file): the vectors file named by the current header, else the version 1 <base>.npy"""
+    base_path = Path(base_path)
+    rows_file = base_path.with_suffix(".jsonl")
+    vectors_name = None
+    if rows_file.exists():
+        with open(rows_file, "r", encoding="utf-8") as f:
+            vectors_name = json.loads(f.readline() or "{}").get("vectors_file")
+    return (base_path.parent / vectors_name if vectors_name else base_path.with_suffix(".npy")), rows_file
+
+def snapshot_exists(base_path: Path) -> bool:
+    return Path(base_path).with_suffix(".jsonl").exists()
+
+def _snapshot_vector_files(base_path: Path) -> List[Path]:
+    base_path = Path(base_path)
+    return [base_path.with_suffix(".npy")] + sorted(base_path.parent.glob(f"{base_path.name}.*.npy"))
+
+def remove_snapshot(base_path: Path):
+    Path(base_path).with_suffix(".jsonl").unlink(missing_ok=True)
+    for vectors_file in _snapshot_vector_files(base_path):
+        vectors_file.unlink(missing_ok=True)
+
+def save_snapshot(index: VectorIndex, base_path: Path, knowledge_hash: str, extra_header: Optional[dict] = None,
+                  keep_previous: bool = True):
+    """
+    Write an index to a new <base>.<version>.npy, then switch <base>.jsonl to it with one rename.
+    The previous vectors file is kept (keep_previous) for readers that read the old header just before the switch.
+    """
+    base_path = Path(base_path)
+    base_path.parent.mkdir(parents=True, exist_ok=True)
+    previous_vectors_file = _snapshot_files(base_path)[0] if snapshot_exists(base_path) else None
+    version = f"{time.time_ns()}-{os.getpid()}"
+    vectors_file = base_path.with_name(f"{base_path.name}.{version}.npy")
+    rows_file = base_path.with_suffix(".jsonl")
+    tmp_rows = rows_file.with_name(f"{rows_file.name}.{version}.tmp")
+
+    with open(vectors_file, "wb") as f:
+        np.save(f, np.ascontiguousarray(index.vectors))
+    with open(tmp_rows, "w", encoding="utf-8") as f:
+        header = {
+            "format": "mitraa-knowledge-snapshot",
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "vectors_file": vectors_file.name,
+            "knowledge_hash": knowledge_hash,
+            "rows": len(index),
+            "dtype": str(index.vectors.dtype),
+            "categories": index.categories,
+            "collections": {category: COLLECTIONS[category]["name"] for category in index.categories if category in COLLECTIONS},
+            "created_at": time.time(),
+            **(extra_header or {})
+        }
+        f.write(json.dumps(header) + "\n")
+        for code, text, metadata in zip(index.category_codes, index.texts, index.metadatas):
+            f.write(json.dumps({"category": index.categories[code], "text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+
+    os.replace(tmp_rows, rows_file)
+    keep = {vectors_file, previous_vectors_file} if keep_previous else {vectors_file}
+    for old_vectors_file in _snapshot_vector_files(base_path):
+        if old_vectors_file not in keep:
+            old_vectors_file.unlink(missing_ok=True)
+
+def load_snapshot(base_path: Path, mmap: bool = True):
+    """Load a snapshot as a VectorIndex. With mmap=True the vectors stay on disk and are paged in on demand."""
+    base_path = Path(base_path)
+    rows_file = base_path.with_suffix(".jsonl")
+    with open(rows_file, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != "mitraa-knowledge-snapshot" or header.get("version") not in SNAPSHOT_READABLE_VERSIONS:
+            raise ValueError(f"Unsupported snapshot format in {rows_file}")
+        vectors_file = base_path.parent / header["vectors_file"] if header.get("vectors_file") else base_path.with_suffix(".npy")
+        categories = header["categories"]
+        codes = {category: code for code, category in enumerate(categories)}
+        category_codes, texts, metadatas = [], [], []
+        for line in f:
+            row = json.loads(line)
+            category_codes.append(codes[row["category"]])
+            texts.append(row["text"])
+            metadatas.append(row["metadata"])
+
+    vectors = np.load(vectors_file, mmap_mode="r" if mmap else None)
+    if len(vectors) != len(texts):
+        raise ValueError(f"Snapshot is inconsistent: {len(vectors)} vectors but {len(texts)} rows")
+    index = VectorIndex(vectors, categories, np.asarray(category_codes, dtype=np.int16), texts, metadatas)
+    return index, header
+
+def export_snapshot(base_path: Path = KNOWLEDGE_SNAPSHOT_PATH):
+    """Export every collection (vectors, texts, metadata, knowledge hash) from Chroma to a snapshot"""
+    initialize_vector_store()
+    index = VectorIndex.from_stores(vector_stores, dtype=VECTOR_INDEX_DTYPE)
+    knowledge_hash = KNOWLEDGE_HASH_FILE.read_text() if KNOWLEDGE_HASH_FILE.exists() else get_knowledge_hash()
+    save_snapshot(index, base_path, knowledge_hash, keep_previous=False)  # Nothing reads an exported snapshot while it is written
+    print(f"📦 Snapshot exported: {len(index)} chunks → {_snapshot_files(base_path)[0].name} + {_snapshot_files(base_path)[1].name}")
+
+def import_snapshot(base_path: Path = KNOWLEDGE_SNAPSHOT_PATH):
+    """Replace the Chroma collections with the snapshot's contents (no re-embedding)"""
+    index, header = load_snapshot(base_path, mmap=True)
+    embeddings = get_embedding_model()
+    chroma_client = get_chroma_client() if CHROMA_USE_CLOUD else None
+
+    for category in index.categories:
+        if category not in COLLECTIONS or category not in index.offsets:
+            continue
+        start, end = index.offsets[category]
+        store = open_collection_store(category, embeddings, reset=True, chroma_client=chroma_client)
+        for batch_start in range(start, end, INGEST_EMBED_BATCH_SIZE):
+            batch_end = min(batch_start + INGEST_EMBED_BATCH_SIZE, end)
+            store._collection.add(
+                ids=[str(uuid.uuid4()) for _ in range(batch_start, batch_end)],
+                embeddings=np.asarray(index.vectors[batch_start:batch_end], dtype=np.float32).tolist(),
+                documents=index.texts[batch_start:batch_end],
+                metadatas=index.metadatas[batch_start:batch_end]
+            )
+        print(f"✅ Imported {end - start} chunks into {category} collection")
+
+    CHROMA_PERSIST_DIR.mkdir(exist_ok=True)
+    KNOWLEDGE_HASH_FILE.write_text(header.get("knowledge_hash", ""))
+    print(f"📦 Snapshot imported ({len(index)} chunks)")
+
+def load_snapshot_for_serving() -> bool:
+    """
+    Map the baked-in snapshot as the read index so chat can be served before Chroma is reached.
+    Skipped when there is no snapshot or the local knowledge/ folder has changed since it was taken.
+    """
+    global vector_index
+    if not snapshot_exists(KNOWLEDGE_SNAPSHOT_PATH):
+        return False
+
+    try:
+        index, header = load_snapshot(KNOWLEDGE_SNAPSHOT_PATH, mmap=True)
+    except Exception as e:
+        print(f"⚠️ Could not load knowledge snapshot: {e}")
+        return False
+
+    current_hash = get_knowledge_hash()
+    if current_hash and current_hash != header.get("knowledge_hash"):
+        print("⚠️ Knowledge snapshot is stale (knowledge/ changed since export), ignoring it.")
+        return False
+
+    get_embedding_model()
+    vector_index = index
+    if current_hash and not KNOWLEDGE_HASH_FILE.exists():
+        # The snapshot matches knowledge/, so the background Chroma connect must not re-embed it
+        save_knowledge_hash()
+    print(f"📦 Serving from knowledge snapshot: {len(index)} chunks ({header.get('dtype')}, memory-mapped)")
+    return True
+
+def connect_stores_behind_snapshot():
+    """Background startup when serving from a snapshot: connect Chroma for writes and seed it if empty"""
+    try:
+        connect_all_stores()
+        if all(store._collection.count() == 0 for store in vector_stores.values()):
+            print("📦 Chroma is empty, seeding it from the knowledge snapshot...")
+            import_snapshot(KNOWLEDGE_SNAPSHOT_PATH)
+        print("✅ Chroma connected behind the snapshot index")
+    except Exception as e:
+        print(f"⚠️ Chroma not available yet, still serving from the snapshot: {e}")
+
+# ========================
+# CHROMA CLOUD MIRROR
+# ========================
+
+# With Chroma Cloud, chat reads a local copy of every collection (snapshot format, memory-mapped on restart).
+# Cloud stays the source of truth for writes; the copy is rewritten after each ingest and whenever a periodic
+# check finds the cloud collections changed, so a cloud outage only makes answers less fresh.
+CHROMA_MIRROR_ENABLED = CHROMA_USE_CLOUD and os.getenv("CHROMA_MIRROR_ENABLED", "true").lower() == "true"
+CHROMA_MIRROR_PATH = Path(os.getenv("CHROMA_MIRROR_PATH", str(CHROMA_PERSIST_DIR / "cloud_mirror")))
+CHROMA_MIRROR_SYNC_SECONDS = float(os.getenv("CHROMA_MIRROR_SYNC_SECONDS", "300"))  # How often to compare the mirror with the cloud
+
+mirror_status = {
+    "enabled": CHROMA_MIRROR_ENABLED,
+    "path": str(CHROMA_MIRROR_PATH),
+    "chunks": 0,
+    "fingerprints": {},
+    "synced_at": None,     # Last time the mirror was rewritten from the cloud
+    "checked_at": None,    # Last successful version check
+    "last_error": None,
+    "sync_owner": False    # Whether this process runs the periodic check (one per machine with pre-fork workers)
+}
+
+mirror_sync_lock_file = None  # Held open for as long as this process owns the periodic check
+
+def chroma_fingerprints() -> dict:
+    """Per collection: chunk count plus a hash of the chunk ids (every ingest writes new ids, so any change shows)"""
+    fingerprints = {}
+    for category, store in vector_stores.items():
+        ids = sorted(store._collection.get(include=[])["ids"])
+        fingerprints[category] = f"{len(ids)}:{hashlib.sha1(''.join(ids).encode()).hexdigest()[:16]}"
+    return fingerprints
+
+def save_mirror(index: VectorIndex, fingerprints: dict):
+    save_snapshot(index, CHROMA_MIRROR_PATH, knowledge_hash="", extra_header={"mirror_fingerprints": fingerprints})
+    mirror_status.update(chunks=len(index), fingerprints=fingerprints, synced_at=time.time(), checked_at=time.time(), last_error=None)
+    print(f"🪞 Cloud mirror written: {len(index)} chunks → {_snapshot_files(CHROMA_MIRROR_PATH)[0]}")
+
+def load_mirror_for_serving() -> bool:
+    """Serve chat from the on-disk mirror right away (before, or without, reaching Chroma Cloud)"""
+    global vector_index
+    if not CHROMA_MIRROR_ENABLED:
+        return False
+    if not snapshot_exists(CHROMA_MIRROR_PATH):
+        return False
+    try:
+        index, header = load_snapshot(CHROMA_MIRROR_PATH, mmap=True)
+    except Exception as e:
+        print(f"⚠️ Could not load the cloud mirror: {e}")
+        return False
+    if header.get("collections") != {category: COLLECTIONS[category]["name"] for category in index.categories if category in COLLECTIONS}:
+        print("⚠️ Cloud mirror was written for different collections, ignoring it.")
+        return False
+
+    get_embedding_model()
+    vector_index = index
+    mirror_status.update(chunks=len(index), fingerprints=header.get("mirror_fingerprints", {}), synced_at=header.get("created_at"))
+    print(f"🪞 Serving from the local cloud mirror: {len(index)} chunks (written {time.ctime(header.get('created_at', 0))})")
+    return True
+
+def connect_all_stores():
+    """Open every collection's store (without rebuilding the read index)"""
+    initialize_vector_store(refresh_index=False)
+    embeddings = get_embedding_model()
+    for category in COLLECTIONS.keys():
+        if category not in vector_stores:
+            open_collection_store(category, embeddings)
+
+def open_existing_stores():
+    """Open the cloud collections for reading, without the re-ingest check initialize_vector_store() runs"""
+    embeddings = get_embedding_model()
+    chroma_client = get_chroma_client()
+    for category in COLLECTIONS.keys():
+        if category not in vector_stores:
+            open_collection_store(category, embeddings, chroma_client=chroma_client)
+
+def acquire_mirror_sync_lock() -> bool:
+    """
+    True if this process runs the periodic sync. Pre-fork workers all start the loop, but only the one holding this
+    lock polls the cloud; the others reload the mirror when it announces a change (and take over if it exits).
+    """
+    global mirror_sync_lock_file
+    if mirror_sync_lock_file is not None:
+        return True
+    CHROMA_MIRROR_PATH.parent.mkdir(parents=True, exist_ok=True)
+    lock_file = open(CHROMA_MIRROR_PATH.with_name(CHROMA_MIRROR_PATH.name + ".sync.lock"), "w")
+    try:
+        import fcntl
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except ImportError:
+        pass
+    except OSError:
+        lock_file.close()
+        return False
+    mirror_sync_lock_file = lock_file
+    mirror_status["sync_owner"] = True
+    return True
+
+def sync_mirror() -> bool:
+    """Rebuild the read index and mirror if the cloud collections changed since the last sync. Returns True if rebuilt."""
+    fingerprints = chroma_fingerprints()
+    mirror_status.update(checked_at=time.time(), last_error=None)
+    if fingerprints == mirror_status["fingerprints"] and vector_index is not None:
+        return False
+    print("🪞 Chroma Cloud collections changed, re-syncing the local mirror...")
+    refresh_vector_index()
+    return True
+
+def mirror_sync_loop(connect_first: bool = False):
+    """
+    Background thread in every process: open the cloud collections (uploads, fingerprints and admin stats need them in
+    every worker), then keep the mirror in step with the cloud. Only the lock holder syncs; failures keep the last
+    good copy serving.
+    """
+    if connect_first:
+        try:
+            connect_all_stores()  # Startup only: the periodic sync below never ingests
+        except Exception as e:
+            print(f"⚠️ Chroma Cloud not reachable yet, serving the local mirror: {e}")
+    while True:
+        mirror_sync_once()
+        time.sleep(CHROMA_MIRROR_SYNC_SECONDS)
+
+def mirror_sync_once():
+    try:
+        if not vector_stores:
+            open_existing_stores()
+        if acquire_mirror_sync_lock():
+            sync_mirror()
+    except Exception as e:
+        mirror_status["last_error"] = str(e)
+        print(f"⚠️ Chroma Cloud mirror sync failed, still serving the local copy: {e}")
+
+# ========================
+# TENANTS
+# ========================
+
+# Extra brands served by this process, each with its own collections, prompt and knowledge folder:
+# {"acme": {"display_name": "Acme Treks", "system_prompt_file": "tenants/acme/prompt.txt",
+#           "collections": {"treks": {"files": ["trek"], "description": "...", "chunker": "yatra_entries", "k": 3}}}}
+TENANTS_CONFIG_FILE = Path(os.getenv("TENANTS_CONFIG_FILE", str(Path(__file__).parent / "tenants.json")))
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "oorzaa")  # The built-in Oorzaa Yatra knowledge base (COLLECTIONS, SYSTEM_PROMPT)
+TENANT_MEMORY_CAP_MB = float(os.getenv("TENANT_MEMORY_CAP_MB", "256"))  # Loaded tenant indexes beyond this are evicted LRU
+TENANT_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,39}$")
+
+@dataclass
+class TenantConfig:
+    tenant_id: str
+    display_name: str
+    system_prompt: str
+    collections: dict                      # Same shape as COLLECTIONS ("name" defaults to <tenant>_<category>), settings inline
+    knowledge_dir: Path
+    collection_mappings: dict = field(default_factory=dict)  # filename -> collection, like knowledge/collection_mappings.json
+    contact_details: str = ""              # Contact block of turn-limit, fallback and timeout replies ("" = generic line)
+    contact_links: dict = field(default_factory=dict)  # Reply situation -> link buttons, same shape as SUPPORT_LINKS
+
+    def chroma_name(self, category: str) -> str:
+        return self.collections[category]["name"]
+
+    def categorize_file(self, filename: str) -> str:
+        if filename in self.collection_mappings:
+            return self.collection_mappings[filename]
+        filename_lower = filename.lower()
+        for category, config in self.collections.items():
+            if any(keyword in filename_lower for keyword in config.get("files", [])):
+                return category
+        return next(iter(self.collections))
+
+def load_tenant_configs() -> dict:
+    """Read tenants.json into {tenant_id: TenantConfig}; invalid entries are skipped with a warning"""
+    if not TENANTS_CONFIG_FILE.exists():
+        return {}
+    try:
+        raw = json.loads(TENANTS_CONFIG_FILE.read_text(encoding='utf-8'))
+    except Exception as e:
+        print(f"⚠️ Could not read {TENANTS_CONFIG_FILE.name}, serving only '{DEFAULT_TENANT}': {e}")
+        return {}
+
+    base_dir = TENANTS_CONFIG_FILE.parent
+    configs = {}
+    for tenant_id, entry in raw.items():
+        if not TENANT_ID_RE.match(tenant_id) or tenant_id == DEFAULT_TENANT:
+            print(f"⚠️ Skipping tenant '{tenant_id}': ids are lowercase letters, digits, '_' or '-' and not '{DEFAULT_TENANT}'")
+            continue
+        if not entry.get("collections"):
+            print(f"⚠️ Skipping tenant '{tenant_id}': no collections defined")
+            continue
+        system_prompt = entry.get("system_prompt", "")
+        if entry.get("system_prompt_file"):
+            try:
+                system_prompt = (base_dir / entry["system_prompt_file"]).read_text(encoding='utf-8')
+            except OSError as e:
+                print(f"⚠️ Skipping tenant '{tenant_id}': could not read its system_prompt_file: {e}")
+                continue
+        configs[tenant_id] = TenantConfig(
+            tenant_id=tenant_id,
+            display_name=entry.get("display_name", tenant_id),
+            system_prompt=system_prompt or SYSTEM_PROMPT,
+            collections={category: {"name": f"{tenant_id}_{category}", "files": [], "description": "", **config}
+                         for category, config in entry["collections"].items()},
+            knowledge_dir=base_dir / entry.get("knowledge_dir", f"tenants/{tenant_id}/knowledge"),
+            collection_mappings=entry.get("collection_mappings", {}),
+            contact_details=entry.get("contact_details", ""),
+            contact_links=entry.get("contact_links", {})
+        )
+    return configs
+
+class TenantKnowledgeBase:
+    """
+    One tenant's Chroma stores plus an in-memory VectorIndex over them (the part that costs memory).
+    Embeddings come from the shared model, so a tenant only adds its own vectors.
+    """
+
+    def __init__(self, config: TenantConfig):
+        self.config = config
+        self.stores = {}
+        self.index = None
+        self.text_bytes = 0
+        self.loaded_at = None
+
+    @property
+    def nbytes(self) -> int:
+        """Vectors plus chunk text (metadata overhead is not counted)"""
+        return self.index.nbytes + self.text_bytes if self.index is not None else 0
+
+    def _knowledge_files(self) -> List[Path]:
+        knowledge_dir = self.config.knowledge_dir
+        if not knowledge_dir.exists():
+            return []
+        return sorted(knowledge_dir.glob("*.txt")) + sorted(knowledge_dir.glob("*.md"))
+
+    def _knowledge_hash(self, file_paths: List[Path]) -> str:
+        hasher = hashlib.sha256()
+        for file_path in file_paths:
+            hasher.update(file_path.name.encode())
+            hasher.update(file_path.read_bytes())
+        hasher.update(json.dumps(self.config.collections, sort_keys=True).encode())
+        return hasher.hexdigest()
+
+    def load(self):
+        """Open the tenant's collections (re-ingesting its knowledge folder when it changed) and build its index"""
+        started = time.perf_counter()
+        embeddings = get_embedding_model()
+        chroma_client = get_chroma_client() if CHROMA_USE_CLOUD else None
+        file_paths = self._knowledge_files()
+        hash_file = CHROMA_PERSIST_DIR / f".knowledge_hash_{self.config.tenant_id}"
+        current_hash = self._knowledge_hash(file_paths) if file_paths else ""
+        reingest = bool(file_paths) and (not hash_file.exists() or hash_file.read_text() != current_hash)
+
+        files_by_collection = {category: [] for category in self.config.collections}
+        for file_path in file_paths:
+            files_by_collection.setdefault(self.config.categorize_file(file_path.name), []).append(file_path)
+
+        for category in self.config.collections:
+            label = f"{self.config.tenant_id}/{category}"
+            self.stores[category] = open_chroma_store(self.config.chroma_name(category), embeddings, reset=reingest, chroma_client=chroma_client, label=label)
+            if reingest and files_by_collection.get(category):
+                chunks = iter_knowledge_file_chunks(category, files_by_collection[category], collections=self.config.collections)
+                run_ingest_pipeline(label, chunks, embeddings, store=self.stores[category])
+
+        if reingest:
+            CHROMA_PERSIST_DIR.mkdir(exist_ok=True)
+            hash_file.write_text(current_hash)
+        self.refresh_index()
+        self.loaded_at = time.time()
+        print(f"🏢 Tenant '{self.config.tenant_id}' loaded: {len(self.index)} chunks, {self.nbytes / 1024:.0f} KB "
+              f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def refresh_index(self, changed: Optional[Iterable[str]] = None):
+        """Rebuild the tenant's index; with `changed`, only those collections are re-read from Chroma"""
+        previous = self.index if changed is not None else None
+        index = VectorIndex.from_stores(self.stores, dtype=VECTOR_INDEX_DTYPE, collections=self.config.collections,
+                                        previous=previous, changed=set(changed or ()))
+        self.index, self.text_bytes = index, sum(len(text.encode("utf-8")) for text in index.texts)
+
+    def ingest_content(self, category: str, content: str, filename: str) -> int:
+        """Replace-by-filename upload into one of the tenant's collections, then rebuild its index"""
+        store = self.stores[category]
+        try:
+            store._collection.delete(where={"source": filename})
+        except Exception as e:
+            print(f"⚠️ No previous chunks to replace for '{filename}' (or delete failed): {e}")
+        chunks = iter_file_chunks(category, filename, content, collections=self.config.collections)
+        chunks_added = run_ingest_pipeline(f"{self.config.tenant_id}/{category}", chunks, get_embedding_model(), store=store)
+        self.refresh_index(changed=[category])
+        announce_knowledge_change()
+        return chunks_added
+
+    def retrieve(self, query: str) -> List[Document]:
+        """Top-k chunks from each of the tenant's collections"""
+        k = {category: get_retrieval_settings(category, self.config.collections)["k"] for category in self.config.collections}
+        with timed_stage("rag.retrieval.embed_query"):
+            query_vector = get_embedding_model().embed_query(query)
+        with timed_stage("rag.retrieval.vector_search"):
+            docs = self.index.search(query_vector, k=k)
+        for doc in docs:
+            doc.metadata["source_category"] = doc.metadata.get("category", "unknown")
+        return docs
+
+class TenantRegistry:
+    """
+    Tenant knowledge bases loaded on first use and kept in LRU order.
+    When the loaded indexes exceed the memory cap the least recently used ones are dropped
+    (their data stays in Chroma, so the next request just reloads without re-embedding).
+    """
+
+    def __init__(self, configs: dict, memory_cap_bytes: int):
+        self.configs = configs
+        self.memory_cap_bytes = memory_cap_bytes
+        self.loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.counters = {"hits": 0, "loads": 0, "evictions": 0}
+
+    def get(self, tenant_id: str) -> TenantKnowledgeBase:
+        """The tenant's loaded knowledge base, loading it (and evicting others) if needed; blocks, so call off the event loop"""
+        with self._lock:
+            kb = self.loaded.get(tenant_id)
+            if kb is not None:
+                self.loaded.move_to_end(tenant_id)
+                self.counters["hits"] += 1
+                return kb
+            load_lock = self._load_locks.setdefault(tenant_id, threading.Lock())
+
+        # One loader per tenant; concurrent first requests for it wait here instead of loading twice
+        with load_lock:
+            with self._lock:
+                kb = self.loaded.get(tenant_id)
+                if kb is not None:
+                    self.loaded.move_to_end(tenant_id)
+                    return kb
+            kb = TenantKnowledgeBase(self.configs[tenant_id])
+            kb.load()
+            with self._lock:
+                self.loaded[tenant_id] = kb
+                self.counters["loads"] += 1
+                self._evict_over_cap()
+        return kb
+
+    def unload_all(self):
+        """Drop every loaded tenant (each reloads from Chroma on its next request)"""
+        with self._lock:
+            self.loaded.clear()
+
+    def _evict_over_cap(self):
+        # Never evict the most recently used tenant, even when it alone exceeds the cap
+        while len(self.loaded) > 1 and sum(kb.nbytes for kb in self.loaded.values()) > self.memory_cap_bytes:
+            tenant_id, kb = self.loaded.popitem(last=False)
+            self.counters["evictions"] += 1
+            print(f"♻️ Evicted tenant '{tenant_id}' ({kb.nbytes / 1024:.0f} KB) to stay under {TENANT_MEMORY_CAP_MB} MB")
+
+    def stats(self) -> dict:
+        with self._lock:
+            loaded = {tenant_id: {"chunks": len(kb.index), "bytes": kb.nbytes, "loaded_at": kb.loaded_at} for tenant_id, kb in self.loaded.items()}
+        return {
+            "configured": sorted(self.configs),
+            "loaded": loaded,
+            "memory_bytes": sum(item["bytes"] for item in loaded.values()),
+            "memory_cap_bytes": self.memory_cap_bytes,
+            **self.counters
+        }
+
+tenant_registry = TenantRegistry(load_tenant_configs(), int(TENANT_MEMORY_CAP_MB * 1024 * 1024))
+
+def resolve_tenant(tenant_id: Optional[str]) -> Optional[str]:
+    """None for the built-in knowledge base, else a configured tenant id (404 for unknown tenants)"""
+    if not tenant_id or tenant_id == DEFAULT_TENANT:
+        return None
+    if tenant_id not in tenant_registry.configs:
+        raise HTTPException(404, f"Unknown tenant '{tenant_id}'")
+    return tenant_id
+
+# ========================
+# ADMISSION CONTROL
+# ========================
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # LLM calls in flight at once (per process)
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))  # Requests allowed to wait for an LLM slot before 429s
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))  # Longest wait for a slot
+SESSION_RATE_LIMIT = int(os.getenv("SESSION_RATE_LIMIT", "10"))  # Chat requests per session per window (0 = off)
+SESSION_RATE_WINDOW_SECONDS = int(os.getenv("SESSION_RATE_WINDOW_SECONDS", "60"))
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers (0.0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; surfaced to the client as HTTP 429 with Retry-After"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LLMAdmissionController:
+    """
+    Global limit on concurrent LLM calls. Callers beyond the limit wait in a bounded queue;
+    when the queue is full (or the wait times out) they are rejected right away instead of piling up.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_times = deque(maxlen=500)  # Seconds spent queued, most recent admissions
+        self.hold_times = deque(maxlen=500)  # Seconds each admitted call held its slot
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: queued work divided across slots, times the typical call"""
+        typical_hold = (sum(self.hold_times) / len(self.hold_times)) if self.hold_times else 2.0
+        return max(1, math.ceil((self.waiting / self.max_concurrency + 1) * typical_hold))
+
+    def has_free_slot(self) -> bool:
+        return not self._semaphore.locked()
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("Too many requests in progress, please retry shortly", self.retry_after())
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AdmissionRejected("Timed out waiting for capacity, please retry shortly", self.retry_after())
+        finally:
+            self.waiting -= 1
+
+        held_since = time.perf_counter()
+        self.wait_times.append(held_since - queued_at)
+        self.in_flight += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.hold_times.append(time.perf_counter() - held_since)
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        waits = list(self.wait_times)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_ms_avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "wait_ms_p95": round(percentile(waits, 95) * 1000, 1),
+            "wait_ms_max": round(max(waits, default=0.0) * 1000, 1)
+        }
+
+class SessionRateLimiter:
+    """Sliding-window request limit per session (requests without a session id are not limited here)"""
+
+    def __init__(self, limit: int, window_seconds: int):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._hits: dict = {}
+        self.rejected = 0
+
+    def check(self, key: str):
+        """Record a request; raise AdmissionRejected when the key is over its limit"""
+        if self.limit <= 0:
+            return
+        now = time.monotonic()
+        hits = self._hits.setdefault(key, deque())
+        while hits and now - hits[0] >= self.window_seconds:
+            hits.popleft()
+        if len(hits) >= self.limit:
+            self.rejected += 1
+            raise AdmissionRejected("Too many messages, please slow down", max(1, math.ceil(self.window_seconds - (now - hits[0]))))
+        hits.append(now)
+
+        # Keep the table bounded: forget sessions that have been idle for a full window
+        if len(self._hits) > 10000:
+            for stale_key in [k for k, v in self._hits.items() if not v or now - v[-1] >= self.window_seconds]:
+                del self._hits[stale_key]
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "window_seconds": self.window_seconds,
+            "tracked_sessions": len(self._hits),
+            "rejected": self.rejected
+        }
+
+llm_admission = LLMAdmissionController(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT_SECONDS)
+session_rate_limiter = SessionRateLimiter(SESSION_RATE_LIMIT, SESSION_RATE_WINDOW_SECONDS)
+
+# ========================
+# USAGE LEDGER
+# ========================
+
+USAGE_LEDGER_PATH = Path(os.getenv("USAGE_LEDGER_PATH", str(Path(__file__).parent / "usage_ledger.sqlite3")))
+# gpt-4o-mini list prices in USD per 1M tokens, used for the cost estimates in /api/admin/usage
+LLM_PRICE_INPUT_PER_1M = float(os.getenv("LLM_PRICE_INPUT_PER_1M", "0.15"))
+LLM_PRICE_CACHED_INPUT_PER_1M = float(os.getenv("LLM_PRICE_CACHED_INPUT_PER_1M", "0.075"))
+LLM_PRICE_OUTPUT_PER_1M = float(os.getenv("LLM_PRICE_OUTPUT_PER_1M", "0.60"))
+
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "true").lower() == "true"  # Log normalised chat questions for tools.mine_queries
+
+USAGE_COLUMNS = ("ts", "day", "session_id", "path", "model", "prompt_tokens", "completion_tokens", "cached_tokens", "latency_ms", "collections")
+QUERY_COLUMNS = ("ts", "day", "session_id", "tenant", "first_turn", "query")
+
+class UsageLedger:
+    """
+    Append-only SQLite record of every answer: token counts, LLM latency, answer path and contributing collections,
+    plus a log of the (normalised) questions asked.
+    Rows are queued and inserted in batches by a writer thread so the chat path never waits on disk.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._queue = queue.Queue(maxsize=10000)
+        self._writer = None
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._writer is not None
+
+    def _connect(self):
+        connection = sqlite3.connect(str(self.path), timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def start(self):
+        if self._writer is not None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS llm_usage (
+                    id INTEGER PRIMARY KEY,
+                    ts REAL NOT NULL,
+                    day TEXT NOT NULL,
+                    session_id TEXT,
+                    path TEXT NOT NULL,
+                    model TEXT,
+                    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                    completion_tokens INTEGER NOT NULL DEFAULT 0,
+                    cached_tokens INTEGER NOT NULL DEFAULT 0,
+                    latency_ms REAL,
+                    collections TEXT
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_day ON llm_usage(day)")
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_session ON llm_usage(session_id)")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS chat_queries (
+                    id INTEGER PRIMARY KEY,
+                    ts REAL NOT NULL,
+                    day TEXT NOT NULL,
+                    session_id TEXT,
+                    tenant TEXT,
+                    first_turn INTEGER NOT NULL,
+                    query TEXT NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_chat_queries_ts ON chat_queries(first_turn, ts)")
+        self._writer = threading.Thread(target=self._write_loop, name="usage-ledger", daemon=True)
+        self._writer.start()
+
+    def _write_loop(self):
+        connection = self._connect()
+        columns = {"llm_usage": USAGE_COLUMNS, "chat_queries": QUERY_COLUMNS}
+        while True:
+            items = [self._queue.get()]
+            while len(items) < 500:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for table, table_columns in columns.items():
+                    rows = [row for item_table, row in items if item_table == table]
+                    if rows:
+                        placeholders = ", ".join("?" for _ in table_columns)
+                        connection.executemany(f"INSERT INTO {table} ({', '.join(table_columns)}) VALUES ({placeholders})", rows)
+                connection.commit()
+            except Exception as e:
+                print(f"⚠️ Usage ledger write failed ({len(items)} rows): {e}")
+
+    def _enqueue(self, table: str, row: tuple):
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            self.dropped += 1
+
+    def record(self, session_id: str, path: str, usage: Optional[dict] = None, latency_ms: Optional[float] = None, collections: Optional[List[str]] = None, model: Optional[str] = None):
+        """Queue one row (never blocks; rows are dropped if the writer falls far behind)"""
+        usage = usage or {}
+        now = time.time()
+        row = (
+            now,
+            time.strftime("%Y-%m-%d", time.gmtime(now)),
+            session_id,
+            path,
+            model,
+            int(usage.get("input_tokens", 0)),
+            int(usage.get("output_tokens", 0)),
+            int((usage.get("input_token_details") or {}).get("cache_read", 0) or 0),
+            round(latency_ms, 1) if latency_ms is not None else None,
+            ",".join(sorted(set(collections))) if collections else None
+        )
+        self._enqueue("llm_usage", row)
+
+    def record_query(self, session_id: str, query: str, first_turn: bool, tenant: Optional[str] = None):
+        """Queue a chat question for the query log (stored normalised, see normalize_query)"""
+        if not QUERY_LOG_ENABLED:
+            return
+        normalized = normalize_query(query)
+        if normalized:
+            now = time.time()
+            self._enqueue("chat_queries", (now, time.strftime("%Y-%m-%d", time.gmtime(now)), session_id, tenant, int(first_turn), normalized))
+
+    def top_queries(self, days: int = 30, limit: int = 5000, tenant: Optional[str] = None) -> List[tuple]:
+        """(normalised question, times asked) for first-turn questions over the last `days` days, most asked first"""
+        since = time.time() - days * 86400
+        with self._connect() as connection:
+            return connection.execute("""
+                SELECT query, COUNT(*) AS asked FROM chat_queries
+                WHERE first_turn = 1 AND ts >= ? AND tenant IS ?
+                GROUP BY query ORDER BY asked DESC LIMIT ?
+            """, (since, tenant, limit)).fetchall()
+
+    def aggregate(self, group_by: str, days: int = 30, limit: int = 100) -> List[dict]:
+        """Totals per day (newest first), session or answer path (most tokens first) over the last `days` days"""
+        key_column = {"day": "day", "session": "session_id", "path": "path", "all": "'all'"}[group_by]
+        since = time.time() - days * 86400
+        with self._connect() as connection:
+            connection.row_factory = sqlite3.Row
+            rows = connection.execute(f"""
+                SELECT {key_column} AS key,
+                       COUNT(*) AS answers,
+                       SUM(CASE WHEN latency_ms IS NOT NULL THEN 1 ELSE 0 END) AS llm_calls,
+                       COUNT(DISTINCT session_id) AS conversations,
+                       SUM(prompt_tokens) AS prompt_tokens,
+                       SUM(completion_tokens) AS completion_tokens,
+                       SUM(cached_tokens) AS cached_tokens,
+                       AVG(latency_ms) AS avg_latency_ms
+                FROM llm_usage
+                WHERE ts >= ?
+                GROUP BY key
+                ORDER BY {"key DESC" if group_by == "day" else "prompt_tokens + completion_tokens DESC"}
+                LIMIT ?
+            """, (since, limit)).fetchall()
+
+        results = []
+        for row in rows:
+            item = dict(row)
+            item["avg_latency_ms"] = round(item["avg_latency_ms"], 1) if item["avg_latency_ms"] is not None else None
+            item["est_cost_usd"] = round(estimate_cost_usd(item["prompt_tokens"], item["completion_tokens"], item["cached_tokens"]), 6)
+            item["cost_per_conversation_usd"] = round(item["est_cost_usd"] / item["conversations"], 6) if item["conversations"] else None
+            results.append(item)
+        return results
+
+def estimate_cost_usd(prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> float:
+    uncached = (prompt_tokens or 0) - (cached_tokens or 0)
+    return (uncached * LLM_PRICE_INPUT_PER_1M + (cached_tokens or 0) * LLM_PRICE_CACHED_INPUT_PER_1M + (completion_tokens or 0) * LLM_PRICE_OUTPUT_PER_1M) / 1_000_000
+
+usage_ledger = UsageLedger(USAGE_LEDGER_PATH)
+
+# ========================
+# PROFILING & SLOW REQUEST LOGS
+# ========================
+
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "5000"))  # Requests slower than this log a stage breakdown (0 = off)
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")  # X-Admin-Key for /api/admin/* and the metrics endpoints; unset keeps them disabled
+PROFILE_MAX_SECONDS = 60
+PROFILE_SAMPLE_INTERVAL_MS = 5
+
+# Seconds spent per stage by the current request ("rag.retrieval.embed_query", "rag.llm.call", ...), set by the middleware
+request_stages: ContextVar[Optional[dict]] = ContextVar("request_stages", default=None)
+
+@contextmanager
+def timed_stage(name: str):
+    """Add the time spent in the block to the current request's stage breakdown (no-op outside a request)"""
+    stages = request_stages.get()
+    if stages is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - started
+
+def log_slow_request(method: str, path: str, status: int, total_seconds: float, stages: dict):
+    """One JSON line per slow request; stage names nest with dots, so "rag" includes "rag.llm.call" etc."""
+    print(json.dumps({
+        "event": "slow_request",
+        "method": method,
+        "path": path,
+        "status": status,
+        "total_ms": round(total_seconds * 1000, 1),
+        "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in sorted(stages.items())},
+        "unaccounted_ms": round((total_seconds - sum(seconds for name, seconds in stages.items() if "." not in name)) * 1000, 1),
+        "llm_in_flight": llm_admission.in_flight,
+        "llm_waiting": llm_admission.waiting,
+        "ingests_running": sorted(name for name, progress in ingest_progress.items() if progress["status"] == "running")
+    }, ensure_ascii=False))
+
+def require_admin(request: Request):
+    if not ADMIN_API_KEY:
+        raise HTTPException(403, "Admin endpoints are disabled (set ADMIN_API_KEY)")
+    if not hmac.compare_digest(request.headers.get("x-admin-key", ""), ADMIN_API_KEY):
+        raise HTTPException(401, "Invalid admin key")
+
+profile_lock = threading.Lock()  # One capture at a time
+
+# Innermost frames of threads parked waiting for work (dropped from samples unless include_idle)
+IDLE_FRAME_PREFIXES = ("wait (threading.py", "get (queue.py", "select (selectors.py", "_worker (thread.py", "sleep (")
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+def sample_stacks(seconds: float, interval: float = PROFILE_SAMPLE_INTERVAL_MS / 1000, include_idle: bool = False) -> dict:
+    """
+    Sample the stack of every thread (event loop, threadpool, ingest writers) at a fixed interval.
+    Unlike cProfile this sees embedding and Chroma calls running in worker threads, at a small fixed cost.
+    """
+    own_id = threading.get_ident()
+    thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+    folded = Counter()
+    self_counts = Counter()
+    inclusive_counts = Counter()
+    samples = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if not stack or (not include_idle and stack[0].startswith(IDLE_FRAME_PREFIXES)):
+                continue
+            stack.reverse()
+            folded[";".join([thread_names.get(thread_id, str(thread_id))] + stack)] += 1
+            self_counts[stack[-1]] += 1
+            for label in set(stack):
+                inclusive_counts[label] += 1
+        samples += 1
+        time.sleep(interval)
+
+    def top(counter):
+        total = sum(folded.values()) or 1
+        return [{"function": label, "samples": count, "pct": round(100 * count / total, 2)} for label, count in counter.most_common(40)]
+
+    return {
+        "samples": samples,
+        "interval_ms": round(interval * 1000, 2),
+        "top_self": top(self_counts),
+        "top_inclusive": top(inclusive_counts),
+        "folded": "\n".join(f"{stack} {count}" for stack, count in folded.most_common())
+    }
+
+# ========================
+# MODELS & UTILS
+# ========================
+
+class ChatMessage(BaseModel):
+    role: str
+    content: str
+
+class YatraFacts(BaseModel):
+    dates: List[str] = []
+    prices: List[str] = []
+
+class ConversationSummary(BaseModel):
+    """Running summary of the turns no longer replayed verbatim (returned with each reply, sent back with the next)"""
+    covered_messages: int = 0           # Leading conversation messages folded in so far
+    user_turns: int = 0                 # User messages among them (for the turn limit)
+    yatras: Dict[str, YatraFacts] = {}  # Yatras discussed, with the dates and prices the assistant quoted
+    topics: List[str] = []              # What the user asked about: cancellation, refund, pricing, ...
+    questions: List[str] = []           # The user's latest earlier questions, shortened
+    signature: str = ""                 # HMAC set by the server; a summary sent back without a valid one is rejected
+
+class ChatRequest(BaseModel):
+    message: str
+    conversation_history: Optional[List[ChatMessage]] = []  # With a summary, only the messages after the ones it covers
+    conversation_summary: Optional[ConversationSummary] = None
+    session_id: Optional[str] = None
+    tenant: Optional[str] = None  # Knowledge base to answer from (default: the built-in Oorzaa Yatra one)
+
+class ChatResponse(BaseModel):
+    response: str
+    session_id: str
+    should_escalate: bool = False
+    escalation_reason: Optional[str] = None
+    links: Optional[List[dict]] = None
+    used_rag: bool = True
+    show_live_agent_option: bool = False
+    show_callback_option: bool = False
+    degraded: bool = False  # True when the reply was built from retrieved content because the LLM missed the deadline
+    conversation_summary: Optional[ConversationSummary] = None
+
+failed_attempts: dict = {}
+
+def retrieve_documents(query: str, k: Optional[dict] = None) -> List[Document]:
+    """Top-k chunks from each collection, from the in-memory index when loaded, else one Chroma query per collection"""
+    k = k or {category: get_retrieval_settings(category)["k"] for category in COLLECTIONS.keys()}
+    if vector_index is not None:
+        with timed_stage("rag.retrieval.embed_query"):
+            query_vector = embedding_model.embed_query(query)
+        with timed_stage("rag.retrieval.vector_search"):
+            docs = vector_index.search(query_vector, k=k)
+        for doc in docs:
+            doc.metadata["source_category"] = doc.metadata.get("category", "unknown")
+        return docs
+
+    all_docs = []
+    for category, store in vector_stores.items():
+        retriever = store.as_retriever(search_kwargs={"k": k.get(category, RETRIEVAL_K)})
+        with timed_stage("rag.retrieval.chroma_query"):
+            docs = retriever.invoke(query)
+        # Add category info to each doc
+        for doc in docs:
+            doc.metadata["source_category"] = category
+            all_docs.append(doc)
+    return all_docs
+
+_llm = None
+
+def get_llm():
+    """Shared ChatOpenAI client, so HTTP connections to OpenAI are reused across requests"""
+    global _llm
+    if _llm is None:
+        _llm = ChatOpenAI(
+            model="gpt-4o-mini",
+            api_key=OPENAI_API_KEY,
+            base_url=OPENAI_BASE_URL,
+            temperature=0.3,
+            max_tokens=512  # Limit response length to keep answers concise
+        )
+    return _llm
+
+NO_CONTEXT_REPLY = "🙏 Namaste! I apologize, but I don't have that information right now. Please contact our support team at +91-9205661114 or visit https://oorzaayatra.com for assistance. We're happy to help! ✨"
+
+SUPPORT_CONTACT_DETAILS = """📞 **Call Us:** +91-8010513511 (Neha)
+💬 **WhatsApp:** https://wa.me/919205661114
+📧 **Email:** oorzaayatra@m2t.ai
+🌐 **Contact Form:** https://oorzaayatra.com/contact"""
+
+NEHA_LINK = {"text": "Neha: 8010513511", "url": "tel:8010513511", "type": "live_agent", "note": "For operational coordination, internal follow-ups, and yatra execution related communication."}
+
+# Link buttons of the built-in knowledge base, by reply situation (tenants define their own in tenants.json)
+SUPPORT_LINKS = {
+    "registration": [{"text": "Register/Login", "url": "https://oorzaayatra.com/login", "type": "registration"}],
+    "contact": [{"text": "WhatsApp Support", "url": "https://wa.me/919205661114", "type": "whatsapp"}],
+    "turn_limit": [
+        NEHA_LINK,
+        {"text": "WhatsApp Support", "url": "https://wa.me/919205661114", "type": "whatsapp"},
+        {"text": "Contact Us", "url": "https://oorzaayatra.com/contact", "type": "contact"}
+    ],
+    "escalation": [
+        NEHA_LINK,
+        {"text": "Connect with a Human Agent", "url": "https://oorzaayatra.com/contact", "type": "live_agent"},
+        {"text": "Request a Callback", "url": "https://oorzaayatra.com/callback", "type": "callback"}
+    ]
+}
+
+def support_contact_details(tenant: Optional[str] = None) -> str:
+    """Contact block for replies that hand over to a human: the tenant's own, never Oorzaa's, for tenant requests"""
+    if not tenant:
+        return SUPPORT_CONTACT_DETAILS
+    config = tenant_registry.configs[tenant]
+    return config.contact_details or f"Please contact the {config.display_name} team for further help."
+
+def support_links(situation: str, tenant: Optional[str] = None) -> List[dict]:
+    """Link buttons for a reply situation (registration, contact, turn_limit, escalation); copies, safe to extend"""
+    links = tenant_registry.configs[tenant].contact_links if tenant else SUPPORT_LINKS
+    return [dict(link) for link in links.get(situation, [])]
+
+def no_context_reply(tenant: Optional[str] = None) -> str:
+    if not tenant:
+        return NO_CONTEXT_REPLY
+    return f"""🙏 Namaste! I apologize, but I don't have that information right now. Please reach our team for assistance:
+
+{support_contact_details(tenant)}"""
+
+# ========================
+# CONVERSATION SUMMARY
+# ========================
+
+# Only the latest messages are replayed verbatim. Older turns are folded into a running summary of the facts the
+# prompt rules rely on, so the prompt stays the same size however long the conversation runs
+CHAT_HISTORY_VERBATIM_MESSAGES = int(os.getenv("CHAT_HISTORY_VERBATIM_MESSAGES", "4"))  # 4 = the last two user/assistant turns
+SUMMARY_MAX_YATRAS = 8     # Most recently discussed yatras kept
+SUMMARY_MAX_VALUES = 4     # Dates / prices kept per yatra
+SUMMARY_MAX_QUESTIONS = 3  # Earlier user questions kept
+SUMMARY_MAX_TEXT = 120     # Characters per kept question, name, date or price
+SUMMARY_SIGNING_KEY = os.getenv("SUMMARY_SIGNING_KEY", "")  # HMAC key for summaries sent back by the widget (default: derived from OPENAI_API_KEY)
+
+# "Ayodhya Yatra", "**Char Dham Yatra**", "kashi Vishwanath yatra": up to four capitalised words before "yatra";
+# leading filler words are dropped
+YATRA_MENTION_RE = re.compile(r"\b((?:[A-Z][\w'’-]*\s+){1,4})[Yy]atra\b")
+NOT_YATRA_NAME_WORDS = {"mega", "mid", "mini", "oorzaa", "the", "this", "that", "our", "your", "a", "an", "each", "every", "next", "about", "for", "join", "book"}
+PRICE_RE = re.compile(r"(?:₹|\bRs\.?|\bINR)\s?\d[\d,]*(?:\.\d+)?", re.IGNORECASE)
+MONTH = r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\b\.?"
+DAY = r"\d{1,2}(?:st|nd|rd|th)?"
+DATE_RE = re.compile(
+    rf"\b{DAY}(?:\s*[-–]\s*{DAY})?\s+{MONTH}(?:,?\s+\d{{4}})?"
+    rf"|\b{MONTH}\s+{DAY}(?:\s*[-–]\s*{DAY})?(?:,?\s+\d{{4}})?"
+    r"|\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b"
+)
+# Topics the prompt rules tie back to (e.g. cancellation asked earlier -> mention the transport's cancellation rules)
+SUMMARY_TOPICS = {
+    "cancellation": ("cancel",),
+    "refund": ("refund",),
+    "pricing": ("price", "cost", "charge", "fare", "fee", "how much", "₹"),
+    "dates": ("date", "when ", "schedule"),
+    "registration": ("register", "book", "sign up"),
+    "transport": ("flight", "train", "bus ", "transport"),
+}
+
+def _yatra_mentions(text: str):
+    """(position, name) for each yatra named in the text"""
+    for match in YATRA_MENTION_RE.finditer(text):
+        words = match.group(1).split()
+        while words and words[0].lower() in NOT_YATRA_NAME_WORDS:
+            words.pop(0)
+        if words:
+            yield match.start(), " ".join(words) + " Yatra"
+
+def _append_new(values: List[str], new_values):
+    for value in new_values:
+        value = value.strip()
+        if value and value not in values:
+            values.append(value)
+
+def _newest(values: List[str], limit: int) -> List[str]:
+    return [value[:SUMMARY_MAX_TEXT] for value in values[-limit:]]
+
+def fold_into_summary(summary: ConversationSummary, messages: List[ChatMessage]) -> ConversationSummary:
+    """Return the summary updated with messages (oldest first) that drop out of the verbatim window"""
+    yatras = {name: YatraFacts(dates=list(facts.dates), prices=list(facts.prices)) for name, facts in summary.yatras.items()}
+    topics, questions = list(summary.topics), list(summary.questions)
+    user_turns = summary.user_turns
+
+    def touch(name: str) -> YatraFacts:
+        facts = yatras.pop(name, None) or YatraFacts()
+        yatras[name] = facts  # Re-insert so the most recently discussed yatras are kept
+        return facts
+
+    for message in messages:
+        text = message.content
+        if message.role == "user":
+            user_turns += 1
+            lowered = text.lower()
+            _append_new(topics, [topic for topic, keywords in SUMMARY_TOPICS.items() if any(k in lowered for k in keywords)])
+            question = " ".join(text.split())
+            _append_new(questions, [question if len(question) <= SUMMARY_MAX_TEXT else question[:SUMMARY_MAX_TEXT - 1] + "…"])
+            for _, name in _yatra_mentions(text):
+                touch(name)
+            continue
+
+        # Assistant reply: the dates and prices after each yatra name (up to the next one) were quoted for that yatra
+        mentions = list(_yatra_mentions(text))
+        for i, (start, name) in enumerate(mentions):
+            block = text[start:mentions[i + 1][0] if i + 1 < len(mentions) else len(text)]
+            facts = touch(name)
+            _append_new(facts.dates, DATE_RE.findall(block))
+            _append_new(facts.prices, PRICE_RE.findall(block))
+
+    # The caps also bound a summary sent back by the client, whatever it contains
+    return ConversationSummary(
+        covered_messages=summary.covered_messages + len(messages),
+        user_turns=user_turns,
+        yatras={name[:SUMMARY_MAX_TEXT]: YatraFacts(dates=_newest(facts.dates, SUMMARY_MAX_VALUES), prices=_newest(facts.prices, SUMMARY_MAX_VALUES))
+                for name, facts in list(yatras.items())[-SUMMARY_MAX_YATRAS:]},
+        topics=[topic for topic in topics if topic in SUMMARY_TOPICS],
+        questions=_newest(questions, SUMMARY_MAX_QUESTIONS)
+    )
+
+def summary_signature(summary: ConversationSummary) -> str:
+    key = SUMMARY_SIGNING_KEY.encode() if SUMMARY_SIGNING_KEY else hashlib.sha256(f"conversation-summary:{OPENAI_API_KEY}".encode()).digest()
+    payload = json.dumps(summary.model_dump(exclude={"signature"}), ensure_ascii=False, separators=(",", ":"))
+    return hmac.new(key, payload.encode(), hashlib.sha256).hexdigest()
+
+def verify_summary(summary: Optional[ConversationSummary]) -> bool:
+    """True for no summary or one this server signed unchanged (so its turn count and text can be trusted)"""
+    return summary is None or hmac.compare_digest(summary.signature, summary_signature(summary))
+
+def compact_history(history: List[ChatMessage], summary: Optional[ConversationSummary]):
+    """Fold all but the latest CHAT_HISTORY_VERBATIM_MESSAGES messages into the summary; returns (signed summary, recent messages)"""
+    cut = max(0, len(history) - CHAT_HISTORY_VERBATIM_MESSAGES)
+    summary = fold_into_summary(summary or ConversationSummary(), history[:cut])
+    summary.signature = summary_signature(summary)
+    return summary, history[cut:]
+
+def render_summary(summary: ConversationSummary) -> str:
+    """The summary as prompt text ('' until something has been folded in)"""
+    if not summary.covered_messages:
+        return ""
+    parts = []
+    if summary.yatras:
+        lines = []
+        for name, facts in summary.yatras.items():
+            details = []
+            if facts.dates:
+                details.append("dates quoted: " + "; ".join(facts.dates))
+            if facts.prices:
+                details.append("prices quoted: " + "; ".join(facts.prices))
+            lines.append(f"- {name}" + (f" ({', '.join(details)})" if details else ""))
+        parts.append("Yatras discussed:\n" + "\n".join(lines))
+    if summary.topics:
+        parts.append("The user already asked about: " + ", ".join(summary.topics))
+    if summary.questions:
+        parts.append("Earlier questions: " + " | ".join(summary.questions))
+    return "\n".join(parts)
+
+# ========================
+# DEADLINES & HEDGING
+# ========================
+
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "20"))  # End-to-end budget for one chat reply
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))  # Send a second request once the first is slower than this
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # Latency samples needed before the percentile is trusted
+LLM_HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SECONDS", "6"))  # Hedge delay until then
+
+llm_latencies = deque(maxlen=500)  # Seconds per successful LLM call, most recent first out
+latency_stats = {"hedges_sent": 0, "hedge_wins": 0, "deadline_exceeded": 0, "degraded_replies": 0}
+
+@dataclass
+class RAGAnswer:
+    text: str
+    docs: List[Document] = field(default_factory=list)
+    degraded: bool = False
+    degraded_reason: Optional[str] = None
+    usage: Optional[dict] = None             # usage_metadata of the LLM reply (token counts)
+    llm_latency_ms: Optional[float] = None
+    model: Optional[str] = None
+    precomputed: bool = False               # Served from precomputed_answers without an LLM call
+
+def hedge_delay_seconds() -> float:
+    """How long the first LLM attempt may run before a hedged duplicate is sent"""
+    if len(llm_latencies) < LLM_HEDGE_MIN_SAMPLES:
+        return LLM_HEDGE_DEFAULT_DELAY_SECONDS
+    return percentile(list(llm_latencies), LLM_HEDGE_PERCENTILE)
+
+def build_degraded_reply(docs: List[Document], tenant: Optional[str] = None) -> str:
+    """Reply built from the best retrieved chunks plus contact details, for when the LLM can't answer in time"""
+    ranked = sorted(docs, key=lambda doc: doc.metadata.get("score", 0.0), reverse=True)[:3]
+    excerpts = []
+    for doc in ranked:
+        text = " ".join(doc.page_content.split())
+        if len(text) > 300:
+            text = text[:300].rsplit(" ", 1)[0] + "…"
+        excerpts.append(f"• {text}")
+
+    contact_details = support_contact_details(tenant)
+    if not excerpts:
+        return f"""🙏 Namaste! I'm taking a little longer than usual right now. For a quick answer, please reach our team:
+
+{contact_details}"""
+
+    excerpt_text = "\n\n".join(excerpts)
+    return f"""🙏 Namaste! I'm taking a little longer than usual to prepare a full answer. Here is what I found that may help:
+
+{excerpt_text}
+
+For complete and up-to-date details, please reach our team:
+
+{contact_details}"""
+
+async def invoke_llm_hedged(messages: List, deadline: float):
+    """
+    Call the LLM, sending one hedged duplicate if the first attempt outlives the latency percentile
+    (and a slot is free). The first successful reply wins and the other attempt is cancelled.
+    The hedge timer starts when the first attempt gets its slot, like the latencies it is compared with
+    (llm_latencies leave out queue time), so a request that queued is not hedged early.
+    Returns (response, seconds the winning call took); raises asyncio.TimeoutError when the deadline passes first.
+    """
+    llm = get_llm()
+    primary_started = asyncio.Event()
+    hedge_at = None  # time.monotonic() at which a hedge is due, once the first attempt holds a slot
+
+    async def attempt(is_primary: bool = False):
+        nonlocal hedge_at
+        queued_at = time.perf_counter()
+        async with llm_admission.slot():
+            started = time.perf_counter()
+            if is_primary:
+                hedge_at = time.monotonic() + hedge_delay_seconds()
+                primary_started.set()
+            stages = request_stages.get()
+            if stages is not None:
+                stages["rag.llm.queue_wait"] = stages.get("rag.llm.queue_wait", 0.0) + started - queued_at
+            with timed_stage("rag.llm.call"):
+                response = await llm.ainvoke(messages)
+            elapsed = time.perf_counter() - started
+            llm_latencies.append(elapsed)
+            return response, elapsed
+
+    primary = asyncio.create_task(attempt(is_primary=True))
+    slot_wait = asyncio.create_task(primary_started.wait()) if LLM_HEDGE_ENABLED else None
+    pending = {primary}
+    hedge = None
+    first_error = None
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            wait_for = remaining
+            waiting_on = set(pending)
+            if LLM_HEDGE_ENABLED and hedge is None:
+                if hedge_at is None:
+                    waiting_on.add(slot_wait)  # Still queued: wake up when the slot is granted to start the timer
+                else:
+                    wait_for = min(remaining, max(0.0, hedge_at - time.monotonic()))
+
+            done, _ = await asyncio.wait(waiting_on, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+            done.discard(slot_wait)
+            pending -= done
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        latency_stats["hedge_wins"] += 1
+                    return task.result()
+                first_error = first_error or task.exception()
+
+            if (not done and LLM_HEDGE_ENABLED and hedge is None and hedge_at is not None
+                    and time.monotonic() >= hedge_at):
+                if llm_admission.has_free_slot():
+                    hedge = asyncio.create_task(attempt())
+                    pending.add(hedge)
+                    latency_stats["hedges_sent"] += 1
+                else:
+                    hedge_at = time.monotonic() + hedge_delay_seconds()  # No slot to spare: check again later
+        raise first_error
+    finally:
+        for task in (primary, hedge, slot_wait):
+            if task is not None and not task.done():
+                task.cancel()
+
+def build_rag_messages(query: str, chat_history: List, tenant: Optional[str] = None, history_summary: str = ""):
+    """Retrieve context across all collections and build the prompt (messages is None when nothing relevant was found)"""
+    # Search across all collections (of the tenant's knowledge base, when given) and gather results
+    system_prompt = SYSTEM_PROMPT
+    if tenant:
+        with timed_stage("rag.retrieval.tenant_load"):
+            kb = tenant_registry.get(tenant)
+        all_docs = kb.retrieve(query)
+        system_prompt = kb.config.system_prompt
+    else:
+        all_docs = retrieve_documents(query)
+
+    # Check if we have any relevant documents
+    if not all_docs:
+        return None, []
+
+    # Sort by relevance (if needed) and take top results
+    # For now, we'll use all retrieved docs
+    context_parts = []
+    for doc in all_docs[:RETRIEVAL_MAX_DOCS]:
+        category = doc.metadata.get("source_category", "unknown")
+        context_parts.append(f"[{category.upper()}]\n{doc.page_content}")
+
+    context = "\n\n---\n\n".join(context_parts)
+
+    # Build prompt with context, the summary of older turns and the recent history
+    messages = [SystemMessage(content=system_prompt + f"\n\nContext:\n{context}")]
+    if history_summary:
+        # The summary quotes the user's own words, so it goes in a user turn and never in the system prompt
+        messages.append(HumanMessage(content=f"Summary of our earlier conversation (older turns):\n{history_summary}"))
+        messages.append(AIMessage(content="Noted. I will stay consistent with what we discussed earlier."))
+    messages.extend(chat_history)
+    messages.append(HumanMessage(content=query))
+    return messages, all_docs[:RETRIEVAL_MAX_DOCS]
+
+async def get_rag_response(query: str, chat_history: List, deadline: Optional[float] = None, tenant: Optional[str] = None,
+                           history_summary: str = "") -> RAGAnswer:
+    """Get RAG response by searching across all collections, degrading to a retrieval-only reply at the deadline"""
+    if not tenant and not vector_stores and vector_index is None:
+        raise ValueError("Vector stores not initialized")
+
+    if not OPENAI_API_KEY:
+        raise ValueError("OpenAI API key not configured")
+
+    deadline = deadline or time.monotonic() + CHAT_DEADLINE_SECONDS
+    docs = []
+    try:
+        # Retrieval embeds the query on the CPU, so keep it off the event loop
+        with timed_stage("rag.retrieval"):
+            messages, docs = await asyncio.wait_for(
+                run_in_threadpool(build_rag_messages, query, chat_history, tenant, history_summary),
+                timeout=max(0.0, deadline - time.monotonic())
+            )
+        if messages is None:
+            return RAGAnswer(text=no_context_reply(tenant))
+
+        # Get response (only the LLM calls hold admission slots)
+        with timed_stage("rag.llm"):
+            response, elapsed = await invoke_llm_hedged(messages, deadline)
+        return RAGAnswer(
+            text=response.content,
+            docs=docs,
+            usage=response.usage_metadata,
+            llm_latency_ms=elapsed * 1000,
+            model=response.response_metadata.get("model_name")
+        )
+    except asyncio.TimeoutError:
+        latency_stats["deadline_exceeded"] += 1
+        reason = "deadline"
+    except (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+        print(f"⚠️ LLM unavailable, answering from retrieval only: {e}")
+        reason = "llm_error"
+
+    latency_stats["degraded_replies"] += 1
+    return RAGAnswer(text=build_degraded_reply(docs, tenant), docs=docs, degraded=True, degraded_reason=reason)
+
+def detect_links_needed(message: str, tenant: Optional[str] = None) -> List[dict]:
+    """Detect links based on keywords"""
+    links = []
+    msg = message.lower()
+    
+    if any(w in msg for w in ["register", "join", "book", "sign up", "login"]):
+        links.extend(support_links("registration", tenant))
+    # Payment Options link removed as per user request
+    # if any(w in msg for w in ["pay", "money", "cost", "price"]):
     #     links.append({"text": "Payment Options", "url": "https://oorzaayatra.com/login", "type": "payment"})
     if any(w in msg for w in ["contact", "call", "help", "support"]):
-        links.append({"text": "WhatsApp Support", "url": "https://wa.me/919205661114", "type": "whatsapp"})
+        links.extend(support_links("contact", tenant))
         
     return links
 
@@ -815,94 +2813,735 @@ def check_escalation(session_id: str, response: str) -> bool:
         failed_attempts[session_id] = 0
     return failed_attempts.get(session_id, 0) >= 3
 
+# ========================
+# PRECOMPUTED ANSWERS
+# ========================
+
+# Answers to the most frequent first-turn questions, mined from the query log by `python -m tools.mine_queries`.
+# Matching first-turn questions are answered from this file without an LLM call. The answers are tied to a
+# fingerprint of the collections and re-generated (same RAG pipeline, saved questions) whenever it changes.
+PRECOMPUTED_ANSWERS_PATH = Path(os.getenv("PRECOMPUTED_ANSWERS_PATH", str(Path(__file__).parent / "precomputed_answers.json")))
+PRECOMPUTED_MATCH_THRESHOLD = float(os.getenv("PRECOMPUTED_MATCH_THRESHOLD", "0.92"))  # Cosine similarity to a saved question
+PRECOMPUTED_AUTO_REGENERATE = os.getenv("PRECOMPUTED_AUTO_REGENERATE", "true").lower() == "true"
+PRECOMPUTED_CHECK_SECONDS = int(os.getenv("PRECOMPUTED_CHECK_SECONDS", "60"))  # How often stale answers are re-checked against the collections
+PRECOMPUTED_RELOAD_SECONDS = 30          # How often the file is checked for changes (new mining run, another worker)
+PRECOMPUTED_STORES_WAIT_SECONDS = 300    # How long startup waits for the collections before leaving activation to the periodic check
+
+PHONE_RE = re.compile(r"(?<![\w+])(?:\+?91[\s-]?)?[6-9]\d{4}[\s-]?\d{5}(?!\w)")  # Indian mobile numbers, optional +91
+EMAIL_RE = re.compile(r"\S+@\S+\.\w+")
+
+def normalize_query(text: str) -> str:
+    """Lowercase, collapse whitespace, drop trailing punctuation and mask phone numbers / emails"""
+    text = EMAIL_RE.sub("<email>", PHONE_RE.sub("<phone>", text))
+    return " ".join(text.lower().split()).strip(" ?!.,;:")[:300]
+
+def knowledge_fingerprint() -> str:
+    """Hash of what the built-in collections hold ('' until Chroma is connected)"""
+    if not vector_stores:
+        return ""
+    return hashlib.sha256(json.dumps(chroma_fingerprints(), sort_keys=True).encode()).hexdigest()
+
+def save_precomputed_answers(entries: List[dict], knowledge_hash: str, path: Path = PRECOMPUTED_ANSWERS_PATH):
+    tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps({"knowledge_hash": knowledge_hash, "generated_at": time.time(), "entries": entries}, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+async def answer_questions(entries: List[dict]) -> Optional[List[dict]]:
+    """Answer each entry's question through the live RAG pipeline; None if the LLM failed (keep the old answers)"""
+    answered = []
+    dropped = []
+    for entry in entries:
+        answer = await get_rag_response(entry["question"], [])
+        if answer.degraded:
+            print(f"⚠️ Could not answer '{entry['question']}' ({answer.degraded_reason}), keeping the previous answers")
+            return None
+        if answer.usage is None:
+            dropped.append(entry["question"])  # Nothing relevant in the knowledge base any more: let it go to the live path
+            continue
+        answered.append({
+            **entry,
+            "answer": answer.text,
+            "collections": sorted({doc.metadata.get("source_category", "unknown") for doc in answer.docs})
+        })
+    if dropped:
+        print(f"📌 Dropped {len(dropped)} precomputed questions with no matching knowledge: " + "; ".join(dropped))
+    return answered
+
+class PrecomputedAnswers:
+    """The precomputed answer file, loaded for lookups and kept in step with the knowledge base"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._state = ([], np.zeros((0, 0), dtype=np.float32), {})  # entries, question vectors, normalised variant -> entry
+        self.knowledge_hash = None
+        self.active = False  # True once knowledge_hash matched the live collections
+        self.loop = None
+        self._mtime = None
+        self._file_checked_at = 0.0
+        self._changed_hash = None  # Fingerprint seen by the last check that found the knowledge changed
+        self._refreshing = False
+        self._dirty = False
+        self._force = False
+        self.counters = {"hits": 0, "misses": 0, "regenerations": 0, "dropped_questions": 0}
+
+    @property
+    def entries(self) -> List[dict]:
+        return self._state[0]
+
+    def load(self) -> bool:
+        """(Re)read the file; the answers stay inactive until refresh() has checked them"""
+        try:
+            mtime = self.path.stat().st_mtime
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return False
+        entries = data.get("entries", [])
+        vectors = np.asarray([entry["vector"] for entry in entries], dtype=np.float32).reshape(len(entries), -1)
+        by_text = {variant: entry for entry in entries for variant in entry.get("variants", [entry["question"]])}
+        self._state = (entries, vectors, by_text)
+        self._mtime = mtime
+        self.knowledge_hash = data.get("knowledge_hash")
+        self.active = False
+        print(f"📌 Loaded {len(entries)} precomputed answers from {self.path.name}")
+        return True
+
+    async def start(self):
+        """Startup: load the file, check it once the collections are connected, then re-check stale answers periodically"""
+        self.loop = asyncio.get_running_loop()
+        if not await run_in_threadpool(self.load):
+            print(f"📌 No precomputed answers at {self.path}: every question goes to the live path")
+        if await run_in_threadpool(vector_stores_ready.wait, PRECOMPUTED_STORES_WAIT_SECONDS):
+            await self.refresh()
+        elif self.entries:
+            print(f"⚠️ Precomputed answers not activated: no collections connected after {PRECOMPUTED_STORES_WAIT_SECONDS} s, "
+                  f"re-checking every {PRECOMPUTED_CHECK_SECONDS} s")
+        while True:
+            await asyncio.sleep(PRECOMPUTED_CHECK_SECONDS)
+            if self.entries and not self.active and vector_stores_ready.is_set():
+                await self.refresh()
+
+    def mark_stale(self):
+        """The knowledge changed: stop serving the answers until the next check has compared them with the collections"""
+        self.active = False
+
+    async def refresh(self, force: bool = False):
+        """
+        Activate the answers if they match the live collections, else re-generate them. Re-generation waits until two
+        checks in a row see the same changed fingerprint (so a burst of uploads costs one run), unless force is set.
+        """
+        self._force = self._force or force
+        if self._refreshing:
+            self._dirty = True
+            return
+        self._refreshing = True
+        try:
+            self._dirty = True
+            while self._dirty:
+                self._dirty = False
+                await self._refresh_once()
+        except Exception as e:
+            print(f"⚠️ Precomputed answers check failed: {e}")
+        finally:
+            self._refreshing = False
+
+    async def _refresh_once(self):
+        if not self.entries:
+            return
+        if any(progress["status"] == "running" for progress in ingest_progress.values()):
+            return  # Mid-ingest: the next periodic check sees the final state
+        current = await run_in_threadpool(knowledge_fingerprint)
+        if not current:
+            return
+        if current == self.knowledge_hash:
+            if not self.active:
+                print(f"📌 {len(self.entries)} precomputed answers active")
+            self.active = True
+            self._changed_hash = None
+            return
+
+        self.active = False
+        if not PRECOMPUTED_AUTO_REGENERATE and not self._force:
+            print("📌 Knowledge changed: precomputed answers disabled until tools.mine_queries is re-run")
+            return
+        if current != self._changed_hash and not self._force:
+            self._changed_hash = current
+            print(f"📌 Knowledge changed: precomputed answers off, re-answering after {PRECOMPUTED_CHECK_SECONDS} s without further changes")
+            return
+        self._force = False
+        lock_file = await run_in_threadpool(self._try_lock)
+        if lock_file is None:
+            return  # Another worker is re-generating; its file is picked up by the periodic reload
+        try:
+            print(f"📌 Knowledge changed: re-answering {len(self.entries)} precomputed questions...")
+            started = time.perf_counter()
+            answered = await answer_questions(self.entries)
+            if answered is None:
+                return
+            await run_in_threadpool(save_precomputed_answers, answered, current, self.path)
+            self.counters["dropped_questions"] += len(self.entries) - len(answered)
+            await run_in_threadpool(self.load)
+            self.counters["regenerations"] += 1
+            print(f"📌 Re-generated {len(answered)} precomputed answers in {time.perf_counter() - started:.1f} s")
+            self._dirty = True  # Re-check (activates them unless the knowledge changed meanwhile)
+        finally:
+            lock_file.close()
+
+    def _try_lock(self):
+        """Exclusive lock so only one worker re-generates (no locking where fcntl is unavailable)"""
+        lock_file = open(self.path.with_name(self.path.name + ".lock"), "w")
+        try:
+            import fcntl
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except ImportError:
+            pass
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _reload_if_changed(self):
+        now = time.time()
+        if now - self._file_checked_at < PRECOMPUTED_RELOAD_SECONDS:
+            return
+        self._file_checked_at = now
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime and self.load() and self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self.refresh(), self.loop)
+
+    def lookup(self, query: str) -> Optional[dict]:
+        """The precomputed entry for a first-turn question, if any (may embed the query: call off the event loop)"""
+        self._reload_if_changed()
+        entries, vectors, by_text = self._state
+        if not self.active or not entries:
+            return None
+        normalized = normalize_query(query)
+        entry = by_text.get(normalized)
+        if entry is None and normalized:
+            scores = vectors @ np.asarray(get_embedding_model().embed_query(normalized), dtype=np.float32)
+            best = int(np.argmax(scores))
+            if scores[best] >= PRECOMPUTED_MATCH_THRESHOLD:
+                entry = entries[best]
+        self.counters["hits" if entry else "misses"] += 1
+        return entry
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self.path),
+            "active": self.active,
+            "knowledge_hash": self.knowledge_hash,
+            "questions": [{"question": entry["question"], "asked": entry.get("count"), "collections": entry.get("collections")} for entry in self.entries],
+            **self.counters
+        }
+
+precomputed_answers = PrecomputedAnswers(PRECOMPUTED_ANSWERS_PATH)
+
+# ========================
+# ADMIN STATS SNAPSHOT
+# ========================
+
+ADMIN_CACHE_CONTROL = "no-cache"  # Browsers keep the reply but revalidate every poll (answered with a cheap 304)
+
+class StatsSnapshot:
+    """
+    In-process copy of an admin read endpoint's body and its ETag.
+    Rebuilt on the first read after invalidate() (ingest, delete, refresh), so repeat polls
+    touch neither Chroma nor the filesystem.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._built_generation = -1
+        self._body = None
+        self._etag = None
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+
+    def cached(self):
+        """(body, etag) when the snapshot is current, else None"""
+        with self._lock:
+            if self._built_generation == self._generation:
+                return self._body, self._etag
+        return None
+
+    def get(self):
+        """(body, etag), rebuilding first if the snapshot is stale (may block on Chroma, call off the event loop)"""
+        with self._lock:
+            if self._built_generation == self._generation:
+                return self._body, self._etag
+            generation = self._generation
+        body = self._build()
+        etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:20] + '"'
+        with self._lock:
+            # An invalidate() during the build leaves the snapshot stale, so the next read rebuilds again
+            if generation >= self._built_generation:
+                self._body, self._etag, self._built_generation = body, etag, generation
+        return body, etag
+
+def build_knowledge_files_stats() -> dict:
+    knowledge_dir = Path(__file__).parent / "knowledge"
+    if not knowledge_dir.exists():
+        return {"files": []}
+
+    files = []
+    for file_path in sorted(knowledge_dir.glob("*.txt")) + sorted(knowledge_dir.glob("*.md")):
+        stat = file_path.stat()
+        files.append({
+            "name": file_path.name,
+            "size_bytes": stat.st_size,
+            "modified": stat.st_mtime
+        })
+    return {"files": files}
+
+def build_collections_stats() -> dict:
+    collections_info = []
+    for category, config in COLLECTIONS.items():
+        info = {
+            "category": category,
+            "name": config["name"],
+            "description": config["description"],
+            "file_patterns": config["files"],
+            "loaded": category in vector_stores
+        }
+
+        if category in vector_stores:
+            # Get collection stats
+            try:
+                collection = vector_stores[category]._collection
+                info["document_count"] = collection.count()
+            except:
+                info["document_count"] = "N/A"
+        else:
+            info["document_count"] = 0
+
+        collections_info.append(info)
+
+    return {
+        "collections": collections_info,
+        "total_collections": len(COLLECTIONS),
+        "active_collections": len(vector_stores)
+    }
+
+files_stats = StatsSnapshot(build_knowledge_files_stats)
+collections_stats = StatsSnapshot(build_collections_stats)
+
+def invalidate_knowledge_stats():
+    """Call whenever knowledge files or collection contents change"""
+    files_stats.invalidate()
+    collections_stats.invalidate()
+    precomputed_answers.mark_stale()
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+async def serve_stats_snapshot(snapshot: StatsSnapshot, request: Request) -> Response:
+    """200 with ETag/Cache-Control, or 304 when If-None-Match still matches"""
+    current = snapshot.cached() or await run_in_threadpool(snapshot.get)
+    body, etag = current
+    headers = {"ETag": etag, "Cache-Control": ADMIN_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
+
+# ========================
+# PRE-FORK SERVER
+# ========================
+
+# `python main.py serve` with WEB_CONCURRENCY > 1 loads the embedding model and read index once, then forks the
+# workers, which share those pages copy-on-write instead of each loading its own torch runtime and index
+SERVER_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))  # Worker processes (more than one needs Chroma Cloud)
+TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", "0"))  # 0 = available cores / workers
+KNOWLEDGE_VERSION_FILE = CHROMA_PERSIST_DIR / ".knowledge_version"  # Rewritten by a worker after it changes a collection
+PREFORK_INDEX_PATH = CHROMA_PERSIST_DIR / "prefork_index"  # Read index written before forking when there is no snapshot/mirror
+KNOWLEDGE_VERSION_POLL_SECONDS = float(os.getenv("KNOWLEDGE_VERSION_POLL_SECONDS", "5"))
+
+prefork_workers = 0  # Number of sibling workers when forked by serve_prefork(), else 0
+torch_threads = None  # Last size given to set_torch_threads(); None until sized (get_embedding_model() then sizes it)
+knowledge_version_seen = None
+
+def available_cpu_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def set_torch_threads(threads: int):
+    """Size torch's intra-op thread pool (embedding runs here); a no-op without torch"""
+    global torch_threads
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+    torch_threads = threads
+    try:
+        torch.set_num_interop_threads(1)  # Encoding never runs ops in parallel; only settable before first use
+    except RuntimeError:
+        pass
+
+def announce_knowledge_change():
+    """Tell sibling workers this process changed the collections, so they rebuild their read index"""
+    global knowledge_version_seen
+    if prefork_workers < 2:
+        return
+    token = f"{os.getpid()}:{time.time_ns()}"
+    try:
+        CHROMA_PERSIST_DIR.mkdir(exist_ok=True)
+        KNOWLEDGE_VERSION_FILE.write_text(token)
+        knowledge_version_seen = token
+    except Exception as e:
+        print(f"⚠️ Could not announce the knowledge change to other workers: {e}")
+
+def read_knowledge_version() -> Optional[str]:
+    return KNOWLEDGE_VERSION_FILE.read_text() if KNOWLEDGE_VERSION_FILE.exists() else None
+
+def knowledge_version_watch_loop():
+    """Background thread in each worker: pick up knowledge another worker ingested or deleted"""
+    global knowledge_version_seen, vector_index
+    while True:
+        time.sleep(KNOWLEDGE_VERSION_POLL_SECONDS)
+        try:
+            token = read_knowledge_version()
+            if token == knowledge_version_seen:
+                continue
+            knowledge_version_seen = token
+            print(f"🔄 Knowledge changed in another worker, reloading in worker {os.getpid()}")
+            if not load_mirror_for_serving() and snapshot_exists(PREFORK_INDEX_PATH):
+                vector_index, _ = load_snapshot(PREFORK_INDEX_PATH, mmap=True)
+            tenant_registry.unload_all()
+            invalidate_knowledge_stats()
+        except Exception as e:
+            print(f"⚠️ Knowledge version check failed: {e}")
+
+def effective_worker_count(requested: int) -> int:
+    """Workers serve_prefork may start: one without Chroma Cloud, whose local on-disk store several processes must not open"""
+    if requested > 1 and not CHROMA_USE_CLOUD:
+        print(f"⚠️ WEB_CONCURRENCY={requested} needs Chroma Cloud: several workers cannot share the local Chroma store "
+              f"in {CHROMA_PERSIST_DIR}. Starting a single worker.")
+        return 1
+    return max(1, requested)
+
+def run_in_forked_child(fn) -> bool:
+    """Run fn in a short-lived forked process and wait for it; True if it succeeded"""
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            fn()
+        except Exception as e:
+            print(f"❌ {fn.__name__} failed: {e}")
+            code = 1
+        sys.stdout.flush()
+        os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status) == 0
+
+def build_prefork_index():
+    """Open (re-ingesting if knowledge/ changed) every collection and write the read index for the workers to map"""
+    initialize_vector_store()
+    if vector_index is not None and not CHROMA_MIRROR_ENABLED:  # With the cloud mirror, the mirror file is the index
+        knowledge_hash = KNOWLEDGE_HASH_FILE.read_text() if KNOWLEDGE_HASH_FILE.exists() else ""
+        save_snapshot(vector_index, PREFORK_INDEX_PATH, knowledge_hash)
+
+def preload_for_workers():
+    """
+    Everything read-only the workers can share, loaded in the parent before forking: the embedding model and the
+    read index, memory-mapped from the snapshot, the cloud mirror or an index file written from Chroma.
+    The parent never opens Chroma itself (its native client does not survive fork): re-ingest, seeding and
+    building the index file run once in a short-lived child instead of racing in every worker.
+    """
+    global vector_index
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # Keep the parent single-threaded so no OpenMP pool exists at fork time; workers size their own
+    set_torch_threads(1)
+    get_embedding_model().embed_query("warm up")  # Run lazy initialisation once, in shared pages
+
+    if load_snapshot_for_serving():
+        run_in_forked_child(connect_stores_behind_snapshot)
+    elif load_mirror_for_serving():
+        if not run_in_forked_child(connect_all_stores):
+            print("⚠️ Chroma Cloud not reachable, workers start from the mirror")
+    else:
+        remove_snapshot(PREFORK_INDEX_PATH)
+        if not run_in_forked_child(build_prefork_index):
+            raise RuntimeError("Could not prepare the knowledge base (see the error above)")
+        if not load_mirror_for_serving() and snapshot_exists(PREFORK_INDEX_PATH):
+            vector_index, _ = load_snapshot(PREFORK_INDEX_PATH, mmap=True)
+            print(f"📦 Workers will share the read index: {len(vector_index)} chunks (memory-mapped)")
+
+    # Objects allocated so far are never collected, so the collector does not touch (and copy) their pages in workers
+    gc.collect()
+    gc.freeze()
+
+def serve_prefork(host: str, port: int, workers: int, threads_per_worker: int):
+    """Preload, bind one listening socket, fork the workers and replace any that die (until SIGTERM/SIGINT)"""
+    global prefork_workers, knowledge_version_seen
+    import signal
+    import socket
+    import uvicorn
+
+    prefork_workers = workers
+    started = time.perf_counter()
+    preload_for_workers()
+    knowledge_version_seen = read_knowledge_version()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    config = uvicorn.Config(app, host=host, port=port)
+    print(f"🍴 Preloaded in {time.perf_counter() - started:.1f} s, forking {workers} workers "
+          f"({threads_per_worker} torch threads each) on {host}:{port}")
+
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            set_torch_threads(threads_per_worker)
+            server = uvicorn.Server(config)
+            server.run(sockets=[sock])
+            sys.stdout.flush()
+            os._exit(0 if server.started else 3)
+        children[pid] = time.time()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for _ in range(workers):
+        spawn()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.pop(pid, None)
+        if stopping:
+            continue
+        exit_code = os.waitstatus_to_exitcode(status)
+        if exit_code == 3:
+            # Startup itself fails (bad config, port, ...): exit instead of restarting forever
+            print(f"❌ Worker {pid} failed to start, shutting down")
+            stop(signal.SIGTERM, None)
+            continue
+        print(f"⚠️ Worker {pid} exited ({exit_code}), starting a replacement")
+        time.sleep(1)
+        spawn()
+    sock.close()
+
+# ========================
+# WARM-UP
+# ========================
+
+# The widget launcher pings /api/warmup when a visitor hovers or opens the chat, so the first message does not
+# pay for a cold model, an unloaded tenant index or (on hosts that sleep) a stopped instance
+WARMUP_INTERVAL_SECONDS = float(os.getenv("WARMUP_INTERVAL_SECONDS", "60"))  # Pings within this window return at once
+
+last_warmup = {}  # tenant (None = default) -> time.monotonic() of the last warm-up
+warmup_lock = threading.Lock()
+
+def warm_up(tenant: Optional[str] = None) -> bool:
+    """Run one retrieval (embedding model, read index, tenant index) unless one ran recently; True if it ran"""
+    with warmup_lock:
+        if time.monotonic() - last_warmup.get(tenant, float("-inf")) < WARMUP_INTERVAL_SECONDS:
+            return False
+        last_warmup[tenant] = time.monotonic()
+    try:
+        get_llm()
+        if tenant:
+            tenant_registry.get(tenant).retrieve("namaste")
+        elif vector_index is not None or vector_stores:
+            retrieve_documents("namaste")
+        else:
+            get_embedding_model().embed_query("namaste")  # Collections still connecting: at least load the model
+    except Exception:
+        last_warmup.pop(tenant, None)  # Let the next ping retry
+        raise
+    return True
+
 # ========================
 # API ENDPOINTS
 # ========================
 
+@app.middleware("http")
+async def log_slow_requests(request: Request, call_next):
+    """Time every request and log its stage breakdown when it exceeds SLOW_REQUEST_THRESHOLD_MS"""
+    if SLOW_REQUEST_THRESHOLD_MS <= 0:
+        return await call_next(request)
+    stages = {}
+    token = request_stages.set(stages)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        request_stages.reset(token)
+        total_seconds = time.perf_counter() - started
+        if total_seconds * 1000 >= SLOW_REQUEST_THRESHOLD_MS:
+            log_slow_request(request.method, request.url.path, status, total_seconds, stages)
+
 @app.on_event("startup")
 async def startup_event():
-    initialize_vector_store()
+    mirror_served = False
+    if prefork_workers:
+        # Forked by serve_prefork(): model and read index came from the parent, only Chroma clients are per worker
+        if vector_index is None:
+            await run_in_threadpool(connect_all_stores)
+        elif not CHROMA_MIRROR_ENABLED:
+            threading.Thread(target=connect_all_stores, name="chroma-connect", daemon=True).start()
+        if prefork_workers > 1:
+            threading.Thread(target=knowledge_version_watch_loop, name="knowledge-version-watch", daemon=True).start()
+        print(f"👷 Worker {os.getpid()} ready")
+    elif load_snapshot_for_serving():
+        # Chat is served from the snapshot right away; Chroma (needed for uploads) connects in the background
+        threading.Thread(target=connect_stores_behind_snapshot, name="chroma-connect", daemon=True).start()
+    elif load_mirror_for_serving():
+        # Chat reads the mirror right away; the sync thread below connects to Chroma Cloud (re-ingesting if knowledge/ changed)
+        mirror_served = True
+    else:
+        initialize_vector_store()
+    if CHROMA_MIRROR_ENABLED:
+        threading.Thread(target=mirror_sync_loop, args=(mirror_served,), name="chroma-mirror-sync", daemon=True).start()
+    try:
+        usage_ledger.start()
+    except Exception as e:
+        print(f"⚠️ Usage ledger disabled ({USAGE_LEDGER_PATH}): {e}")
+    asyncio.create_task(precomputed_answers.start())
 
 @app.get("/")
 async def root():
     return {"message": "Mitraa Chatbot API v2.1 (OpenAI + ChromaDB)", "status": "running"}
 
+@app.get("/api/warmup")
+async def warmup(response: Response, tenant: Optional[str] = None):
+    """Cheap ping sent by the widget before the first message; loads whatever the first chat would wait for"""
+    tenant = resolve_tenant(tenant)
+    started = time.perf_counter()
+    warmed = await run_in_threadpool(warm_up, tenant)
+    response.headers["Cache-Control"] = "no-store"
+    return {"status": "ready", "warmed": warmed, "ms": round((time.perf_counter() - started) * 1000, 1)}
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     if not OPENAI_API_KEY:
         raise HTTPException(500, "OPENAI_API_KEY missing")
         
+    deadline = time.monotonic() + CHAT_DEADLINE_SECONDS
     try:
+        tenant = resolve_tenant(request.tenant)
+
+        # Per-session rate limit. A first message has no session yet and gets a fresh one here; keying it on the
+        # client address instead would put every visitor behind a hosting proxy into one bucket, so first messages
+        # are only bounded by the LLM admission queue
+        session_id = request.session_id or str(uuid.uuid4())
+        if request.session_id:
+            session_rate_limiter.check(request.session_id)
+        
+        # Older turns are folded into the running summary; only the latest are replayed
+        if not verify_summary(request.conversation_summary):
+            raise HTTPException(400, "Conversation summary was modified or is from another server; please start a new conversation")
+        summary, recent_history = compact_history(request.conversation_history or [], request.conversation_summary)
+        is_first_turn = not recent_history and not summary.covered_messages
+        usage_ledger.record_query(request.session_id, request.message, is_first_turn, tenant)
+
         # Count user messages in conversation history
-        user_message_count = sum(1 for msg in request.conversation_history if msg.role == "user")
+        user_message_count = summary.user_turns + sum(1 for msg in recent_history if msg.role == "user")
         user_message_count += 1  # Include current message
         
         # Check if conversation limit exceeded
         if user_message_count > MAX_CONVERSATION_TURNS:
-            import uuid
-            session_id = request.session_id or str(uuid.uuid4())
-            
             limit_message = f"""🙏 Namaste!
 
 I notice you have many questions. For detailed assistance and personalized guidance, please connect with our support team:
 
-📞 **Call Us:** +91-8010513511 (Neha)
-💬 **WhatsApp:** https://wa.me/919205661114
-📧 **Email:** oorzaayatra@m2t.ai
-🌐 **Contact Form:** https://oorzaayatra.com/contact
+{support_contact_details(tenant)}
 
 Our team will be happy to help you with all your queries! ✨"""
+            usage_ledger.record(session_id, "turn_limit")
             
             return ChatResponse(
                 response=limit_message,
                 session_id=session_id,
                 should_escalate=True,
-                links=[
-                    {"text": "Neha: 8010513511", "url": "tel:8010513511", "type": "live_agent", "note": "For operational coordination, internal follow-ups, and yatra execution related communication."},
-                    {"text": "WhatsApp Support", "url": "https://wa.me/919205661114", "type": "whatsapp"},
-                    {"text": "Contact Us", "url": "https://oorzaayatra.com/contact", "type": "contact"}
-                ],
-                used_rag=False
+                links=support_links("turn_limit", tenant),
+                used_rag=False,
+                conversation_summary=summary
             )
         
         # Prepare history
         chat_history = []
-        for msg in request.conversation_history:
+        for msg in recent_history:
             if msg.role == "user":
                 chat_history.append(HumanMessage(content=msg.content))
             else:
                 chat_history.append(AIMessage(content=msg.content))
         
+        # Popular first-turn questions are answered from the precomputed set, without an LLM call
+        precomputed = None
+        if is_first_turn and not tenant:
+            with timed_stage("precomputed_lookup"):
+                precomputed = await run_in_threadpool(precomputed_answers.lookup, request.message)
+
         # Get RAG response
-        response_text = get_rag_response(request.message, chat_history)
+        with timed_stage("rag"):
+            if precomputed:
+                answer = RAGAnswer(text=precomputed["answer"], precomputed=True)
+            else:
+                answer = await get_rag_response(request.message, chat_history, deadline=deadline, tenant=tenant,
+                                                history_summary=render_summary(summary))
+        response_text = answer.text
         
         # Escalation logic for complex/uncertain queries
-        import uuid
-        session_id = request.session_id or str(uuid.uuid4())
-        links = detect_links_needed(request.message)
+        links = detect_links_needed(request.message, tenant)
         escalate = check_escalation(session_id, response_text)
         show_live_agent_option = escalate
         show_callback_option = escalate
         escalation_reason = None
         if escalate:
             escalation_reason = "Complex or unclear query. User may need human support."
-            # Add Neha's direct contact for operations
-            links.append({
-                "text": "Neha: 8010513511",
-                "url": "tel:8010513511",
-                "type": "live_agent",
-                "note": "For operational coordination, internal follow-ups, and yatra execution related communication."
-            })
-            links.append({
-                "text": "Connect with a Human Agent",
-                "url": "https://oorzaayatra.com/contact",
-                "type": "live_agent"
-            })
-            links.append({
-                "text": "Request a Callback",
-                "url": "https://oorzaayatra.com/callback",
-                "type": "callback"
-            })
+            # Direct contact for operations, a human agent and a callback (the tenant's own for tenant requests)
+            links.extend(support_links("escalation", tenant))
+
+        # Ledger: tokens and latency of this answer, tagged with its path and the collections it drew on
+        if answer.degraded:
+            answer_path = "degraded"
+        elif answer.precomputed:
+            answer_path = "precomputed"
+        elif answer.usage is None:
+            answer_path = "no_context"
+        else:
+            answer_path = "escalation" if escalate else "rag"
+        usage_ledger.record(
+            session_id,
+            answer_path,
+            usage=answer.usage,
+            latency_ms=answer.llm_latency_ms,
+            collections=precomputed["collections"] if precomputed else [doc.metadata.get("source_category", "unknown") for doc in answer.docs],
+            model=answer.model
+        )
         return ChatResponse(
             response=response_text,
             session_id=session_id,
@@ -911,7 +3550,9 @@ Our team will be happy to help you with all your queries! ✨"""
             links=links,
             used_rag=True,
             show_live_agent_option=show_live_agent_option,
-            show_callback_option=show_callback_option
+            show_callback_option=show_callback_option,
+            degraded=answer.degraded,
+            conversation_summary=summary
         )
         # Callback request model and endpoint
         from fastapi import Body
@@ -932,19 +3573,142 @@ Our team will be happy to help you with all your queries! ✨"""
             # In production, send to CRM or notify agent
             return {"success": True, "message": "Callback request received. Our team will contact you soon!"}
         
+    except AdmissionRejected as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": str(e.retry_after)})
+    except openai.RateLimitError as e:
+        # Upstream is throttling us: pass the back-pressure on instead of failing with a 500
+        retry_after = e.response.headers.get("retry-after", "5") if e.response is not None else "5"
+        raise HTTPException(429, "The assistant is busy right now, please retry shortly", headers={"Retry-After": retry_after})
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error: {e}")
         raise HTTPException(500, str(e))
 
+@app.get("/api/metrics/admission")
+async def get_admission_metrics(request: Request):
+    """LLM concurrency, queue depth, queue wait times, rejections, latency and hedging (per process; admin only)"""
+    require_admin(request)
+    latencies = list(llm_latencies)
+    return {
+        "llm": llm_admission.stats(),
+        "session_rate_limit": session_rate_limiter.stats(),
+        "llm_latency": {
+            "samples": len(latencies),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "hedge_delay_ms": round(hedge_delay_seconds() * 1000, 1),
+            "deadline_seconds": CHAT_DEADLINE_SECONDS,
+            **latency_stats
+        }
+    }
+
+@app.get("/api/admin/profile")
+async def profile(request: Request, seconds: float = 10, mode: str = "sample", format: str = "json",
+                  include_idle: bool = False, sort: str = "cumulative", limit: int = 60):
+    """
+    Profile the live process for `seconds` (admin only, X-Admin-Key).
+    mode=sample samples every busy thread's stack (include_idle=true keeps parked threads; format=folded gives flamegraph/speedscope input);
+    mode=cprofile runs cProfile on the event loop thread and returns the pstats report as text.
+    """
+    require_admin(request)
+    if mode not in ("sample", "cprofile"):
+        raise HTTPException(400, "mode must be 'sample' or 'cprofile'")
+    seconds = min(max(seconds, 0.1), PROFILE_MAX_SECONDS)
+    if not profile_lock.acquire(blocking=False):
+        raise HTTPException(409, "A profile is already being captured")
+    try:
+        if mode == "sample":
+            result = await run_in_threadpool(sample_stacks, seconds, PROFILE_SAMPLE_INTERVAL_MS / 1000, include_idle)
+            if format == "folded":
+                return PlainTextResponse(result["folded"])
+            return {"mode": mode, "seconds": seconds, **result}
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            raise HTTPException(409, f"Could not start cProfile: {e}")
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        try:
+            stats.sort_stats(sort)
+        except KeyError:
+            raise HTTPException(400, f"Unknown sort key '{sort}'")
+        stats.print_stats(max(1, limit))
+        return PlainTextResponse(stream.getvalue())
+    finally:
+        profile_lock.release()
+
+@app.get("/api/tenants")
+async def get_tenants(request: Request):
+    """Configured tenants, which are loaded, and their index memory against the cap (admin only)"""
+    require_admin(request)
+    return {"default": DEFAULT_TENANT, **tenant_registry.stats()}
+
+@app.get("/api/admin/precomputed")
+async def get_precomputed_answers(request: Request):
+    """Precomputed first-turn answers: whether they are active, the questions covered and hit/miss counts (admin only)"""
+    require_admin(request)
+    return precomputed_answers.stats()
+
+@app.post("/api/admin/precomputed/refresh")
+async def refresh_precomputed_answers(request: Request):
+    """Check the precomputed answers against the collections now and re-answer them if the knowledge changed (admin only)"""
+    require_admin(request)
+    if not precomputed_answers.entries:
+        raise HTTPException(404, "No precomputed answers loaded")
+    await precomputed_answers.refresh(force=True)
+    return precomputed_answers.stats()
+
+@app.get("/api/admin/embeddings")
+async def get_embedding_stats(request: Request):
+    """Embedding backend in use, torch threads, and how many queries were coalesced into each forward pass (admin only)"""
+    require_admin(request)
+    if embedding_model is None:
+        return {"loaded": False, "backend": EMBEDDING_BACKEND, "torch_threads": torch_threads}
+    stats = embedding_model.stats() if hasattr(embedding_model, "stats") else {}
+    return {"loaded": True, "torch_threads": torch_threads, **stats}
+
+@app.get("/api/admin/usage")
+async def get_usage(request: Request, group_by: str = "day", days: int = 30, limit: int = 100):
+    """Token usage, LLM latency and estimated cost from the usage ledger, grouped by day, session or answer path (admin only)"""
+    require_admin(request)
+    if group_by not in ("day", "session", "path"):
+        raise HTTPException(400, "group_by must be one of: day, session, path")
+    if not usage_ledger.enabled:
+        raise HTTPException(503, "Usage ledger is not available")
+    rows = await run_in_threadpool(usage_ledger.aggregate, group_by, max(1, days), max(1, min(limit, 1000)))
+    totals = await run_in_threadpool(usage_ledger.aggregate, "all", max(1, days), 1)
+    return {
+        "group_by": group_by,
+        "days": days,
+        "prices_per_1m_tokens": {
+            "input": LLM_PRICE_INPUT_PER_1M,
+            "cached_input": LLM_PRICE_CACHED_INPUT_PER_1M,
+            "output": LLM_PRICE_OUTPUT_PER_1M
+        },
+        "totals": totals[0] if totals else None,
+        "rows": rows,
+        "dropped_rows": usage_ledger.dropped
+    }
+
 @app.post("/api/knowledge/upload")
 async def upload_knowledge(
     file: UploadFile = File(...),
-    collection: str = Form(...)
+    collection: str = Form(...),
+    tenant: Optional[str] = Form(None)
 ):
     """Upload a knowledge file (.txt, .md, or .pdf) directly to Chroma Cloud"""
     try:
-        # Validate collection
-        valid_collections = ['yatras', 'faqs', 'policies']
+        # Validate collection (against the tenant's own collections for tenant uploads)
+        tenant = resolve_tenant(tenant)
+        valid_collections = list(tenant_registry.configs[tenant].collections) if tenant else ['yatras', 'faqs', 'policies']
         if collection not in valid_collections:
             raise HTTPException(400, f"Invalid collection. Must be one of: {', '.join(valid_collections)}")
         
@@ -959,46 +3723,24 @@ async def upload_knowledge(
         if not content:
             raise HTTPException(400, "File is empty")
         
-        # Parse content based on file type
-        if file.filename.endswith('.pdf'):
-            # Parse PDF
-            try:
-                from PyPDF2 import PdfReader
-                import io
-                pdf_reader = PdfReader(io.BytesIO(content))
-                content_str = ""
-                for page in pdf_reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        content_str += text + "\n"
-                if not content_str.strip():
-                    raise HTTPException(400, "Could not extract text from PDF")
-            except ImportError:
-                raise HTTPException(500, "PDF parsing library not installed")
-            except Exception as e:
-                raise HTTPException(400, f"Failed to parse PDF: {str(e)}")
-        else:
-            # Parse text/markdown
-            try:
-                content_str = content.decode('utf-8')
-            except UnicodeDecodeError:
-                raise HTTPException(400, "File must be valid UTF-8 text")
-        
-        # Initialize embeddings
-        embeddings = HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
-        
-        # Initialize vector stores if not already done
-        if not vector_stores:
-            initialize_vector_store()
+        # Parse content based on file type (PDF parsing is CPU-bound: keep it off the event loop)
+        content_str = await run_in_threadpool(extract_upload_text, file.filename, content)
         
-        # Ingest directly to Chroma Cloud (no local storage)
-        chunks_added = ingest_content_to_collection(collection, content_str, file.filename, embeddings)
+        if tenant:
+            kb = await run_in_threadpool(tenant_registry.get, tenant)
+            chunks_added = await run_in_threadpool(kb.ingest_content, collection, content_str, file.filename)
+        else:
+            # Shared embedding model (loading one per upload would cost another copy of the model)
+            embeddings = await run_in_threadpool(get_embedding_model)
+
+            # Initialize vector stores if not already done
+            if not vector_stores:
+                await run_in_threadpool(initialize_vector_store)
+
+            # Ingest directly to Chroma Cloud (no local storage); embedding and writes run in a worker thread like bulk uploads
+            chunks_added = await run_in_threadpool(ingest_content_to_collection, collection, content_str, file.filename, embeddings)
         
-        print(f"📤 File uploaded: {file.filename} → {collection} collection ({chunks_added} chunks)")
+        print(f"📤 File uploaded: {file.filename} → {tenant or DEFAULT_TENANT}/{collection} collection ({chunks_added} chunks)")
         
         return {
             "success": True,
@@ -1015,23 +3757,62 @@ async def upload_knowledge(
         print(f"Upload error: {e}")
         raise HTTPException(500, f"Upload failed: {str(e)}")
 
+@app.post("/api/knowledge/upload/bulk")
+async def bulk_upload_knowledge(
+    files: List[UploadFile] = File(...),
+    collection: Optional[str] = Form(None),
+    mappings: Optional[str] = Form(None),
+    tenant: Optional[str] = Form(None)
+):
+    """
+    Upload many .txt/.md/.pdf files and/or .zip archives of them in one request.
+    Each file goes to `mappings[filename]` (JSON), else `collection`, else the collection its name suggests;
+    files already stored with identical content are skipped.
+    """
+    try:
+        tenant = resolve_tenant(tenant)
+        valid_collections = list(tenant_registry.configs[tenant].collections) if tenant else list(COLLECTIONS)
+        try:
+            mapping = json.loads(mappings) if mappings else {}
+        except json.JSONDecodeError as e:
+            raise HTTPException(400, f"mappings must be a JSON object of filename -> collection: {e}")
+        if not isinstance(mapping, dict):
+            raise HTTPException(400, "mappings must be a JSON object of filename -> collection")
+        for target in [collection, *mapping.values()]:
+            if target and target not in valid_collections:
+                raise HTTPException(400, f"Invalid collection '{target}'. Must be one of: {', '.join(valid_collections)}")
+
+        with tempfile.TemporaryDirectory(prefix="bulk_upload_") as tmp_dir:
+            # Stream every upload to disk first; archives are then read entry by entry
+            saved_files = []
+            for position, upload in enumerate(files):
+                filename = Path(upload.filename or f"upload_{position}").name
+                if not filename.lower().endswith(KNOWLEDGE_FILE_EXTENSIONS + (".zip",)):
+                    raise HTTPException(400, f"'{filename}': only .txt, .md, .pdf and .zip files are allowed")
+                path = Path(tmp_dir) / f"{position}_{filename}"
+                with open(path, "wb") as out:
+                    while block := await upload.read(1024 * 1024):
+                        out.write(block)
+                saved_files.append((path, filename))
+
+            result = await run_in_threadpool(bulk_ingest, iter_upload_sources(saved_files), collection, mapping, tenant)
+
+        return {
+            "success": True,
+            "message": f"{len(result['ingested'])} files ingested ({result['chunks']} chunks), {len(result['skipped'])} skipped",
+            **result
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Bulk upload error: {e}")
+        raise HTTPException(500, f"Bulk upload failed: {str(e)}")
+
 @app.get("/api/knowledge/files")
-async def list_knowledge_files():
-    """List all knowledge files in the knowledge base"""
+async def list_knowledge_files(request: Request):
+    """List all knowledge files in the knowledge base (served from the stats snapshot, 304 when unchanged)"""
     try:
-        knowledge_dir = Path(__file__).parent / "knowledge"
-        if not knowledge_dir.exists():
-            return {"files": []}
-        
-        files = []
-        for file_path in sorted(knowledge_dir.glob("*.txt")) + sorted(knowledge_dir.glob("*.md")):
-            files.append({
-                "name": file_path.name,
-                "size_bytes": file_path.stat().st_size,
-                "modified": file_path.stat().st_mtime
-            })
-        
-        return {"files": files}
+        return await serve_stats_snapshot(files_stats, request)
     except Exception as e:
         print(f"Error listing files: {e}")
         raise HTTPException(500, str(e))
@@ -1050,6 +3831,7 @@ async def delete_knowledge_file(filename: str):
             raise HTTPException(400, "Can only delete .txt and .md files")
         
         file_path.unlink()
+        invalidate_knowledge_stats()
         
         # Trigger re-ingestion
         print(f"\n🗑️ File deleted: {filename}")
@@ -1063,40 +3845,26 @@ async def delete_knowledge_file(filename: str):
         raise HTTPException(500, str(e))
 
 @app.get("/api/knowledge/collections")
-async def get_collections_info():
-    """Get information about all collections"""
+async def get_collections_info(request: Request):
+    """Get information about all collections (served from the stats snapshot, 304 when unchanged)"""
     try:
-        collections_info = []
-        for category, config in COLLECTIONS.items():
-            info = {
-                "category": category,
-                "name": config["name"],
-                "description": config["description"],
-                "file_patterns": config["files"],
-                "loaded": category in vector_stores
-            }
-            
-            if category in vector_stores:
-                # Get collection stats
-                try:
-                    collection = vector_stores[category]._collection
-                    info["document_count"] = collection.count()
-                except:
-                    info["document_count"] = "N/A"
-            else:
-                info["document_count"] = 0
-            
-            collections_info.append(info)
-        
-        return {
-            "collections": collections_info,
-            "total_collections": len(COLLECTIONS),
-            "active_collections": len(vector_stores)
-        }
+        return await serve_stats_snapshot(collections_stats, request)
     except Exception as e:
         print(f"Error getting collections: {e}")
         raise HTTPException(500, str(e))
 
+@app.get("/api/knowledge/mirror")
+async def get_mirror_status(request: Request):
+    """Local mirror of the Chroma Cloud collections: size, last sync, last version check and last error (admin only)"""
+    require_admin(request)
+    return mirror_status
+
+@app.get("/api/knowledge/ingest/progress")
+async def get_ingest_progress(request: Request):
+    """Per-collection progress of the most recent ingest (batches/chunks embedded and written), keyed by Chroma collection name (admin only)"""
+    require_admin(request)
+    return {"collections": ingest_progress}
+
 @app.post("/api/knowledge/refresh")
 async def refresh_knowledge_base():
     """
@@ -1108,6 +3876,7 @@ async def refresh_knowledge_base():
         if KNOWLEDGE_HASH_FILE.exists():
             KNOWLEDGE_HASH_FILE.unlink()
             print("🔄 Cleared knowledge hash to force re-ingestion.")
+        invalidate_knowledge_stats()
         initialize_vector_store()
         return {
             "success": True,
@@ -1118,7 +3887,45 @@ async def refresh_knowledge_base():
         raise HTTPException(500, f"Refresh failed: {str(e)}")
 
 if __name__ == "__main__":
-    import uvicorn
-    port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mitraa Chatbot API")
+    subparsers = parser.add_subparsers(dest="command")
+    serve_parser = subparsers.add_parser("serve", help="Run the API server (default)")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    serve_parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Worker processes sharing one preloaded model (default: WEB_CONCURRENCY)")
+    serve_parser.add_argument("--threads-per-worker", type=int, default=TORCH_THREADS_PER_WORKER, help="Torch threads per worker (default: cores / workers)")
+    for name, help_text in [("export-snapshot", "Write all collections to a memory-mappable snapshot"),
+                            ("import-snapshot", "Load a snapshot into Chroma without re-embedding")]:
+        snapshot_parser = subparsers.add_parser(name, help=help_text)
+        snapshot_parser.add_argument("--path", default=str(KNOWLEDGE_SNAPSHOT_PATH), help="Snapshot base path (.jsonl and .<version>.npy are appended)")
+    check_parser = subparsers.add_parser("check-embeddings", help="Compare an embedding backend with fp32: vector agreement, top-k overlap, speed")
+    check_parser.add_argument("--backend", default="int8", choices=sorted(EMBEDDING_BACKENDS))
+    check_parser.add_argument("--k", type=int, default=5, help="Chunks per query compared for top-k overlap")
+    check_parser.add_argument("--min-cosine", type=float, default=0.98, help="Fail below this mean cosine to the fp32 vectors")
+    check_parser.add_argument("--min-overlap", type=float, default=0.9, help="Fail below this top-k overlap (queries against fp32 chunks)")
+    parser.set_defaults(host="0.0.0.0", port=int(os.getenv("PORT", 8000)), workers=SERVER_WORKERS, threads_per_worker=TORCH_THREADS_PER_WORKER)
+    args = parser.parse_args()
+
+    if args.command == "export-snapshot":
+        export_snapshot(Path(args.path))
+    elif args.command == "import-snapshot":
+        import_snapshot(Path(args.path))
+    elif args.command == "check-embeddings":
+        report = compare_embedding_backends(args.backend, k=args.k)
+        print(json.dumps(report, indent=2))
+        if report["cosine_mean"] < args.min_cosine or report["top_k_overlap_mixed"] < args.min_overlap:
+            print(f"❌ {args.backend} does not agree closely enough with fp32")
+            sys.exit(1)
+        print(f"✅ {args.backend} agrees with fp32: {report['documents_speedup']}x chunk throughput, "
+              f"{report['query_speedup']}x single-query latency, {report[args.backend]['weight_mb']} MB of weights")
+    elif args.workers > 1 and hasattr(os, "fork") and effective_worker_count(args.workers) > 1:
+        threads = args.threads_per_worker or max(1, available_cpu_cores() // args.workers)
+        serve_prefork(args.host, args.port, args.workers, threads)
+    else:
+        import uvicorn
+        if args.threads_per_worker:
+            set_torch_threads(args.threads_per_worker)
+        uvicorn.run(app, host=args.host, port=args.port)
 
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Tests import the app module directly (backend/main.py) and never touch the real ledger or answers file
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+_scratch = Path(tempfile.mkdtemp(prefix="oorzaa-tests-"))
+os.environ.setdefault("USAGE_LEDGER_PATH", str(_scratch / "usage_ledger.sqlite3"))
+os.environ.setdefault("PRECOMPUTED_ANSWERS_PATH", str(_scratch / "precomputed_answers.json"))
@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+# Routes outside /api/admin that expose operational details and need the admin key too
+ADMIN_ONLY_PATHS = {"/api/metrics/admission", "/api/tenants", "/api/knowledge/mirror", "/api/knowledge/ingest/progress"}
+
+def admin_routes():
+    return sorted(
+        (method, route.path) for route in main.app.routes for method in getattr(route, "methods", ())
+        if route.path.startswith("/api/admin/") or route.path in ADMIN_ONLY_PATHS
+    )
+
+def admin_paths():
+    return {path for _, path in admin_routes()}
+
+@pytest.fixture
+def client():
+    # No context manager: startup (model loading, Chroma) is not needed to reach the guard
+    return TestClient(main.app)
+
+def test_every_admin_route_is_listed():
+    assert ADMIN_ONLY_PATHS <= admin_paths()
+    assert {"/api/admin/usage", "/api/admin/profile", "/api/admin/embeddings", "/api/admin/precomputed"} <= admin_paths()
+
+@pytest.mark.parametrize("method, path", admin_routes())
+def test_admin_routes_are_disabled_without_a_configured_key(client, monkeypatch, method, path):
+    monkeypatch.setattr(main, "ADMIN_API_KEY", "")
+    assert client.request(method, path, headers={"X-Admin-Key": ""}).status_code == 403
+
+@pytest.mark.parametrize("method, path", admin_routes())
+def test_admin_routes_reject_a_wrong_key(client, monkeypatch, method, path):
+    monkeypatch.setattr(main, "ADMIN_API_KEY", "secret")
+    assert client.request(method, path).status_code == 401
+    assert client.request(method, path, headers={"X-Admin-Key": "wrong"}).status_code == 401
+
+def test_admin_route_accepts_the_key(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_API_KEY", "secret")
+    response = client.get("/api/tenants", headers={"X-Admin-Key": "secret"})
+    assert response.status_code == 200
+    assert "default" in response.json()
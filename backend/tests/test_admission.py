@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+def test_percentile_uses_nearest_rank():
+    assert main.percentile([], 95) == 0.0
+    assert main.percentile([3, 1, 2, 4], 50) == 2
+    assert main.percentile(list(range(1, 101)), 95) == 95
+
+def test_calls_beyond_the_limit_queue_and_then_run():
+    async def scenario():
+        admission = main.LLMAdmissionController(max_concurrency=1, max_queue=2, queue_timeout=5)
+        running = []
+
+        async def call(name):
+            async with admission.slot():
+                running.append(name)
+                assert admission.in_flight == 1
+                await asyncio.sleep(0.05)
+
+        first = asyncio.create_task(call("first"))
+        await asyncio.sleep(0.01)
+        assert not admission.has_free_slot()
+        second = asyncio.create_task(call("second"))
+        await asyncio.sleep(0.01)
+        assert admission.waiting == 1
+        await asyncio.gather(first, second)
+        return admission, running
+
+    admission, running = asyncio.run(scenario())
+    assert running == ["first", "second"]
+    assert admission.stats()["admitted"] == 2 and admission.stats()["rejected"] == 0
+    assert admission.in_flight == 0 and admission.has_free_slot()
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def scenario():
+        admission = main.LLMAdmissionController(max_concurrency=1, max_queue=1, queue_timeout=5)
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.slot():
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold()) for _ in range(2)]  # One in flight, one queued
+        await asyncio.sleep(0.01)
+        with pytest.raises(main.AdmissionRejected) as rejected:
+            async with admission.slot():
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return admission, rejected.value
+
+    admission, error = asyncio.run(scenario())
+    assert error.retry_after >= 1
+    assert admission.rejected == 1 and admission.admitted == 2
+
+def test_queue_timeout_is_rejected():
+    async def scenario():
+        admission = main.LLMAdmissionController(max_concurrency=1, max_queue=5, queue_timeout=0.05)
+        async with admission.slot():
+            with pytest.raises(main.AdmissionRejected, match="Timed out"):
+                async with admission.slot():
+                    pass
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.waiting == 0 and admission.rejected == 1
+
+def test_session_rate_limit_rejects_only_the_busy_session():
+    limiter = main.SessionRateLimiter(limit=2, window_seconds=60)
+    limiter.check("a")
+    limiter.check("a")
+    with pytest.raises(main.AdmissionRejected) as rejected:
+        limiter.check("a")
+    assert 1 <= rejected.value.retry_after <= 60
+    limiter.check("b")
+    assert limiter.stats()["rejected"] == 1 and limiter.stats()["tracked_sessions"] == 2
+
+def turn_limit_request(session_id=None):
+    # Past the turn limit, so chat() answers without retrieval or an LLM call
+    history = [{"role": "user", "content": f"question {turn}"} for turn in range(main.MAX_CONVERSATION_TURNS)]
+    return {"message": "one more", "conversation_history": history, "session_id": session_id}
+
+def test_first_messages_without_a_session_are_not_limited_together(monkeypatch):
+    # Behind a hosting proxy every visitor has the same client address: first messages must not share one bucket
+    monkeypatch.setattr(main, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(main, "session_rate_limiter", main.SessionRateLimiter(limit=2, window_seconds=60))
+    client = TestClient(main.app)
+    responses = [client.post("/api/chat", json=turn_limit_request()) for _ in range(5)]
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len({response.json()["session_id"] for response in responses}) == 5
+
+    session_id = responses[0].json()["session_id"]
+    statuses = [client.post("/api/chat", json=turn_limit_request(session_id)).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
@@ -0,0 +1,64 @@
+import main
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.rows = []  # (document, metadata)
+
+    def get(self, include=()):
+        return {"metadatas": [metadata for _, metadata in self.rows]}
+
+    def delete(self, where):
+        sources = where["source"]["$in"]
+        self.rows = [row for row in self.rows if row[1]["source"] not in sources]
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.rows.extend(zip(documents, metadatas))
+
+class FakeStore:
+    def __init__(self, name):
+        self._collection = FakeCollection(name)
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+class Stores(dict):
+    refreshes: list
+
+def make_stores(monkeypatch):
+    stores = Stores(faqs=FakeStore("oorzaa_faqs"))
+    monkeypatch.setattr(main, "vector_stores", stores)
+    monkeypatch.setattr(main, "ingest_progress", {})
+    monkeypatch.setattr(main, "get_embedding_model", lambda: FakeEmbeddings())
+    stores.refreshes = []
+    monkeypatch.setattr(main, "refresh_vector_index", lambda changed=None: stores.refreshes.append(changed))
+    return stores
+
+def sources(*files):
+    return [(filename, text.encode("utf-8"), None) for filename, text in files]
+
+def test_bulk_upload_skips_duplicates_and_unchanged_files(monkeypatch):
+    stores = make_stores(monkeypatch)
+    first = main.bulk_ingest(sources(("faq.md", "Q: When?\nA: Now."), ("copy.md", "Q: When?\nA: Now.")), collection="faqs")
+    assert [item["filename"] for item in first["ingested"]] == ["faq.md"]
+    assert first["skipped"] == [{"filename": "copy.md", "reason": "duplicate of faq.md in this upload"}]
+
+    second = main.bulk_ingest(sources(("faq.md", "Q: When?\nA: Now.")), collection="faqs")
+    assert second["ingested"] == [] and second["skipped"] == [{"filename": "faq.md", "reason": "unchanged"}]
+
+    third = main.bulk_ingest(sources(("faq.md", "Q: When?\nA: Tomorrow.")), collection="faqs")
+    assert third["ingested"][0]["replaced"]
+    assert {row[0] for row in stores["faqs"]._collection.rows} == {"Q: When?\nA: Tomorrow."}
+    # One index refresh per request that changed something, re-reading only that collection
+    assert stores.refreshes == [{"faqs"}, {"faqs"}]
+
+def test_ingest_progress_is_keyed_by_chroma_collection_name(monkeypatch):
+    stores = make_stores(monkeypatch)
+    chunks = [("Q: When?\nA: Now.", {"source": "faq.md"})]
+    main.run_ingest_pipeline("faqs", iter(chunks), FakeEmbeddings())
+    main.run_ingest_pipeline("acme/faqs", iter(chunks), FakeEmbeddings(), store=FakeStore("acme_faqs"))
+    assert set(main.ingest_progress) == {"oorzaa_faqs", "acme_faqs"}
+    assert main.ingest_progress["acme_faqs"]["collection"] == "acme/faqs"
+    assert all(progress["status"] == "done" and progress["chunks_written"] == 1 for progress in main.ingest_progress.values())
+    assert stores["faqs"]._collection.rows
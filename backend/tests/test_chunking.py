@@ -0,0 +1,68 @@
+import main
+
+SETTINGS = {**main.DEFAULT_RETRIEVAL_SETTINGS, "chunk_size": 1000, "chunk_overlap": 100}
+
+SCHEDULE = """Oorzaa Yatra - Upcoming Yatras 2025
+
+📍 Kedarnath Mega Yatra
+A wonderful spiritual yatra for families
+Highlights of this yatra
+- Helicopter darshan
+- Guided aarti at the temple
+Dates: 12 May 2025 - 18 May 2025
+Price: ₹45,000 per person
+Transport: Volvo AC coach from Delhi
+
+📍 Ayodhya Mini Yatra
+Dates: 22 Jan 2025 - 24 Jan 2025
+Price: ₹12,500 per person
+
+Char Dham Mid Yatra
+Duration: 10 days
+Price: ₹65,000 per person
+
+Yatra Name: Kashi Vishwanath Darshan
+Dates: 3 Mar 2025 - 5 Mar 2025
+Price: ₹15,000
+"""
+
+def entries():
+    return [(text, metadata) for text, metadata in main.chunk_yatra_entries(SCHEDULE, SETTINGS)]
+
+def test_description_lines_mentioning_yatra_stay_in_their_entry():
+    chunks = entries()
+    names = [metadata.get("yatra_name") for _, metadata in chunks if metadata]
+    assert names == ["Kedarnath Mega Yatra", "Ayodhya Mini Yatra", "Char Dham Mid Yatra", "Kashi Vishwanath Darshan"]
+    kedarnath = next(text for text, metadata in chunks if metadata.get("yatra_name") == "Kedarnath Mega Yatra")
+    assert "Highlights of this yatra" in kedarnath
+    assert "A wonderful spiritual yatra for families" in kedarnath
+    assert "12 May 2025" in kedarnath and "₹45,000" in kedarnath
+
+def test_title_line_needs_its_own_detail_fields():
+    chunks = entries()
+    char_dham = next(text for text, metadata in chunks if metadata.get("yatra_name") == "Char Dham Mid Yatra")
+    assert "Duration: 10 days" in char_dham and "₹65,000" in char_dham
+
+def test_yatra_category_is_tagged():
+    categories = {metadata["yatra_name"]: metadata.get("yatra_category") for _, metadata in entries() if metadata}
+    assert categories["Kedarnath Mega Yatra"] == "Mega"
+    assert categories["Ayodhya Mini Yatra"] == "Mini"
+
+def test_file_heading_is_not_an_entry():
+    first_text, first_metadata = entries()[0]
+    assert first_text.startswith("Oorzaa Yatra - Upcoming Yatras")
+    assert first_metadata == {}
+
+def test_long_entry_repeats_its_title_on_every_piece():
+    long_entry = "📍 Amarnath Mega Yatra\nDates: 1 Jul 2025\n" + "Details of the trek route. " * 100
+    pieces = list(main.chunk_yatra_entries("📍 Other Yatra\nPrice: ₹1\n\n" + long_entry, {**SETTINGS, "chunk_size": 400}))
+    amarnath = [text for text, metadata in pieces if metadata.get("yatra_name") == "Amarnath Mega Yatra"]
+    assert len(amarnath) > 1
+    assert all(text.startswith("📍 Amarnath Mega Yatra") for text in amarnath)
+
+def test_qa_pairs_keep_answer_with_question():
+    faq = "FAQ\n\nQ1. Is food included?\nYes, all meals are included.\n\nQ2. Can I cancel?\nYes, up to 7 days before departure.\n"
+    chunks = list(main.chunk_qa_pairs(faq, SETTINGS))
+    questions = {metadata["question"]: text for text, metadata in chunks if metadata}
+    assert set(questions) == {"Is food included?", "Can I cancel?"}
+    assert "7 days before departure" in questions["Can I cancel?"]
@@ -0,0 +1,72 @@
+import subprocess
+import sys
+
+import pytest
+
+import main
+
+fcntl = pytest.importorskip("fcntl")
+
+@pytest.fixture
+def mirror_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "CHROMA_MIRROR_PATH", tmp_path / "cloud_mirror")
+    monkeypatch.setattr(main, "mirror_sync_lock_file", None)
+    monkeypatch.setitem(main.mirror_status, "sync_owner", False)
+    yield tmp_path / "cloud_mirror"
+    if main.mirror_sync_lock_file is not None:
+        main.mirror_sync_lock_file.close()
+
+def test_only_one_process_owns_the_mirror_sync(mirror_path):
+    lock_path = mirror_path.with_name(mirror_path.name + ".sync.lock")
+    holder = subprocess.Popen([sys.executable, "-c", (
+        "import fcntl, sys, time\n"
+        f"f = open({str(lock_path)!r}, 'w'); fcntl.flock(f, fcntl.LOCK_EX)\n"
+        "print('locked', flush=True); time.sleep(30)\n"
+    )], stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        assert not main.acquire_mirror_sync_lock()
+        assert not main.mirror_status["sync_owner"]
+    finally:
+        holder.kill()
+        holder.wait()
+    # The owner exited: the next check takes over
+    assert main.acquire_mirror_sync_lock()
+    assert main.mirror_status["sync_owner"]
+
+@pytest.fixture
+def cloud_stores(monkeypatch):
+    opened = []
+    synced = []
+    monkeypatch.setattr(main, "vector_stores", {})
+    monkeypatch.setattr(main, "initialize_vector_store", lambda *a, **k: pytest.fail("sync must not run the re-ingest check"))
+    monkeypatch.setattr(main, "get_chroma_client", lambda: "client")
+    monkeypatch.setattr(main, "get_embedding_model", lambda: "embeddings")
+    monkeypatch.setattr(main, "open_collection_store", lambda category, embeddings, reset=False, chroma_client=None: opened.append((category, reset)) or main.vector_stores.setdefault(category, object()))
+    monkeypatch.setattr(main, "chroma_fingerprints", lambda: {"yatras": "1:a"})
+    monkeypatch.setattr(main, "refresh_vector_index", lambda: synced.append(True))
+    monkeypatch.setitem(main.mirror_status, "fingerprints", {})
+    return opened, synced
+
+def test_sync_owner_opens_existing_collections_without_ingesting(mirror_path, cloud_stores):
+    opened, synced = cloud_stores
+    main.mirror_sync_once()
+    assert sorted(opened) == sorted((category, False) for category in main.COLLECTIONS)
+    assert synced == [True]
+
+def test_followers_open_the_collections_but_do_not_sync(mirror_path, cloud_stores):
+    opened, synced = cloud_stores
+    lock_path = mirror_path.with_name(mirror_path.name + ".sync.lock")
+    holder = subprocess.Popen([sys.executable, "-c", (
+        "import fcntl, time\n"
+        f"f = open({str(lock_path)!r}, 'w'); fcntl.flock(f, fcntl.LOCK_EX)\n"
+        "print('locked', flush=True); time.sleep(30)\n"
+    )], stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        main.mirror_sync_once()
+    finally:
+        holder.kill()
+        holder.wait()
+    assert sorted(opened) == sorted((category, False) for category in main.COLLECTIONS)
+    assert synced == [] and not main.mirror_status["sync_owner"]
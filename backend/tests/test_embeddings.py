@@ -0,0 +1,64 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import main
+
+class FakeModel:
+    """Stands in for SentenceTransformer: a text's vector is [len(text), 1]; the first pass waits until released"""
+
+    def __init__(self):
+        self.passes = []
+        self.release_first = threading.Event()
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+    def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy, show_progress_bar):
+        self.passes.append(list(texts))
+        if len(self.passes) == 1:
+            self.release_first.wait(5)
+        if any(text == "boom" for text in texts):
+            raise RuntimeError("encode failed")
+        return np.array([[len(text), 1.0] for text in texts])
+
+def test_concurrent_queries_are_coalesced_into_one_pass():
+    model = FakeModel()
+    embeddings = main.LocalEmbeddings(model, "fp32")
+    results = {}
+
+    def ask(text):
+        results[text] = embeddings.embed_query(text)
+
+    first = threading.Thread(target=ask, args=("a",))
+    first.start()
+    while not model.passes:
+        time.sleep(0.001)
+    waiting = [threading.Thread(target=ask, args=(text,)) for text in ("bb", "ccc", "dddd")]
+    for thread in waiting:
+        thread.start()
+    while len(embeddings._pending) < 3:
+        time.sleep(0.001)
+    model.release_first.set()
+    for thread in [first, *waiting]:
+        thread.join()
+
+    assert model.passes[0] == ["a"] and sorted(model.passes[1]) == ["bb", "ccc", "dddd"]
+    assert {text: vector[0] for text, vector in results.items()} == {"a": 1, "bb": 2, "ccc": 3, "dddd": 4}
+    assert embeddings.stats()["queries"] == 4 and embeddings.stats()["query_passes"] == 2
+
+def test_encode_errors_reach_the_caller_and_documents_are_counted():
+    model = FakeModel()
+    model.release_first.set()
+    embeddings = main.LocalEmbeddings(model, "int8")
+    with pytest.raises(RuntimeError, match="encode failed"):
+        embeddings.embed_query("boom")
+    assert embeddings.embed_documents(["x", "yy"]) == [[1.0, 1.0], [2.0, 1.0]]
+    assert embeddings.encode([]).shape == (0, 2)
+    assert embeddings.stats()["documents"] == 2 and embeddings.stats()["backend"] == "int8"
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown EMBEDDING_BACKEND 'fp8'"):
+        main.load_embedding_backend("fp8")
@@ -0,0 +1,49 @@
+import json
+
+import numpy as np
+import pytest
+
+import main
+from tools import eval_retrieval
+
+def make_index():
+    texts = ["Ayodhya yatra departs 12 March", "Kashi yatra in April", "Refunds take 7 days", "Food is vegetarian"]
+    metadatas = [{"category": "yatras", "source": "yatras.md"}, {"category": "yatras", "source": "yatras.md"},
+                 {"category": "faqs", "source": "faq.md"}, {"category": "faqs", "source": "faq.md"}]
+    vectors = np.eye(4, dtype=np.float32)
+    return main.VectorIndex(vectors, ["yatras", "faqs"], np.array([0, 0, 1, 1], dtype=np.int16), texts, metadatas)
+
+def case(question, expected, collection):
+    return {"question": question, "expected": expected, "collection": collection, "expected_normalized": eval_retrieval.normalize(expected)}
+
+def test_load_golden_set_requires_an_answer_to_look_for(tmp_path):
+    path = tmp_path / "golden.jsonl"
+    path.write_text(json.dumps({"question": "When is Ayodhya?", "expected": "12  March", "collection": "yatras"}) + "\n\n", encoding="utf-8")
+    [loaded] = eval_retrieval.load_golden_set(str(path))
+    assert loaded["expected_normalized"] == "12 march"
+
+    path.write_text(json.dumps({"question": "When is Ayodhya?"}) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="golden.jsonl:1"):
+        eval_retrieval.load_golden_set(str(path))
+
+def test_evaluate_reports_recall_per_k_and_collection():
+    cases = [case("ayodhya dates", "12 March", "yatras"), case("refund time", "7 days", "faqs")]
+    # The Ayodhya question ranks its answer second among the yatras; the refund question ranks it first
+    question_vectors = np.array([[0.5, 0.9, 0.0, 0.0], [0.0, 0.0, 1.0, 0.2]], dtype=np.float32)
+    uniform, per_collection = eval_retrieval.evaluate(cases, question_vectors, make_index(), [1, 2], lambda text: len(text.split()))
+
+    assert [(row["k"], row["recall"]) for row in uniform] == [(1, 0.5), (2, 1.0)]
+    recall = {(row["collection"], row["k"]): row["recall"] for row in per_collection}
+    assert recall == {("yatras", 1): 0.0, ("yatras", 2): 1.0, ("faqs", 1): 1.0, ("faqs", 2): 1.0}
+    assert uniform[0]["context_tokens"] < uniform[1]["context_tokens"]
+
+def test_pick_winners_prefers_the_cheapest_setting_that_reaches_the_target():
+    rows = [
+        {"collection": "faqs", "k": 1, "recall": 0.95, "context_tokens": 100},
+        {"collection": "faqs", "k": 3, "recall": 1.0, "context_tokens": 300},
+        {"collection": "yatras", "k": 1, "recall": 0.5, "context_tokens": 80},
+        {"collection": "yatras", "k": 3, "recall": 0.8, "context_tokens": 240},
+    ]
+    winners = eval_retrieval.pick_winners(rows, min_recall=0.9)
+    assert winners["faqs"]["k"] == 1
+    assert winners["yatras"]["k"] == 3  # Nothing reaches the target: best recall wins
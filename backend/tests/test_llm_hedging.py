@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections import deque
+
+import httpx
+import pytest
+from langchain_core.documents import Document
+
+import main
+
+class FakeLLM:
+    """ainvoke sleeps for the next configured duration and returns a response carrying the call number"""
+
+    def __init__(self, durations):
+        self.durations = list(durations)
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        call = self.calls
+        self.calls += 1
+        await asyncio.sleep(self.durations[min(call, len(self.durations) - 1)])
+        return f"reply {call}"
+
+@pytest.fixture
+def hedging(monkeypatch):
+    stats = {"hedges_sent": 0, "hedge_wins": 0, "deadline_exceeded": 0, "degraded_replies": 0}
+    monkeypatch.setattr(main, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(main, "hedge_delay_seconds", lambda: 0.2)
+    monkeypatch.setattr(main, "latency_stats", stats)
+    monkeypatch.setattr(main, "llm_latencies", deque(maxlen=500))
+    return stats
+
+def run_hedged(monkeypatch, llm, hold_all_slots_for=0.0):
+    async def scenario():
+        admission = main.LLMAdmissionController(max_concurrency=2, max_queue=4, queue_timeout=5)
+        monkeypatch.setattr(main, "llm_admission", admission)
+        monkeypatch.setattr(main, "get_llm", lambda: llm)
+
+        async def hold_slot():
+            async with admission.slot():
+                await asyncio.sleep(hold_all_slots_for)
+
+        holders = [asyncio.create_task(hold_slot()) for _ in range(2)] if hold_all_slots_for else []
+        await asyncio.sleep(0)
+        result = await main.invoke_llm_hedged([], time.monotonic() + 5)
+        await asyncio.gather(*holders)
+        return result
+
+    return asyncio.run(scenario())
+
+def test_slow_call_is_hedged(monkeypatch, hedging):
+    llm = FakeLLM([1.0, 0.05])
+    response, _ = run_hedged(monkeypatch, llm)
+    assert response == "reply 1"
+    assert hedging["hedges_sent"] == 1 and hedging["hedge_wins"] == 1
+
+def test_queue_wait_does_not_count_towards_the_hedge_delay(monkeypatch, hedging):
+    # Queued for 0.3 s, then a 0.15 s call: well within the 0.2 s hedge delay once the slot is held
+    llm = FakeLLM([0.15])
+    response, elapsed = run_hedged(monkeypatch, llm, hold_all_slots_for=0.3)
+    assert response == "reply 0"
+    assert elapsed < 0.2
+    assert hedging["hedges_sent"] == 0
+    assert llm.calls == 1
+
+@pytest.fixture
+def rag_ready(monkeypatch, hedging):
+    docs = [Document(page_content="Ayodhya Yatra departs on 12 March from Delhi.", metadata={"score": 0.9, "source_category": "yatras"})]
+    monkeypatch.setattr(main, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(main, "vector_stores", {"yatras": object()})
+    monkeypatch.setattr(main, "build_rag_messages", lambda query, history, tenant=None, summary="": (["prompt"], docs))
+    monkeypatch.setattr(main, "llm_admission", main.LLMAdmissionController(max_concurrency=2, max_queue=4, queue_timeout=5))
+    return docs
+
+def test_deadline_returns_a_retrieval_only_reply(monkeypatch, hedging, rag_ready):
+    monkeypatch.setattr(main, "get_llm", lambda: FakeLLM([5.0]))
+    started = time.monotonic()
+    answer = asyncio.run(main.get_rag_response("ayodhya dates", [], deadline=time.monotonic() + 0.3))
+    assert time.monotonic() - started < 2
+    assert answer.degraded and answer.degraded_reason == "deadline"
+    assert "12 March" in answer.text and main.SUPPORT_CONTACT_DETAILS in answer.text
+    assert rag_ready == answer.docs
+    assert hedging["deadline_exceeded"] == 1 and hedging["degraded_replies"] == 1
+
+def test_llm_connection_error_degrades_instead_of_failing(monkeypatch, rag_ready):
+    class FailingLLM:
+        async def ainvoke(self, messages):
+            raise main.openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+
+    monkeypatch.setattr(main, "get_llm", lambda: FailingLLM())
+    answer = asyncio.run(main.get_rag_response("ayodhya dates", []))
+    assert answer.degraded and answer.degraded_reason == "llm_error"
+    assert "12 March" in answer.text
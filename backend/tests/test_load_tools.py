@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from langchain_openai import ChatOpenAI
+
+from tools import fake_openai, loadtest
+
+@pytest.fixture
+def instant_fake(monkeypatch):
+    monkeypatch.setitem(fake_openai.settings, "latency_ms", 0)
+    monkeypatch.setitem(fake_openai.settings, "jitter_ms", 0)
+    monkeypatch.setitem(fake_openai.settings, "tokens_per_second", 0)
+    monkeypatch.setitem(fake_openai.settings, "completion_tokens", 8)
+    return fake_openai.app
+
+def test_fake_openai_answers_the_langchain_client_with_usage(instant_fake):
+    async def ask():
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=instant_fake), base_url="http://fake")
+        llm = ChatOpenAI(model="gpt-4o-mini", api_key="sk-fake", base_url="http://fake/v1", http_async_client=client)
+        try:
+            return await llm.ainvoke("Which yatras are coming up?")
+        finally:
+            await client.aclose()
+
+    reply = asyncio.run(ask())
+    assert reply.content.startswith("Namaste")
+    assert reply.usage_metadata["output_tokens"] == 8
+
+def test_fake_openai_streams_and_injects_failures(instant_fake, monkeypatch):
+    client = TestClient(instant_fake)
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+    events = [line for line in client.post("/v1/chat/completions", json=body).text.splitlines() if line.startswith("data: ")]
+    assert len(events) == 8 + 2 and events[-1] == "data: [DONE]"
+
+    monkeypatch.setitem(fake_openai.settings, "rate_limit_rate", 1.0)
+    response = client.post("/v1/chat/completions", json=body)
+    assert response.status_code == 429 and response.headers["retry-after"] == "1"
+
+def test_recorder_summary_counts_errors_and_percentiles():
+    recorder = loadtest.Recorder()
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        recorder.record("POST /api/chat", seconds, 200)
+    recorder.record("POST /api/chat", 1.0, 429)
+    recorder.record("GET /api/knowledge/files", 0.01, 304)
+    summary = recorder.summary()
+    chat = summary["endpoints"]["POST /api/chat"]
+    assert chat["requests"] == 5 and chat["errors"] == {"429": 1} and chat["error_rate"] == 0.2
+    assert chat["p50_ms"] == 300.0 and chat["max_ms"] == 1000.0
+    assert summary["endpoints"]["GET /api/knowledge/files"]["error_rate"] == 0.0
+    assert summary["requests"] == 6
+
+def test_parse_mix():
+    assert loadtest.parse_mix("first_turn=3, conversation") == {"first_turn": 3.0, "conversation": 1.0}
+    with pytest.raises(argparse.ArgumentTypeError):
+        loadtest.parse_mix("chat=1")
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+import main
+
+@pytest.mark.parametrize("text", [
+    "Call me on +91 98765 43210",
+    "my number is 9876543210",
+    "whatsapp +91-98765-43210",
+    "reach me at 919876543210",
+])
+def test_normalize_query_masks_phone_numbers(text):
+    assert "<phone>" in main.normalize_query(text)
+
+@pytest.mark.parametrize("text, expected", [
+    ("Dates for 2025 - 2026?", "dates for 2025 - 2026"),
+    ("Budget 15000 - 20000", "budget 15000 - 20000"),
+    ("  Ayodhya   Yatra PRICE?!", "ayodhya yatra price"),
+    ("Mail me at someone@example.com.", "mail me at <email>"),
+])
+def test_normalize_query_keeps_years_and_prices(text, expected):
+    assert main.normalize_query(text) == expected
+
+def test_answer_questions_reports_dropped_questions(monkeypatch, capsys):
+    async def fake_rag_response(question, history):
+        if "unknown" in question:
+            return main.RAGAnswer(text="Please contact us")
+        return main.RAGAnswer(text=f"Answer to {question}", usage={"input_tokens": 1})
+
+    monkeypatch.setattr(main, "get_rag_response", fake_rag_response)
+    entries = [{"question": "ayodhya yatra price"}, {"question": "unknown tour"}]
+    answered = asyncio.run(main.answer_questions(entries))
+    assert [entry["question"] for entry in answered] == ["ayodhya yatra price"]
+    assert "Dropped 1 precomputed questions" in capsys.readouterr().out
+
+def test_knowledge_change_waits_for_a_quiet_check_before_re_answering(tmp_path, monkeypatch):
+    answers = main.PrecomputedAnswers(tmp_path / "precomputed.json")
+    main.save_precomputed_answers([{"question": "q", "vector": [1.0], "answer": "a"}], "old", answers.path)
+    answers.load()
+    fingerprint = {"value": "new"}
+    calls = []
+
+    async def fake_answer_questions(entries):
+        calls.append(fingerprint["value"])
+        return entries
+
+    monkeypatch.setattr(main, "knowledge_fingerprint", lambda: fingerprint["value"])
+    monkeypatch.setattr(main, "answer_questions", fake_answer_questions)
+
+    asyncio.run(answers.refresh())
+    assert not answers.active and calls == []
+    fingerprint["value"] = "newer"  # Another upload before the next check
+    asyncio.run(answers.refresh())
+    assert calls == []
+    asyncio.run(answers.refresh())  # Unchanged since the last check: re-answer once
+    assert calls == ["newer"]
+    assert answers.active and answers.knowledge_hash == "newer"
+
+    answers.mark_stale()
+    fingerprint["value"] = "newest"
+    asyncio.run(answers.refresh(force=True))
+    assert calls == ["newer", "newest"] and answers.active
+
+def test_start_waits_for_the_collections_and_logs_a_skipped_activation(tmp_path, monkeypatch, capsys):
+    answers = main.PrecomputedAnswers(tmp_path / "precomputed.json")
+    main.save_precomputed_answers([{"question": "q", "vector": [1.0], "answer": "a"}], "old", answers.path)
+    ready = main.threading.Event()
+    refreshes = []
+
+    async def fake_refresh(force=False):
+        refreshes.append(force)
+
+    monkeypatch.setattr(main, "vector_stores_ready", ready)
+    monkeypatch.setattr(main, "PRECOMPUTED_STORES_WAIT_SECONDS", 0.1)
+    monkeypatch.setattr(main, "PRECOMPUTED_CHECK_SECONDS", 0.05)
+    monkeypatch.setattr(answers, "refresh", fake_refresh)
+
+    async def scenario():
+        task = asyncio.create_task(answers.start())
+        await asyncio.sleep(0.3)
+        assert refreshes == []
+        ready.set()  # What open_collection_store does
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert refreshes
+    assert "Precomputed answers not activated" in capsys.readouterr().out
+
+def test_start_without_a_file_says_so(tmp_path, monkeypatch, capsys):
+    answers = main.PrecomputedAnswers(tmp_path / "missing.json")
+    monkeypatch.setattr(main, "vector_stores_ready", main.threading.Event())
+    monkeypatch.setattr(main, "PRECOMPUTED_STORES_WAIT_SECONDS", 0.05)
+
+    async def scenario():
+        task = asyncio.create_task(answers.start())
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(scenario())
+    out = capsys.readouterr().out
+    assert "No precomputed answers" in out and "not activated" not in out
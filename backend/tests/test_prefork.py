@@ -0,0 +1,11 @@
+import main
+
+def test_local_chroma_runs_a_single_worker(monkeypatch, capsys):
+    monkeypatch.setattr(main, "CHROMA_USE_CLOUD", False)
+    assert main.effective_worker_count(4) == 1
+    assert "needs Chroma Cloud" in capsys.readouterr().out
+    assert main.effective_worker_count(1) == 1
+
+def test_chroma_cloud_keeps_the_requested_workers(monkeypatch):
+    monkeypatch.setattr(main, "CHROMA_USE_CLOUD", True)
+    assert main.effective_worker_count(4) == 4
@@ -0,0 +1,54 @@
+import json
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+
+def busy_embedding_loop(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+def test_timed_stage_accumulates_nested_stages():
+    stages = {}
+    token = main.request_stages.set(stages)
+    try:
+        with main.timed_stage("rag"):
+            for _ in range(2):
+                with main.timed_stage("rag.retrieval"):
+                    time.sleep(0.01)
+    finally:
+        main.request_stages.reset(token)
+    assert stages["rag.retrieval"] >= 0.02 and stages["rag"] >= stages["rag.retrieval"]
+    with main.timed_stage("outside"):  # No request: nothing recorded, nothing raised
+        pass
+
+def test_slow_request_logs_one_json_line(monkeypatch, capsys):
+    monkeypatch.setattr(main, "SLOW_REQUEST_THRESHOLD_MS", 0.001)
+    assert TestClient(main.app).get("/").status_code == 200
+    [line] = [line for line in capsys.readouterr().out.splitlines() if '"slow_request"' in line]
+    entry = json.loads(line)
+    assert entry["path"] == "/" and entry["status"] == 200
+    assert entry["total_ms"] >= 0 and entry["stages_ms"] == {}
+
+def test_sample_stacks_sees_busy_worker_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_embedding_loop, args=(stop,), name="embed-worker")
+    worker.start()
+    try:
+        result = main.sample_stacks(0.2, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+    assert result["samples"] > 5
+    assert any("busy_embedding_loop" in row["function"] for row in result["top_inclusive"])
+    assert any(line.startswith("embed-worker;") for line in result["folded"].splitlines())
+
+def test_profile_endpoint_returns_folded_stacks(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_API_KEY", "secret")
+    client = TestClient(main.app)
+    headers = {"X-Admin-Key": "secret"}
+    response = client.get("/api/admin/profile?seconds=0.1&format=folded&include_idle=true", headers=headers)
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/plain")
+    assert client.get("/api/admin/profile?seconds=0.1&mode=trace", headers=headers).status_code == 400
@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+
+import main
+
+def make_index(seed=0, categories=("yatras", "faqs"), rows_per_category=3):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((rows_per_category * len(categories), 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    codes = np.repeat(np.arange(len(categories), dtype=np.int16), rows_per_category)
+    texts = [f"{category} chunk {i}" for category in categories for i in range(rows_per_category)]
+    metadatas = [{"source": f"{text}.txt"} for text in texts]
+    return main.VectorIndex(vectors, list(categories), codes, texts, metadatas)
+
+def test_round_trip_keeps_rows_and_vectors(tmp_path):
+    index = make_index()
+    main.save_snapshot(index, tmp_path / "snap", knowledge_hash="abc")
+    loaded, header = main.load_snapshot(tmp_path / "snap", mmap=True)
+    assert header["knowledge_hash"] == "abc"
+    assert loaded.texts == index.texts and loaded.metadatas == index.metadatas
+    np.testing.assert_array_equal(np.asarray(loaded.vectors), index.vectors)
+    assert loaded.offsets == index.offsets
+
+def test_rewrite_switches_rows_and_vectors_together(tmp_path):
+    base = tmp_path / "snap"
+    for seed in range(4):
+        main.save_snapshot(make_index(seed), base, knowledge_hash=str(seed))
+        loaded, header = main.load_snapshot(base)
+        assert header["knowledge_hash"] == str(seed)
+        np.testing.assert_array_equal(np.asarray(loaded.vectors), make_index(seed).vectors)
+    # The current vectors file plus the one before it (for readers caught mid-switch)
+    assert len(list(tmp_path.glob("snap.*.npy"))) == 2
+    main.save_snapshot(make_index(9), base, knowledge_hash="9", keep_previous=False)
+    assert len(list(tmp_path.glob("snap.*.npy"))) == 1
+
+def test_tenant_categories_can_be_saved(tmp_path):
+    index = make_index(categories=("treks", "yatras"))
+    main.save_snapshot(index, tmp_path / "tenant", knowledge_hash="")
+    _, header = main.load_snapshot(tmp_path / "tenant")
+    assert header["categories"] == ["treks", "yatras"]
+    assert header["collections"] == {"yatras": main.COLLECTIONS["yatras"]["name"]}
+
+def test_reads_version_1_snapshots(tmp_path):
+    index = make_index()
+    base = tmp_path / "old"
+    np.save(base.with_suffix(".npy"), index.vectors)
+    header = {"format": "mitraa-knowledge-snapshot", "version": 1, "knowledge_hash": "", "categories": index.categories}
+    lines = [json.dumps(header)] + [json.dumps({"category": index.categories[code], "text": text, "metadata": metadata})
+                                    for code, text, metadata in zip(index.category_codes, index.texts, index.metadatas)]
+    base.with_suffix(".jsonl").write_text("\n".join(lines) + "\n")
+    loaded, _ = main.load_snapshot(base)
+    assert loaded.texts == index.texts
+
+def test_remove_snapshot(tmp_path):
+    main.save_snapshot(make_index(), tmp_path / "snap", knowledge_hash="")
+    main.remove_snapshot(tmp_path / "snap")
+    assert not main.snapshot_exists(tmp_path / "snap") and not list(tmp_path.iterdir())
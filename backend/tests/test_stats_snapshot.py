@@ -0,0 +1,79 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+@pytest.fixture
+def files_snapshot(monkeypatch):
+    state = {"builds": 0, "files": ["faq.md"]}
+
+    def build():
+        state["builds"] += 1
+        return {"files": list(state["files"])}
+
+    monkeypatch.setattr(main, "files_stats", main.StatsSnapshot(build))
+    return state
+
+def test_snapshot_rebuilds_only_after_invalidate(files_snapshot):
+    snapshot = main.files_stats
+    assert snapshot.cached() is None
+    body, etag = snapshot.get()
+    assert snapshot.get() == (body, etag) and snapshot.cached() == (body, etag)
+    assert files_snapshot["builds"] == 1
+
+    files_snapshot["files"].append("yatras.md")
+    snapshot.invalidate()
+    assert snapshot.cached() is None
+    new_body, new_etag = snapshot.get()
+    assert new_body == {"files": ["faq.md", "yatras.md"]} and new_etag != etag
+    assert files_snapshot["builds"] == 2
+
+def test_endpoint_answers_304_while_the_etag_matches(files_snapshot):
+    client = TestClient(main.app)
+    response = client.get("/api/knowledge/files")
+    assert response.status_code == 200
+    assert response.json() == {"files": ["faq.md"]}
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == main.ADMIN_CACHE_CONTROL
+
+    assert client.get("/api/knowledge/files", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/knowledge/files", headers={"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+    assert client.get("/api/knowledge/files", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert files_snapshot["builds"] == 1
+
+    files_snapshot["files"].append("yatras.md")
+    main.files_stats.invalidate()
+    response = client.get("/api/knowledge/files", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+class FakeCollection:
+    def __init__(self, count):
+        self.counts = [count]
+
+    def count(self):
+        return self.counts[0]
+
+class FakeStore:
+    def __init__(self, count):
+        self._collection = FakeCollection(count)
+
+def test_collections_endpoint_is_rebuilt_only_after_invalidate_knowledge_stats(monkeypatch):
+    store = FakeStore(12)
+    monkeypatch.setattr(main, "vector_stores", {"faqs": store})
+    monkeypatch.setattr(main, "collections_stats", main.StatsSnapshot(main.build_collections_stats))
+    monkeypatch.setattr(main, "files_stats", main.StatsSnapshot(lambda: {"files": []}))
+    client = TestClient(main.app)
+
+    response = client.get("/api/knowledge/collections")
+    faqs = next(info for info in response.json()["collections"] if info["category"] == "faqs")
+    assert faqs["loaded"] and faqs["document_count"] == 12
+    assert response.json()["active_collections"] == 1
+    etag = response.headers["etag"]
+
+    store._collection.counts[0] = 20  # Changed behind the snapshot's back: still served from the cache
+    assert client.get("/api/knowledge/collections", headers={"If-None-Match": etag}).status_code == 304
+
+    main.invalidate_knowledge_stats()
+    response = client.get("/api/knowledge/collections", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert next(info for info in response.json()["collections"] if info["category"] == "faqs")["document_count"] == 20
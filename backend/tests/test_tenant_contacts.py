@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+import main
+
+OORZAA_CONTACTS = ("8010513511", "9205661114", "wa.me", "oorzaayatra.com")
+
+@pytest.fixture
+def acme(tmp_path, monkeypatch):
+    config = main.TenantConfig(
+        tenant_id="acme",
+        display_name="Acme Treks",
+        system_prompt="You are Acme's assistant.",
+        collections={"treks": {"name": "acme_treks"}},
+        knowledge_dir=tmp_path,
+        contact_details="📞 **Call Us:** +1-555-0100",
+        contact_links={"turn_limit": [{"text": "Call Acme", "url": "tel:+15550100", "type": "live_agent"}]}
+    )
+    monkeypatch.setitem(main.tenant_registry.configs, "acme", config)
+    return config
+
+def assert_no_oorzaa_contacts(value):
+    assert not any(contact in str(value) for contact in OORZAA_CONTACTS)
+
+def test_tenant_replies_use_the_tenant_contacts(acme):
+    for text in (main.no_context_reply("acme"), main.build_degraded_reply([], "acme"),
+                 main.build_degraded_reply([Document(page_content="Trek dates", metadata={"score": 0.9})], "acme")):
+        assert "+1-555-0100" in text
+        assert_no_oorzaa_contacts(text)
+    assert main.support_links("turn_limit", "acme") == acme.contact_links["turn_limit"]
+    assert main.support_links("escalation", "acme") == []
+    assert main.detect_links_needed("how do I book? please call me", "acme") == []
+
+def test_tenant_without_contacts_gets_a_generic_line(acme, monkeypatch):
+    monkeypatch.setattr(acme, "contact_details", "")
+    assert "Acme Treks team" in main.no_context_reply("acme")
+    assert_no_oorzaa_contacts(main.no_context_reply("acme"))
+
+def test_built_in_replies_keep_the_oorzaa_contacts():
+    assert main.no_context_reply() == main.NO_CONTEXT_REPLY
+    assert main.SUPPORT_CONTACT_DETAILS in main.build_degraded_reply([])
+    assert [link["text"] for link in main.support_links("escalation")] == [
+        "Neha: 8010513511", "Connect with a Human Agent", "Request a Callback"]
+
+def test_turn_limit_reply_for_a_tenant(acme, monkeypatch):
+    monkeypatch.setattr(main, "OPENAI_API_KEY", "test-key")
+    history = [{"role": "user", "content": f"question {turn}"} for turn in range(main.MAX_CONVERSATION_TURNS)]
+    response = TestClient(main.app).post("/api/chat", json={
+        "message": "one more", "conversation_history": history, "session_id": "s-1", "tenant": "acme"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["should_escalate"]
+    assert "+1-555-0100" in data["response"]
+    assert data["links"] == acme.contact_links["turn_limit"]
+    assert_no_oorzaa_contacts(data)
+
+def test_tenant_with_a_missing_prompt_file_is_skipped(tmp_path, monkeypatch, capsys):
+    (tmp_path / "beta_prompt.txt").write_text("You are Beta's assistant.", encoding="utf-8")
+    (tmp_path / "tenants.json").write_text(json.dumps({
+        "acme": {"system_prompt_file": "tenants/acme/missing.txt", "collections": {"treks": {}}},
+        "beta": {"system_prompt_file": "beta_prompt.txt", "collections": {"treks": {}}}
+    }), encoding="utf-8")
+    monkeypatch.setattr(main, "TENANTS_CONFIG_FILE", tmp_path / "tenants.json")
+    configs = main.load_tenant_configs()
+    assert list(configs) == ["beta"]
+    assert configs["beta"].system_prompt == "You are Beta's assistant."
+    assert "Skipping tenant 'acme'" in capsys.readouterr().out
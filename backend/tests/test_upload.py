@@ -0,0 +1,29 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+
+def test_upload_ingests_off_the_event_loop(monkeypatch):
+    calls = []
+
+    def fake_ingest(collection, content, filename, embeddings):
+        try:
+            asyncio.get_running_loop()
+            calls.append("event loop")
+        except RuntimeError:
+            calls.append("worker thread")
+        return 3
+
+    monkeypatch.setattr(main, "vector_stores", {"faqs": object()})
+    monkeypatch.setattr(main, "get_embedding_model", lambda: "embeddings")
+    monkeypatch.setattr(main, "ingest_content_to_collection", fake_ingest)
+
+    response = TestClient(main.app).post(
+        "/api/knowledge/upload",
+        data={"collection": "faqs"},
+        files={"file": ("faq.md", b"Q: When?\nA: Now.", "text/markdown")}
+    )
+    assert response.status_code == 200
+    assert response.json()["chunks"] == 3
+    assert calls == ["worker thread"]
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+def wait_for_rows(ledger, expected_answers):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        totals = ledger.aggregate("all", 1, 1)
+        if totals and totals[0]["answers"] == expected_answers:
+            return totals[0]
+        time.sleep(0.02)
+    pytest.fail("usage ledger writer did not flush in time")
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    ledger = main.UsageLedger(tmp_path / "usage.sqlite3")
+    ledger.start()
+    usage = {"input_tokens": 1000, "output_tokens": 200, "input_token_details": {"cache_read": 400}}
+    ledger.record("s1", "rag", usage=usage, latency_ms=800.04, collections=["yatras", "faqs", "yatras"], model="gpt-4o-mini")
+    ledger.record("s1", "rag", usage=usage, latency_ms=1200, collections=["faqs"])
+    ledger.record("s2", "turn_limit")
+    monkeypatch.setattr(main, "usage_ledger", ledger)
+    return ledger
+
+def test_aggregate_totals_tokens_latency_and_cost(ledger):
+    totals = wait_for_rows(ledger, 3)
+    assert totals["llm_calls"] == 2 and totals["conversations"] == 2
+    assert (totals["prompt_tokens"], totals["completion_tokens"], totals["cached_tokens"]) == (2000, 400, 800)
+    assert totals["avg_latency_ms"] == 1000.0
+    assert totals["est_cost_usd"] == pytest.approx(main.estimate_cost_usd(2000, 400, 800), abs=1e-6)
+    assert totals["cost_per_conversation_usd"] == pytest.approx(totals["est_cost_usd"] / 2, abs=1e-6)
+
+    by_path = {row["key"]: row for row in ledger.aggregate("path", 1, 10)}
+    assert by_path["rag"]["answers"] == 2 and by_path["turn_limit"]["llm_calls"] == 0
+    assert [row["key"] for row in ledger.aggregate("session", 1, 10)] == ["s1", "s2"]
+
+def test_usage_endpoint(ledger, monkeypatch):
+    wait_for_rows(ledger, 3)
+    monkeypatch.setattr(main, "ADMIN_API_KEY", "secret")
+    client = TestClient(main.app)
+    response = client.get("/api/admin/usage?group_by=path&days=1", headers={"X-Admin-Key": "secret"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["totals"]["answers"] == 3 and {row["key"] for row in data["rows"]} == {"rag", "turn_limit"}
+    assert client.get("/api/admin/usage?group_by=model", headers={"X-Admin-Key": "secret"}).status_code == 400
+
+def test_query_log_keeps_normalised_first_turn_questions(ledger):
+    ledger.record_query("s1", "  Ayodhya Yatra dates?", first_turn=True)
+    ledger.record_query("s2", "ayodhya yatra dates", first_turn=True)
+    ledger.record_query("s1", "and the price?", first_turn=False)
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and ledger.top_queries(days=1) != [("ayodhya yatra dates", 2)]:
+        time.sleep(0.02)
+    assert ledger.top_queries(days=1) == [("ayodhya yatra dates", 2)]
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+import main
+
+def make_index(dtype="float32"):
+    vectors = np.array([
+        [1.0, 0.0, 0.0],   # yatras
+        [0.6, 0.8, 0.0],   # yatras
+        [0.0, 1.0, 0.0],   # yatras
+        [0.0, 0.0, 1.0],   # faqs
+        [0.8, 0.0, 0.6],   # faqs
+    ], dtype=dtype)
+    return main.VectorIndex(
+        vectors,
+        ["yatras", "faqs", "policies"],
+        np.array([0, 0, 0, 1, 1], dtype=np.int16),
+        ["ayodhya", "kashi", "vrindavan", "refunds", "dates"],
+        [{"source_category": "yatras"}] * 3 + [{"source_category": "faqs"}] * 2
+    )
+
+def test_search_returns_top_k_per_collection_by_score():
+    docs = make_index().search([1.0, 0.0, 0.0], k=2)
+    assert [doc.page_content for doc in docs] == ["ayodhya", "kashi", "dates", "refunds"]
+    assert [doc.metadata["score"] for doc in docs] == pytest.approx([1.0, 0.6, 0.8, 0.0])
+    assert all(doc.metadata["source_category"] in ("yatras", "faqs") for doc in docs)
+
+def test_search_takes_k_per_category_and_caps_it_at_the_collection_size():
+    docs = make_index().search([0.0, 1.0, 0.0], k={"yatras": 1, "faqs": 5})
+    assert [doc.page_content for doc in docs] == ["vrindavan", "refunds", "dates"]
+
+def test_search_skips_empty_collections_and_empty_index():
+    assert {doc.metadata["source_category"] for doc in make_index().search([0.0, 0.0, 1.0], k=1)} == {"yatras", "faqs"}
+    empty = main.VectorIndex(np.zeros((0, 0), dtype=np.float32), ["yatras"], np.zeros(0, dtype=np.int16), [], [])
+    assert empty.search([1.0, 0.0, 0.0]) == []
+
+def test_search_does_not_share_metadata_between_results():
+    index = make_index()
+    index.search([1.0, 0.0, 0.0], k=1)[0].metadata["score"] = 99
+    assert "score" not in index.metadatas[0]
+
+def test_float16_index_ranks_like_float32():
+    query = [0.5, 0.5, 0.7]
+    assert [doc.page_content for doc in make_index("float16").search(query, k=3)] == \
+        [doc.page_content for doc in make_index().search(query, k=3)]
+
+class CountingCollection:
+    def __init__(self, vectors, texts, category):
+        self.vectors, self.texts, self.category = vectors, texts, category
+        self.reads = 0
+
+    def count(self):
+        return len(self.texts)
+
+    def get(self, include=()):
+        self.reads += 1
+        return {"embeddings": self.vectors, "documents": self.texts, "metadatas": [{"source_category": self.category}] * len(self.texts)}
+
+class CountingStore:
+    def __init__(self, vectors, texts, category):
+        self._collection = CountingCollection(vectors, texts, category)
+
+def test_from_stores_re_reads_only_the_changed_collections():
+    stores = {
+        "yatras": CountingStore([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], ["ayodhya", "kashi"], "yatras"),
+        "faqs": CountingStore([[0.0, 0.0, 1.0]], ["refunds"], "faqs"),
+    }
+    previous = main.VectorIndex.from_stores(stores)
+    stores["faqs"]._collection.texts.append("dates")
+    stores["faqs"]._collection.vectors.append([0.8, 0.0, 0.6])
+
+    index = main.VectorIndex.from_stores(stores, previous=previous, changed={"faqs"})
+    assert stores["yatras"]._collection.reads == 1 and stores["faqs"]._collection.reads == 2
+    assert index.texts == ["ayodhya", "kashi", "refunds", "dates"]
+    assert [doc.page_content for doc in index.search([1.0, 0.0, 0.0], k=1)] == ["ayodhya", "dates"]
+
+    # A collection that changed behind the index's back (row count differs) is re-read too
+    stores["yatras"]._collection.texts.append("vrindavan")
+    stores["yatras"]._collection.vectors.append([0.6, 0.8, 0.0])
+    index = main.VectorIndex.from_stores(stores, previous=index, changed=set())
+    assert stores["yatras"]._collection.reads == 2 and stores["faqs"]._collection.reads == 2
+    assert len(index) == 5
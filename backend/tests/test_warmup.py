@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+@pytest.fixture
+def retrievals(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, "last_warmup", {})
+    monkeypatch.setattr(main, "get_llm", lambda: None)
+    monkeypatch.setattr(main, "vector_index", object())
+    monkeypatch.setattr(main, "retrieve_documents", lambda query: calls.append(query) or [])
+    return calls
+
+def test_warmup_runs_once_per_interval(retrievals):
+    client = TestClient(main.app)
+    first = client.get("/api/warmup")
+    assert first.status_code == 200 and first.json()["warmed"] is True
+    assert first.headers["cache-control"] == "no-store"
+    assert client.get("/api/warmup").json()["warmed"] is False
+    assert retrievals == ["namaste"]
+
+def test_failed_warmup_is_retried(monkeypatch, retrievals):
+    def fail(query):
+        raise RuntimeError("Chroma not reachable")
+
+    monkeypatch.setattr(main, "retrieve_documents", fail)
+    with pytest.raises(RuntimeError):
+        main.warm_up()
+    assert None not in main.last_warmup
+    monkeypatch.setattr(main, "retrieve_documents", lambda query: retrievals.append(query) or [])
+    assert main.warm_up() is True and retrievals == ["namaste"]
+
+def test_warmup_rejects_unknown_tenants(retrievals):
+    assert TestClient(main.app).get("/api/warmup?tenant=nobody").status_code == 404
@@ -0,0 +1,4 @@
+"""
+Developer tools for the Mitraa backend (load testing, evaluation).
+Run from the backend/ directory, e.g. `python -m tools.loadtest --help`.
+"""
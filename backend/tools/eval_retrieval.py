@@ -0,0 +1,196 @@
+"""
+Offline retrieval evaluation: sweep chunk size, chunk overlap and k per collection against a golden set.
+
+Golden set: JSONL, one case per line:
+    {"question": "When is the Vrindavan yatra?", "expected": "17th April – 19th April", "collection": "yatras"}
+    {"question": "Can I get a refund?", "source": "cancellation_policy.txt"}
+A case is a hit when a retrieved chunk contains "expected" (case/whitespace-insensitive) or, without
+"expected", when a retrieved chunk comes from "source". "collection" defaults to the category of "source".
+
+Usage (from backend/, with the knowledge/ folder present):
+    python -m tools.eval_retrieval golden.jsonl --chunk-sizes 400,600,800,1000 --overlaps 0,100,200 --k 1,2,3,4
+    python -m tools.eval_retrieval golden.jsonl --min-recall 0.95 --write-config retrieval_config.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import main  # noqa: E402
+
+def load_golden_set(path: str) -> list:
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            case = json.loads(line)
+            if "question" not in case or not (case.get("expected") or case.get("source")):
+                raise ValueError(f"{path}:{line_number}: each case needs 'question' and 'expected' or 'source'")
+            if not case.get("collection") and case.get("source"):
+                case["collection"] = main.categorize_file(case["source"])
+            case["expected_normalized"] = normalize(case["expected"]) if case.get("expected") else None
+            cases.append(case)
+    return cases
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def make_token_counter():
+    """Count tokens the way gpt-4o-mini does when tiktoken is installed, else estimate 4 characters per token"""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text))
+    except Exception:
+        return lambda text: max(1, len(text) // 4)
+
+def is_hit(case: dict, doc) -> bool:
+    if case["expected_normalized"]:
+        return case["expected_normalized"] in normalize(doc.page_content)
+    return doc.metadata.get("source") == case["source"]
+
+def build_index(knowledge_files: dict, chunk_size: int, chunk_overlap: int, embeddings) -> main.VectorIndex:
+    """Chunk and embed the knowledge folder with one setting, grouped by collection like the live index"""
+    categories = list(main.COLLECTIONS.keys())
+    texts, metadatas, codes = [], [], []
+    for code, category in enumerate(categories):
+        settings = {**main.get_retrieval_settings(category), "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+        for file_path in knowledge_files.get(category, []):
+            content = file_path.read_text(encoding="utf-8")
+            for text, metadata in main.iter_file_chunks(category, file_path.name, content, settings=settings):
+                texts.append(text)
+                metadatas.append(metadata)
+                codes.append(code)
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32) if texts else np.zeros((0, 0), dtype=np.float32)
+    return main.VectorIndex(vectors, categories, np.asarray(codes, dtype=np.int16), texts, metadatas)
+
+def evaluate(cases, question_vectors, index, k_values, count_tokens) -> tuple:
+    """
+    Returns (uniform_rows, per_collection_rows) for one chunking setting.
+    One search per question at the largest k gives every smaller k as a prefix of each collection's ranking.
+    """
+    max_k = max(k_values)
+    per_question = []
+    search_times = []
+    for case, vector in zip(cases, question_vectors):
+        started = time.perf_counter()
+        docs = index.search(vector, k=max_k)
+        search_times.append(time.perf_counter() - started)
+        by_category = {}
+        for doc in docs:
+            by_category.setdefault(doc.metadata.get("category"), []).append(doc)
+        per_question.append(by_category)
+
+    latency_ms = round(float(np.mean(search_times)) * 1000, 3) if search_times else 0.0
+    latency_p95_ms = round(main.percentile(search_times, 95) * 1000, 3)
+    chunk_tokens = [count_tokens(text) for text in index.texts]
+    uniform_rows, collection_rows = [], []
+
+    for k in k_values:
+        # Same k for every collection, as the prompt sees it (capped at RETRIEVAL_MAX_DOCS)
+        hits, tokens = 0, []
+        for case, by_category in zip(cases, per_question):
+            docs = [doc for category in index.categories for doc in by_category.get(category, [])[:k]][:main.RETRIEVAL_MAX_DOCS]
+            hits += any(is_hit(case, doc) for doc in docs)
+            tokens.append(sum(count_tokens(doc.page_content) for doc in docs))
+        uniform_rows.append({
+            "k": k,
+            "recall": round(hits / len(cases), 4) if cases else 0.0,
+            "context_tokens": round(float(np.mean(tokens)), 1) if tokens else 0.0,
+            "latency_ms": latency_ms,
+            "latency_p95_ms": latency_p95_ms
+        })
+
+        # Each collection scored only on the questions whose answer lives there
+        for category in index.categories:
+            category_cases = [(case, by_category) for case, by_category in zip(cases, per_question) if case.get("collection") == category]
+            if not category_cases:
+                continue
+            category_hits, category_tokens = 0, []
+            for case, by_category in category_cases:
+                docs = by_category.get(category, [])[:k]
+                category_hits += any(is_hit(case, doc) for doc in docs)
+                category_tokens.append(sum(count_tokens(doc.page_content) for doc in docs))
+            collection_rows.append({
+                "collection": category,
+                "k": k,
+                "questions": len(category_cases),
+                "recall": round(category_hits / len(category_cases), 4),
+                "context_tokens": round(float(np.mean(category_tokens)), 1),
+                "chunks": int(np.sum(index.category_codes == index.categories.index(category))),
+                "avg_chunk_tokens": round(float(np.mean([t for t, c in zip(chunk_tokens, index.category_codes) if index.categories[c] == category] or [0])), 1)
+            })
+    return uniform_rows, collection_rows
+
+def pick_winners(collection_rows: list, min_recall: float) -> dict:
+    """Per collection: the cheapest setting (fewest context tokens) that reaches min_recall, else the best recall"""
+    winners = {}
+    for category in {row["collection"] for row in collection_rows}:
+        rows = [row for row in collection_rows if row["collection"] == category]
+        passing = [row for row in rows if row["recall"] >= min_recall]
+        best = min(passing, key=lambda row: (row["context_tokens"], -row["recall"])) if passing \
+            else max(rows, key=lambda row: (row["recall"], -row["context_tokens"]))
+        winners[category] = best
+    return winners
+
+def parse_ints(text: str) -> list:
+    return [int(value) for value in text.split(",") if value.strip()]
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Sweep chunking/retrieval settings against a golden set")
+    parser.add_argument("golden", help="Golden set JSONL (question + expected text or source file)")
+    parser.add_argument("--chunk-sizes", type=parse_ints, default=[400, 600, 800, 1000])
+    parser.add_argument("--overlaps", type=parse_ints, default=[0, 100, 200])
+    parser.add_argument("--k", dest="k_values", type=parse_ints, default=[1, 2, 3, 4, 5])
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Recall a collection's winning setting must reach")
+    parser.add_argument("--json", dest="json_out", help="Write every row to this JSON file")
+    parser.add_argument("--write-config", help="Save the per-collection winners as a retrieval config (e.g. retrieval_config.json)")
+    args = parser.parse_args()
+
+    cases = load_golden_set(args.golden)
+    knowledge_files = main.group_knowledge_files_by_collection()
+    embeddings = main.get_embedding_model()
+    count_tokens = make_token_counter()
+    question_vectors = np.asarray(embeddings.embed_documents([case["question"] for case in cases]), dtype=np.float32)
+    print(f"\n🧪 {len(cases)} golden questions · chunk sizes {args.chunk_sizes} · overlaps {args.overlaps} · k {args.k_values}\n")
+
+    all_uniform, all_collection = [], []
+    for chunk_size, chunk_overlap in product(args.chunk_sizes, args.overlaps):
+        if chunk_overlap >= chunk_size:
+            continue
+        index = build_index(knowledge_files, chunk_size, chunk_overlap, embeddings)
+        uniform_rows, collection_rows = evaluate(cases, question_vectors, index, args.k_values, count_tokens)
+        for row in uniform_rows + collection_rows:
+            row.update(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        all_uniform += uniform_rows
+        all_collection += collection_rows
+
+    print(f"{'size':>6}{'overlap':>9}{'k':>4}{'recall@k':>10}{'ctx tokens':>12}{'search ms':>11}{'p95 ms':>9}")
+    for row in all_uniform:
+        print(f"{row['chunk_size']:>6}{row['chunk_overlap']:>9}{row['k']:>4}{row['recall']:>10.3f}"
+              f"{row['context_tokens']:>12}{row['latency_ms']:>11}{row['latency_p95_ms']:>9}")
+
+    winners = pick_winners(all_collection, args.min_recall)
+    print(f"\n🏆 Per-collection winners (cheapest with recall ≥ {args.min_recall}):")
+    for category, row in sorted(winners.items()):
+        print(f"   {category:<10} chunk_size={row['chunk_size']} chunk_overlap={row['chunk_overlap']} k={row['k']} "
+              f"→ recall {row['recall']:.3f} over {row['questions']} questions, {row['context_tokens']} context tokens")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"uniform": all_uniform, "per_collection": all_collection, "winners": winners}, f, indent=2)
+    if args.write_config:
+        config = {category: {"chunk_size": row["chunk_size"], "chunk_overlap": row["chunk_overlap"], "k": row["k"]}
+                  for category, row in sorted(winners.items())}
+        Path(args.write_config).write_text(json.dumps(config, indent=2) + "\n", encoding="utf-8")
+        print(f"\n💾 Wrote {args.write_config} (the next startup re-ingests with these settings)")
+
+if __name__ == "__main__":
+    main_cli()
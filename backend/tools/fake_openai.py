@@ -0,0 +1,136 @@
+"""
+Fake OpenAI-compatible chat completions server for load tests.
+Answers /v1/chat/completions (streaming and non-streaming) after a configurable delay,
+so /api/chat can be driven hard without spending OpenAI credits or hitting real rate limits.
+
+Usage (from backend/):
+    python -m tools.fake_openai --port 9000 --latency-ms 800 --jitter-ms 400 --tokens-per-second 60
+    OPENAI_BASE_URL=http://localhost:9000/v1 OPENAI_API_KEY=sk-fake uvicorn main:app --port 8000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+settings = {
+    "latency_ms": 800,         # Time to first token
+    "jitter_ms": 400,          # Uniform random extra latency on top
+    "tokens_per_second": 60,   # Streaming speed after the first token (0 = all at once)
+    "completion_tokens": 120,  # Tokens in every answer
+    "error_rate": 0.0,         # Fraction of requests answered with HTTP 500
+    "rate_limit_rate": 0.0     # Fraction of requests answered with HTTP 429
+}
+
+app = FastAPI(title="Fake OpenAI")
+
+ANSWER_WORDS = (
+    "Namaste 🙏 Here are the upcoming yatras with their estimated price from Delhi, tentative dates "
+    "and transport. Each yatra operates only if minimum participants register, and prices may change "
+    "depending on booking timing. You can register at https://oorzaayatra.com/login ✨"
+).split()
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def _answer_tokens(count: int):
+    return [ANSWER_WORDS[i % len(ANSWER_WORDS)] + " " for i in range(count)]
+
+async def _first_token_delay():
+    await asyncio.sleep((settings["latency_ms"] + random.uniform(0, settings["jitter_ms"])) / 1000)
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model", "owned_by": "fake"}]}
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    roll = random.random()
+    if roll < settings["rate_limit_rate"]:
+        return JSONResponse({"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, status_code=429, headers={"retry-after": "1"})
+    if roll < settings["rate_limit_rate"] + settings["error_rate"]:
+        raise HTTPException(500, "Injected failure")
+
+    prompt_tokens = sum(_estimate_tokens(str(message.get("content", ""))) for message in body.get("messages", []))
+    tokens = _answer_tokens(min(settings["completion_tokens"], body.get("max_tokens") or settings["completion_tokens"]))
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(tokens),
+        "total_tokens": prompt_tokens + len(tokens),
+        "prompt_tokens_details": {"cached_tokens": 0}
+    }
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    model = body.get("model", "gpt-4o-mini")
+    created = int(time.time())
+
+    await _first_token_delay()
+
+    if not body.get("stream"):
+        if settings["tokens_per_second"]:
+            await asyncio.sleep(len(tokens) / settings["tokens_per_second"])
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+            "usage": usage
+        }
+
+    async def stream():
+        for token in tokens:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            if settings["tokens_per_second"]:
+                await asyncio.sleep(1 / settings["tokens_per_second"])
+        final = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "usage": usage
+        }
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=settings["latency_ms"], help="Time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=settings["jitter_ms"], help="Random extra latency (uniform)")
+    parser.add_argument("--tokens-per-second", type=float, default=settings["tokens_per_second"], help="Token generation speed (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=settings["completion_tokens"], help="Tokens per answer")
+    parser.add_argument("--error-rate", type=float, default=settings["error_rate"], help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=settings["rate_limit_rate"], help="Fraction of requests failing with 429")
+    args = parser.parse_args()
+
+    settings.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate
+    )
+    print(f"🤖 Fake OpenAI on http://{args.host}:{args.port}/v1 ({json.dumps(settings)})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+HTTP load test for the Mitraa backend.
+Drives /api/chat and /api/knowledge/* with a weighted mix of scenarios and reports throughput,
+latency percentiles and error rates per endpoint. Point the backend at tools/fake_openai.py
+(OPENAI_BASE_URL) to load-test without spending OpenAI credits.
+
+Usage (from backend/):
+    python -m tools.loadtest --url http://localhost:8000 --concurrency 20 --duration 60 \
+        --mix first_turn=6,conversation=3,upload=1
+    python -m tools.loadtest --requests 500 --max-p95-ms 4000 --max-error-rate 0.01   # CI gate
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+DEFAULT_QUESTIONS = [
+    "What yatras are available?",
+    "What are the charges?",
+    "How do I register?",
+    "What's included in the package?",
+    "What is the cancellation policy?",
+    "Do you have any yatras in North India?",
+    "When is the next Vrindavan yatra?",
+    "Is the company genuine? Any proof?",
+    "What is the price of the Ayodhya yatra?",
+    "How can I see completed yatras?",
+]
+
+FOLLOW_UPS = [
+    "What are the dates for that?",
+    "How do we travel, train or bus?",
+    "What about refunds if I cancel?",
+    "Is food included?",
+    "Can senior citizens join?",
+    "What is the exact price?",
+    "How do I pay?",
+]
+
+SCENARIOS = ("first_turn", "conversation", "upload", "admin_reads")
+
+# Last ETag seen per admin read, sent back as If-None-Match the way the browser revalidates admin.html polls
+admin_etags = {}
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile (0.0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+class Recorder:
+    """Collects latency and outcome of every request, grouped by endpoint label"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.degraded = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, label: str, seconds: float, status):
+        self.latencies[label].append(seconds)
+        if status not in (200, 304):
+            self.errors[label][str(status)] += 1
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        endpoints = {}
+        total_requests = total_errors = 0
+        for label, values in sorted(self.latencies.items()):
+            errors = sum(self.errors[label].values())
+            total_requests += len(values)
+            total_errors += errors
+            endpoints[label] = {
+                "requests": len(values),
+                "rps": round(len(values) / elapsed, 2),
+                "error_rate": round(errors / len(values), 4),
+                "errors": dict(self.errors[label]),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p90_ms": round(percentile(values, 90) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+                "max_ms": round(max(values) * 1000, 1)
+            }
+        all_values = [v for values in self.latencies.values() for v in values]
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "requests": total_requests,
+            "rps": round(total_requests / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+            "degraded_replies": self.degraded,
+            "p50_ms": round(percentile(all_values, 50) * 1000, 1),
+            "p95_ms": round(percentile(all_values, 95) * 1000, 1),
+            "p99_ms": round(percentile(all_values, 99) * 1000, 1),
+            "endpoints": endpoints
+        }
+
+async def timed(recorder: Recorder, label: str, request_coro):
+    started = time.perf_counter()
+    try:
+        response = await request_coro
+        status = response.status_code
+    except httpx.HTTPError as e:
+        response, status = None, type(e).__name__
+    recorder.record(label, time.perf_counter() - started, status)
+    return response if status == 200 else None
+
+async def send_chat(client, recorder, label, message, history, session_id, summary=None):
+    response = await timed(recorder, label, client.post("/api/chat", json={
+        "message": message,
+        "conversation_history": history[summary["covered_messages"]:] if summary else history,
+        "conversation_summary": summary,
+        "session_id": session_id
+    }))
+    if response is None:
+        return None
+    data = response.json()
+    if data.get("degraded"):
+        recorder.degraded += 1
+    return data
+
+async def scenario_first_turn(client, recorder, rng, args):
+    await send_chat(client, recorder, "POST /api/chat (first turn)", rng.choice(args.questions), [], f"load_{uuid.uuid4().hex}")
+
+async def scenario_conversation(client, recorder, rng, args):
+    """A multi-turn conversation, sending recent history plus the running summary like the widget does"""
+    session_id = f"load_{uuid.uuid4().hex}"
+    history, summary = [], None
+    for turn in range(args.turns):
+        message = rng.choice(args.questions) if turn == 0 else rng.choice(FOLLOW_UPS)
+        label = "POST /api/chat (first turn)" if turn == 0 else "POST /api/chat (follow-up)"
+        data = await send_chat(client, recorder, label, message, history, session_id, summary)
+        if data is None:
+            return
+        history += [{"role": "user", "content": message}, {"role": "assistant", "content": data["response"]}]
+        session_id = data.get("session_id", session_id)
+        summary = data.get("conversation_summary") or summary
+        if args.think_time:
+            await asyncio.sleep(rng.uniform(0, args.think_time))
+
+async def scenario_upload(client, recorder, rng, args):
+    """Re-upload one small file (same name, so it replaces itself) and poll the admin reads like admin.html does"""
+    body = "\n\n".join(f"Load test note {i}: {rng.choice(DEFAULT_QUESTIONS)}" for i in range(args.upload_paragraphs))
+    await timed(recorder, "POST /api/knowledge/upload", client.post(
+        "/api/knowledge/upload",
+        files={"file": ("loadtest_upload.txt", body.encode("utf-8"), "text/plain")},
+        data={"collection": args.upload_collection}
+    ))
+    await scenario_admin_reads(client, recorder, rng, args)
+
+async def scenario_admin_reads(client, recorder, rng, args):
+    for path in ("/api/knowledge/files", "/api/knowledge/collections"):
+        headers = {"If-None-Match": admin_etags[path]} if path in admin_etags else {}
+        response = await timed(recorder, f"GET {path}", client.get(path, headers=headers))
+        if response is not None and response.headers.get("etag"):
+            admin_etags[path] = response.headers["etag"]
+
+SCENARIO_RUNNERS = {
+    "first_turn": scenario_first_turn,
+    "conversation": scenario_conversation,
+    "upload": scenario_upload,
+    "admin_reads": scenario_admin_reads,
+}
+
+async def worker(worker_id: int, client, recorder, args, mix, stop_at, budget):
+    rng = random.Random(args.seed * 1000 + worker_id)
+    names, weights = zip(*mix.items())
+    while time.perf_counter() < stop_at:
+        if budget is not None:
+            if budget["remaining"] <= 0:
+                return
+            budget["remaining"] -= 1
+        scenario = rng.choices(names, weights=weights)[0]
+        await SCENARIO_RUNNERS[scenario](client, recorder, rng, args)
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+def print_report(summary: dict):
+    print(f"\n📊 {summary['requests']} requests in {summary['elapsed_seconds']}s "
+          f"→ {summary['rps']} req/s, error rate {summary['error_rate']:.2%}, degraded replies {summary['degraded_replies']}")
+    print(f"   overall p50 {summary['p50_ms']} ms · p95 {summary['p95_ms']} ms · p99 {summary['p99_ms']} ms\n")
+    header = f"{'endpoint':<34}{'reqs':>7}{'rps':>8}{'err%':>8}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for label, row in summary["endpoints"].items():
+        print(f"{label:<34}{row['requests']:>7}{row['rps']:>8}{row['error_rate'] * 100:>7.2f}%"
+              f"{row['p50_ms']:>9}{row['p90_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}")
+        if row["errors"]:
+            print(f"{'':<4}errors: {row['errors']}")
+
+async def run(args) -> dict:
+    mix = parse_mix(args.mix)
+    recorder = Recorder()
+    budget = {"remaining": args.requests} if args.requests else None
+    stop_at = time.perf_counter() + (args.duration if not args.requests else float("inf"))
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        print(f"🚀 {args.concurrency} workers against {args.url} · mix {mix} · "
+              f"{'%d scenario runs' % args.requests if args.requests else '%ds' % args.duration}")
+        await asyncio.gather(*(worker(i, client, recorder, args, mix, stop_at, budget) for i in range(args.concurrency)))
+    recorder.finished = time.perf_counter()
+    return recorder.summary()
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/chat and /api/knowledge/*")
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="Run this many scenarios instead of a fixed duration")
+    parser.add_argument("--mix", default="first_turn=6,conversation=3,upload=1",
+                        help=f"Weighted scenario mix, e.g. first_turn=6,conversation=3,upload=1 ({', '.join(SCENARIOS)})")
+    parser.add_argument("--turns", type=int, default=6, help="Turns per conversation (the backend's MAX_CONVERSATION_TURNS defaults to 20)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max random pause between conversation turns (seconds)")
+    parser.add_argument("--questions", help="File with one first-turn question per line (defaults to a built-in set)")
+    parser.add_argument("--upload-collection", default="policies", help="Collection the upload scenario writes loadtest_upload.txt to")
+    parser.add_argument("--upload-paragraphs", type=int, default=20, help="Paragraphs in the uploaded file")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout (seconds)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_out", help="Also write the summary as JSON to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="Exit non-zero if overall p95 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, help="Exit non-zero if the error rate exceeds this (0-1)")
+    args = parser.parse_args()
+
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            args.questions = [line.strip() for line in f if line.strip()]
+    else:
+        args.questions = DEFAULT_QUESTIONS
+
+    summary = asyncio.run(run(args))
+    print_report(summary)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    failed = []
+    if args.max_p95_ms is not None and summary["p95_ms"] > args.max_p95_ms:
+        failed.append(f"p95 {summary['p95_ms']} ms > {args.max_p95_ms} ms")
+    if args.max_error_rate is not None and summary["error_rate"] > args.max_error_rate:
+        failed.append(f"error rate {summary['error_rate']:.2%} > {args.max_error_rate:.2%}")
+    if failed:
+        print("\n❌ Load test thresholds exceeded: " + "; ".join(failed))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
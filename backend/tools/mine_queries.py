@@ -0,0 +1,89 @@
+"""
+Mine the chat query log for the most frequent first-turn questions and precompute their answers.
+
+Questions logged by the backend (normalised, in the usage ledger) are embedded and grouped greedily: each
+question joins the first cluster whose centroid is at least --threshold similar, most asked first. The top
+clusters are answered through the normal RAG pipeline and written to precomputed_answers.json together with
+the knowledge fingerprint. The backend then answers matching first-turn questions from that file and
+re-answers the saved questions itself whenever the knowledge changes.
+
+Usage (from backend/, with the same env as the server so it reads the same ledger and collections):
+    python -m tools.mine_queries --dry-run                 # show the clusters only, no LLM calls
+    python -m tools.mine_queries --top 40 --min-count 5
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import main  # noqa: E402
+
+def cluster_questions(rows: list, vectors: np.ndarray, threshold: float) -> list:
+    """Greedy clustering of (question, count) rows (most asked first) by cosine similarity to each cluster's centroid"""
+    clusters = []
+    centroids = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+    for (question, count), vector in zip(rows, vectors):
+        scores = centroids @ vector if len(clusters) else np.zeros(0)
+        best = int(np.argmax(scores)) if len(scores) else -1
+        if best >= 0 and scores[best] >= threshold:
+            cluster = clusters[best]
+            cluster["variants"].append(question)
+            cluster["count"] += count
+            cluster["sum"] += vector * count
+            centroid = cluster["sum"] / np.linalg.norm(cluster["sum"])
+            centroids[best] = centroid
+        else:
+            # The first (most asked) question of a cluster is the one answered
+            clusters.append({"question": question, "variants": [question], "count": count, "sum": vector * count})
+            centroids = np.vstack([centroids, vector])
+    for cluster, centroid in zip(clusters, centroids):
+        cluster["vector"] = [round(float(value), 6) for value in centroid]
+        del cluster["sum"]
+    return sorted(clusters, key=lambda cluster: cluster["count"], reverse=True)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Find the most asked first-turn questions and precompute their answers")
+    parser.add_argument("--days", type=int, default=30, help="Look at questions from the last N days")
+    parser.add_argument("--top", type=int, default=40, help="Questions to precompute")
+    parser.add_argument("--min-count", type=int, default=3, help="Skip clusters asked fewer times than this")
+    parser.add_argument("--threshold", type=float, default=0.88, help="Cosine similarity for two questions to count as the same")
+    parser.add_argument("--dry-run", action="store_true", help="Print the clusters without answering them")
+    parser.add_argument("--output", default=str(main.PRECOMPUTED_ANSWERS_PATH))
+    args = parser.parse_args()
+
+    try:
+        rows = main.usage_ledger.top_queries(days=args.days)
+    except main.sqlite3.OperationalError as e:
+        print(f"⚠️ Could not read the query log in {main.USAGE_LEDGER_PATH}: {e}")
+        return
+    if not rows:
+        print(f"⚠️ No first-turn questions logged in {main.USAGE_LEDGER_PATH} over the last {args.days} days")
+        return
+    embeddings = main.get_embedding_model()
+    vectors = np.asarray(embeddings.embed_documents([question for question, _ in rows]), dtype=np.float32)
+    clusters = [cluster for cluster in cluster_questions(rows, vectors, args.threshold) if cluster["count"] >= args.min_count][:args.top]
+
+    asked = sum(count for _, count in rows)
+    covered = sum(cluster["count"] for cluster in clusters)
+    print(f"\n🔎 {len(rows)} distinct first-turn questions ({asked} asked) → top {len(clusters)} clusters cover "
+          f"{covered} ({100 * covered / asked:.0f}%)\n")
+    for cluster in clusters:
+        print(f"{cluster['count']:>6}  {cluster['question']}" + (f"  (+{len(cluster['variants']) - 1} variants)" if len(cluster["variants"]) > 1 else ""))
+    if args.dry_run or not clusters:
+        return
+
+    main.initialize_vector_store()
+    knowledge_hash = main.knowledge_fingerprint()
+    print(f"\n💬 Answering {len(clusters)} questions...")
+    answered = asyncio.run(main.answer_questions(clusters))
+    if answered is None:
+        sys.exit(1)
+    main.save_precomputed_answers(answered, knowledge_hash, Path(args.output))
+    print(f"💾 Wrote {len(answered)} answers to {args.output} (running servers pick it up within {main.PRECOMPUTED_RELOAD_SECONDS} s)")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,187 @@
+/**
+ * Mitraa Chatbot Launcher
+ * Tiny stand-in for the chat button: the full widget (chatbot-widget.js/.css) is loaded only
+ * when the visitor reaches for the chat or the page goes idle, and the backend is warmed up on intent
+ */
+
+const OorzaaChatbotLauncher = (function () {
+    // Folder this script was loaded from; the full widget files are expected next to it
+    const scriptBase = document.currentScript ? document.currentScript.src.replace(/[^/]*$/, '') : '';
+
+    // Configuration (everything except widgetUrl and loadOnIdle is passed on to OorzaaChatbot.init)
+    let config = {
+        apiUrl: 'http://localhost:8000',
+        position: 'bottom-right',  // or 'bottom-left'
+        tenant: null,
+        widgetUrl: scriptBase,  // Folder holding chatbot-widget.js and chatbot-widget.css
+        loadOnIdle: true        // Also load the widget once the page is idle, so the first click opens it at once
+    };
+
+    // State
+    let state = {
+        warmedUp: false,
+        opening: false,
+        widgetPromise: null
+    };
+
+    const chatIcon = `<svg viewBox="0 0 24 24" xmlns="http://www.w3.org/2000/svg"><path d="M20 2H4c-1.1 0-2 .9-2 2v18l4-4h14c1.1 0 2-.9 2-2V4c0-1.1-.9-2-2-2zm0 14H6l-2 2V4h16v12z"/><path d="M7 9h10v2H7zm0-3h10v2H7zm0 6h7v2H7z"/></svg>`;
+
+    // Same look as .oorzaa-chat-button, inlined so the launcher needs no stylesheet
+    const launcherStyles = `
+        .oorzaa-launcher {
+            position: fixed; bottom: 24px; right: 24px; width: 64px; height: 64px; border-radius: 50%;
+            background: linear-gradient(135deg, #E85D04 0%, #FFC857 100%); border: none; cursor: pointer;
+            box-shadow: 0 4px 20px rgba(232, 93, 4, 0.3); display: flex; align-items: center; justify-content: center;
+            transition: transform 0.3s cubic-bezier(0.4, 0, 0.2, 1); z-index: 9999;
+        }
+        .oorzaa-launcher.bottom-left { right: auto; left: 24px; }
+        .oorzaa-launcher:hover { transform: scale(1.1); }
+        .oorzaa-launcher svg { width: 32px; height: 32px; fill: white; }
+        .oorzaa-launcher.loading { cursor: progress; opacity: 0.8; }
+    `;
+
+    /**
+     * Show the launcher button and schedule the idle load
+     */
+    function init(userConfig = {}) {
+        config = { ...config, ...userConfig };
+        createButton();
+        if (config.loadOnIdle) {
+            whenIdle(() => loadWidget().catch(() => {}));
+        }
+    }
+
+    /**
+     * Create the launcher button
+     */
+    function createButton() {
+        const style = document.createElement('style');
+        style.textContent = launcherStyles;
+        document.head.appendChild(style);
+
+        const button = document.createElement('button');
+        button.id = 'oorzaa-launcher-btn';
+        button.className = config.position === 'bottom-left' ? 'oorzaa-launcher bottom-left' : 'oorzaa-launcher';
+        button.setAttribute('aria-label', 'Open chat');
+        button.innerHTML = chatIcon;
+        (document.getElementById('oorzaa-chatbot-widget') || document.body).appendChild(button);
+
+        // Hover, focus or touch means a click is likely: connect to the backend and fetch the widget now
+        ['mouseenter', 'focus', 'touchstart'].forEach(type => {
+            button.addEventListener(type, warmUp, { once: true, passive: true });
+        });
+        button.addEventListener('click', open);
+    }
+
+    /**
+     * Preconnect to the backend and ping /api/warmup (once per page), so the first message
+     * finds an open connection and a loaded model
+     */
+    function warmUp() {
+        if (state.warmedUp) return;
+        state.warmedUp = true;
+
+        const link = document.createElement('link');
+        link.rel = 'preconnect';
+        link.href = new URL(config.apiUrl, window.location.href).origin;
+        link.crossOrigin = 'anonymous';  // fetch() to another origin uses the anonymous connection pool
+        document.head.appendChild(link);
+
+        const query = config.tenant ? `?tenant=${encodeURIComponent(config.tenant)}` : '';
+        fetch(`${config.apiUrl}/api/warmup${query}`).catch(() => {});
+        loadWidget().catch(() => {});
+    }
+
+    /**
+     * Load the full widget and hand over to it
+     */
+    function open() {
+        if (state.opening) return;
+        state.opening = true;
+        const button = document.getElementById('oorzaa-launcher-btn');
+        button.classList.add('loading');
+        warmUp();
+
+        loadWidget()
+            .then(() => OorzaaChatbot.toggleChat())
+            .catch(error => {
+                console.error('Chat widget failed to load:', error);
+                button.classList.remove('loading');
+            })
+            .finally(() => {
+                state.opening = false;
+            });
+    }
+
+    /**
+     * Load chatbot-widget.css and chatbot-widget.js (once), then initialise the widget in place of the launcher
+     */
+    function loadWidget() {
+        if (!state.widgetPromise) {
+            state.widgetPromise = Promise.all([
+                loadAsset('link', `${config.widgetUrl}chatbot-widget.css`),
+                loadAsset('script', `${config.widgetUrl}chatbot-widget.js`)
+            ]).then(() => {
+                const { widgetUrl, loadOnIdle, ...widgetConfig } = config;
+                const button = document.getElementById('oorzaa-launcher-btn');
+                if (button) button.remove();
+                OorzaaChatbot.init({ ...widgetConfig, warmedUp: state.warmedUp });
+            }).catch(error => {
+                state.widgetPromise = null;  // Let the next click retry
+                throw error;
+            });
+        }
+        return state.widgetPromise;
+    }
+
+    /**
+     * Add a stylesheet or script tag and resolve once it has loaded
+     */
+    function loadAsset(tag, url) {
+        return new Promise((resolve, reject) => {
+            const element = document.createElement(tag);
+            if (tag === 'link') {
+                element.rel = 'stylesheet';
+                element.href = url;
+            } else {
+                element.src = url;
+                element.async = true;
+            }
+            element.onload = resolve;
+            element.onerror = () => {
+                element.remove();
+                reject(new Error(`Could not load ${url}`));
+            };
+            document.head.appendChild(element);
+        });
+    }
+
+    /**
+     * Run callback after the page has loaded and the browser is idle
+     */
+    function whenIdle(callback) {
+        const schedule = () => {
+            if ('requestIdleCallback' in window) {
+                window.requestIdleCallback(callback, { timeout: 5000 });
+            } else {
+                setTimeout(callback, 2000);
+            }
+        };
+        if (document.readyState === 'complete') {
+            schedule();
+        } else {
+            window.addEventListener('load', schedule, { once: true });
+        }
+    }
+
+    // Public API
+    return {
+        init,
+        open
+    };
+})();
+
+// Export for module systems
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = OorzaaChatbotLauncher;
+}
@@ -7,7 +7,9 @@ const OorzaaChatbot = (function () {
     // Configuration
     let config = {
         apiUrl: 'http://localhost:8000',
-        position: 'bottom-right'
+        position: 'bottom-right',
+        tenant: null,  // Knowledge base to answer from (null = the default Oorzaa Yatra one)
+        warmedUp: false  // Set by chatbot-launcher.js when it already pinged /api/warmup
     };
 
     // State
@@ -15,6 +17,7 @@ const OorzaaChatbot = (function () {
         isOpen: false,
         sessionId: null,
         conversationHistory: [],
+        conversationSummary: null,  // Running summary of older turns, returned by the backend with each reply
         isTyping: false,
         shouldEscalate: false
     };
@@ -180,6 +183,7 @@ const OorzaaChatbot = (function () {
         const toggleBtn = document.getElementById('oorzaa-toggle-btn');
 
         if (state.isOpen) {
+            warmUp();
             chatWindow.classList.add('open');
             toggleBtn.classList.add('open');
             document.getElementById('oorzaa-input').focus();
@@ -189,6 +193,16 @@ const OorzaaChatbot = (function () {
         }
     }
 
+    /**
+     * Ping the backend once on first open, so the model is loaded while the visitor types
+     */
+    function warmUp() {
+        if (config.warmedUp) return;
+        config.warmedUp = true;
+        const query = config.tenant ? `?tenant=${encodeURIComponent(config.tenant)}` : '';
+        fetch(`${config.apiUrl}/api/warmup${query}`).catch(() => {});
+    }
+
     /**
      * Send message to the chatbot API
      */
@@ -226,8 +240,10 @@ const OorzaaChatbot = (function () {
         const escalateNow = escalationKeywords.some(k => lowerMsg.includes(k));
 
         try {
-            // Send only previous turns (exclude current message we just pushed)
-            const historyForApi = state.conversationHistory.slice(0, -1);
+            // Send only previous turns (exclude current message we just pushed); turns already folded into the
+            // summary are not sent again
+            const summarizedCount = state.conversationSummary ? state.conversationSummary.covered_messages : 0;
+            const historyForApi = state.conversationHistory.slice(summarizedCount, -1);
 
             const response = await fetch(`${config.apiUrl}/api/chat`, {
                 method: 'POST',
@@ -237,11 +253,18 @@ const OorzaaChatbot = (function () {
                 body: JSON.stringify({
                     message: message,
                     conversation_history: historyForApi,
-                    session_id: state.sessionId
+                    conversation_summary: state.conversationSummary,
+                    session_id: state.sessionId,
+                    tenant: config.tenant
                 })
             });
 
             if (!response.ok) {
+                if (response.status === 400 && state.conversationSummary) {
+                    // The backend no longer accepts our summary (e.g. its signing key changed): start over
+                    state.conversationSummary = null;
+                    state.conversationHistory = [];
+                }
                 throw new Error('API request failed');
             }
 
@@ -263,8 +286,11 @@ const OorzaaChatbot = (function () {
                 content: data.response
             });
 
-            // Update session ID
+            // Update session ID and the summary of older turns
             state.sessionId = data.session_id;
+            if (data.conversation_summary) {
+                state.conversationSummary = data.conversation_summary;
+            }
 
         } catch (error) {
             console.error('Chat error:', error);